@@ -102,6 +102,17 @@ pymysql.install_as_MySQLdb()
 
 AUTH_USER_MODEL = 'scores.User'
 
+# 'sync': tính lại điểm ngay khi ghi DisciplinePoint
+# 'deferred': đưa vào hàng đợi, chạy `manage.py process_score_queue` để xử lý
+SCORES_RECOMPUTE_MODE = 'sync'
+
+# 'sync': ghi Like và cập nhật like_count ngay
+# 'buffered': gom thao tác thích vào hàng đợi, chạy `manage.py flush_likes` để ghi theo lô
+SCORES_LIKE_MODE = 'sync'
+
+# Số giây giữ phản hồi của các API danh sách trong cache (khóa cache đổi ngay khi dữ liệu đổi)
+SCORES_RESPONSE_CACHE_TIMEOUT = 300
+
 MEDIA_ROOT = '%s/scores/static/' % BASE_DIR
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -1,11 +1,19 @@
-from django.contrib import admin
-from django.db.models import Count, Sum, Avg,Q
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.db.models import QuerySet
 from django.template.response import TemplateResponse
 from django.utils.safestring import mark_safe
 from scores.models import *
 from django import forms
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
-from django.urls import path
+from django.urls import path, reverse
+from scores import exports, reports, rollups, stats
 
 class MyScoreAdmin(admin.AdminSite):
     site_header = 'Edu Scores'
@@ -14,117 +22,110 @@ class MyScoreAdmin(admin.AdminSite):
 
     def get_urls(self):
         return [
-            path('score-stats/', self.stats),
-            path('export-csv/', self.export_csv),
-            path('export-pdf/', self.export_pdf),
+            path('score-stats/', self.admin_view(self.stats)),
+            path('score-stats/rebuild/', self.admin_view(self.rebuild_rollups)),
+            path('export-csv/', self.admin_view(self.export_csv)),
+            path('export-pdf/', self.admin_view(self.export_pdf)),
+            path('score-reports/<int:pk>/download/', self.admin_view(self.download_report),
+                 name='score_report_download'),
         ] + super().get_urls()
 
     def stats(self, request):
         # Lấy danh sách các lớp
         all_classes = Class.objects.all()
+        class_names = {c.id: c.name for c in all_classes}
+
+        # Số liệu lấy từ bảng tổng hợp ScoreRollup (cập nhật mỗi lần ghi điểm)
+        class_rollups = ScoreRollup.objects.filter(scope=ScoreRollup.SCOPE_CLASS, point_count__gt=0)
+        department_rollups = ScoreRollup.objects.filter(scope=ScoreRollup.SCOPE_DEPARTMENT, point_count__gt=0)
 
         # Lấy lớp được chọn từ request
-        selected_class_id = request.GET.get('class')
+        selected_class_id = request.GET.get('class') or None
         if selected_class_id:
+            try:
+                selected_class_id = int(selected_class_id)
+            except ValueError:
+                return HttpResponseBadRequest(f'Invalid class: {selected_class_id!r}')
             # Lọc thống kê theo lớp được chọn
-            stats_by_class = (
-                DisciplinePoint.objects.filter(student__student_class__id=selected_class_id)
-                .values('student__student_class__name')
-                .annotate(
-                    total_score=Sum('score'),
-                    avg_score=Avg('score'),
-                    student_count=Count('student', distinct=True)
-                )
-            )
-            classification = (
-                DisciplinePoint.objects.filter(student__student_class__id=selected_class_id)
-                .values('student__student_class__name')
-                .annotate(
-                    excellent=Count('score', filter=Q(score__gte=90)),
-                    good=Count('score', filter=Q(score__gte=75, score__lt=90)),
-                    average=Count('score', filter=Q(score__gte=50, score__lt=75)),
-                    poor=Count('score', filter=Q(score__lt=50)),
-                )
-            )
-        else:
-            # Hiển thị thống kê cho tất cả các lớp
-            stats_by_class = (
-                DisciplinePoint.objects.values('student__student_class__name')
-                .annotate(
-                    total_score=Sum('score'),
-                    avg_score=Avg('score'),
-                    student_count=Count('student', distinct=True)
-                )
-            )
-            classification = (
-                DisciplinePoint.objects.values('student__student_class__name')
-                .annotate(
-                    excellent=Count('score', filter=Q(score__gte=90)),
-                    good=Count('score', filter=Q(score__gte=75, score__lt=90)),
-                    average=Count('score', filter=Q(score__gte=50, score__lt=75)),
-                    poor=Count('score', filter=Q(score__lt=50)),
-                )
-            )
+            class_rollups = class_rollups.filter(scope_id=selected_class_id)
+
+        stats_by_class = [{
+            'name': class_names.get(r.scope_id, 'Chưa xếp lớp'),
+            'total_score': r.total_score,
+            'avg_score': r.avg_score,
+            'student_count': r.student_count,
+        } for r in class_rollups]
+        # Phân loại theo tổng điểm đã chặn của từng sinh viên
+        score_stats = stats.get_stats()
+        classification = score_stats['by_class']
+        if selected_class_id:
+            classification = [c for c in classification if c['class_id'] == selected_class_id]
+
+        department_names = dict(Department.objects.values_list('id', 'name'))
+        stats_by_department = [{
+            'name': department_names.get(r.scope_id, 'Chưa xếp khoa'),
+            'total_score': r.total_score,
+            'avg_score': r.avg_score,
+            'student_count': r.student_count,
+        } for r in department_rollups]
 
         context = {
+            **self.each_context(request),
             'all_classes': all_classes,
-            'selected_class_id': int(selected_class_id) if selected_class_id else None,
+            'selected_class_id': selected_class_id,
             'stats_by_class': stats_by_class,
             'classification': classification,
+            'overall': score_stats['overall'],
+            'stats_by_department': stats_by_department,
         }
 
         return TemplateResponse(request, 'admin/stats.html', context)
 
-    def export_csv(self, request):
-        # Xuất danh sách chi tiết dưới dạng CSV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="discipline_points.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Student', 'Class', 'Department', 'Score', 'Description', 'Created At'])
-
-        points = DisciplinePoint.objects.select_related('student', 'student__department', 'student__student_class')
-        for point in points:
-            writer.writerow([
-                point.student.username,
-                point.student.student_class.name if point.student.student_class else '',
-                point.student.department.name if point.student.department else '',
-                point.score,
-                point.description,
-                point.created_at,
-            ])
+    def rebuild_rollups(self, request):
+        if request.method == 'POST':
+            count = rollups.rebuild()
+            messages.success(request, f'Đã tính lại {count} dòng tổng hợp.')
+        return redirect('../')
 
+    def export_csv(self, request):
+        # Xuất danh sách chi tiết dưới dạng CSV, ghi dần từng khối để bộ nhớ không tăng theo số dòng
+        try:
+            points = exports.filter_points(request.GET)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        compress = request.GET.get('gzip') == '1'
+        response = StreamingHttpResponse(exports.stream_csv(points, compress=compress),
+                                         content_type='application/gzip' if compress else 'text/csv; charset=utf-8')
+        filename = 'discipline_points.csv.gz' if compress else 'discipline_points.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
     def export_pdf(self, request):
-        # Xuất danh sách chi tiết dưới dạng PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="discipline_points.pdf"'
-
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=A4)
-
-        # Tiêu đề
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(200, 800, "Discipline Points Report")
-        p.setFont("Helvetica", 12)
-
-        # Nội dung
-        y = 750
-        points = DisciplinePoint.objects.select_related('student', 'student__department', 'student__student_class')
-        for point in points:
-            if y < 50:  # Tạo trang mới nếu hết chỗ
-                p.showPage()
-                y = 750
-            p.drawString(50, y, f"Student: {point.student.username}, Class: {point.student.student_class.name if point.student.student_class else ''}, "
-                                 f"Score: {point.score}, Description: {point.description}")
-            y -= 20
-
-        p.save()
-        buffer.seek(0)
-        response.write(buffer.getvalue())
-        buffer.close()
-        return response
+        # Báo cáo PDF được tạo nền (process_score_reports); bản đã có cho dữ liệu hiện tại thì tải ngay
+        for param, scope in [('class', ScoreReport.SCOPE_CLASS), ('department', ScoreReport.SCOPE_DEPARTMENT)]:
+            value = request.GET.get(param)
+            if value:
+                if not value.isdigit():
+                    return HttpResponseBadRequest(f'Invalid {param}: {value!r}')
+                scope_id = int(value)
+                break
+        else:
+            scope, scope_id = ScoreReport.SCOPE_SCHOOL, 0
+
+        report = reports.request_report(scope, scope_id, user=request.user)
+        if reports.is_ready(report):
+            return self.download_report(request, report.pk)
+
+        messages.info(request, 'Báo cáo đang được tạo, tải về tại đây khi trạng thái là "Hoàn tất".')
+        return redirect(reverse(f'{self.name}:scores_scorereport_changelist'))
+
+    def download_report(self, request, pk):
+        report = get_object_or_404(ScoreReport, pk=pk)
+        if not reports.is_ready(report):
+            raise Http404('Report is not ready')
+        return FileResponse(open(reports.report_path(report), 'rb'), as_attachment=True,
+                            filename=report.file_name, content_type='application/pdf')
 
 class BaseAdmin(admin.ModelAdmin):
     class Media:
@@ -132,8 +133,101 @@ class BaseAdmin(admin.ModelAdmin):
             'all': ('/static/css/styles.css',)
         }
 
+
+def estimate_count(model):
+    """Số dòng ước lượng từ thống kê của CSDL (MySQL / PostgreSQL), None nếu không hỗ trợ."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                           'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+class ApproximateCountPaginator(Paginator):
+    # COUNT(*) không điều kiện quét toàn bảng InnoDB; bảng lớn thì dùng số ước lượng khi không lọc
+    THRESHOLD = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_count(queryset.model)
+            if estimate is not None and estimate > self.THRESHOLD:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.SimpleListFilter):
+    """Bộ lọc theo khóa ngoại dùng ô tìm kiếm (autocomplete của admin) thay vì liệt kê mọi đối tượng."""
+    template = 'admin/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        self.parameter_name = f'{self.field_name}__id__exact'
+        super().__init__(request, params, model, model_admin)
+        self.field = model._meta.get_field(self.field_name)
+        self.admin_site_name = model_admin.admin_site.name
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            if not value.isdigit():
+                raise IncorrectLookupParameters(f'Invalid {self.parameter_name}: {value!r}')
+            return queryset.filter(**{self.field.attname: value})
+        return queryset
+
+    def choices(self, changelist):
+        value = self.value()
+        selected = None
+        if value and value.isdigit():
+            selected = self.field.related_model._default_manager.filter(pk=value).first()
+        yield {
+            'url': reverse(f'{self.admin_site_name}:autocomplete'),
+            'app_label': self.field.model._meta.app_label,
+            'model_name': self.field.model._meta.model_name,
+            'field_name': self.field_name,
+            'value': value if selected else '',
+            'label': str(selected) if selected else '',
+            'parameter_name': self.parameter_name,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+def autocomplete_filter(field_name, title):
+    return type(f'{field_name.title()}AutocompleteFilter', (AutocompleteFilter,),
+                {'field_name': field_name, 'title': title})
+
+
+class LargeTableAdmin(BaseAdmin):
+    """Changelist cho bảng lớn: đếm ước lượng, không đếm lại toàn bảng, nạp JS cho AutocompleteFilter."""
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        extra = '' if settings.DEBUG else '.min'
+        return super().media + forms.Media(
+            js=[f'admin/js/vendor/jquery/jquery{extra}.js', f'admin/js/vendor/select2/select2.full{extra}.js',
+                'admin/js/jquery.init.js', 'admin/js/autocomplete.js'],
+            css={'screen': [f'admin/css/vendor/select2/select2{extra}.css', 'admin/css/autocomplete.css']},
+        )
+
 class UserAdmin(admin.ModelAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     search_fields = ('username', 'email')
     list_filter = ('is_staff', 'is_superuser')
     ordering = ('username',)
@@ -167,9 +261,18 @@ class ActivityAdmin(BaseAdmin):
 class CategoryAdmin(BaseAdmin):
     pass
 
-class ParticipationAdmin(BaseAdmin):
+class ClassAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'department')
+    list_filter = ('department',)
+    list_select_related = ('department',)
+    search_fields = ('name', 'code')
+
+class ParticipationAdmin(LargeTableAdmin):
     list_display = ('student', 'activity', 'is_completed')
-    list_filter = ('is_completed', 'activity')
+    list_filter = ('is_completed', autocomplete_filter('activity', 'Hoạt động'),
+                   autocomplete_filter('student', 'Sinh viên'))
+    list_select_related = ('student', 'activity')
+    autocomplete_fields = ('student', 'activity')
     readonly_fields = ['image']
 
     def image(self, participation):
@@ -189,14 +292,54 @@ class EvaluationGroupAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_editable = ('max_score', 'active')
 
-class DisciplinePointAdmin(BaseAdmin):
+class DisciplinePointAdmin(LargeTableAdmin):
     list_display = ('student', 'criteria', 'score', 'group_total_score')
-    list_filter = ('student',)
-
-class ReportAdmin(BaseAdmin):
+    list_filter = (autocomplete_filter('student', 'Sinh viên'), autocomplete_filter('activity', 'Hoạt động'),
+                   'criteria__group')
+    # Tên nhóm của tiêu chí lấy từ bộ nhớ đệm thang điểm, không cần nối thêm bảng nhóm
+    list_select_related = ('student', 'criteria')
+    search_fields = ('=student__username',)
+    autocomplete_fields = ('student', 'activity', 'criteria')
+
+class ScoreRollupAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'scope_id', 'total_score', 'point_count', 'student_count', 'updated_date')
+    list_filter = ('scope',)
+    actions = ['rebuild_rollups']
+
+    @admin.action(description='Tính lại toàn bộ bảng tổng hợp')
+    def rebuild_rollups(self, request, queryset):
+        count = rollups.rebuild()
+        self.message_user(request, f'Đã tính lại {count} dòng tổng hợp.', messages.SUCCESS)
+
+class ScoreReportAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'scope_id', 'data_version', 'status', 'row_count', 'created_date', 'finished_date',
+                    'download')
+    list_filter = ('status', 'scope')
+    readonly_fields = ('scope', 'scope_id', 'data_version', 'status', 'file_name', 'row_count', 'error',
+                       'requested_by', 'created_date', 'finished_date')
+    actions = ['requeue']
+
+    def has_add_permission(self, request):
+        return False
+
+    def download(self, report):
+        if reports.is_ready(report):
+            url = reverse(f'{self.admin_site.name}:score_report_download', args=[report.pk])
+            return mark_safe(f"<a href='{url}'>Tải về</a>")
+        return '-'
+
+    @admin.action(description='Tạo lại các báo cáo đã chọn')
+    def requeue(self, request, queryset):
+        count = queryset.update(status=ScoreReport.STATUS_PENDING, error='')
+        self.message_user(request, f'Đã đưa {count} báo cáo vào hàng đợi.', messages.SUCCESS)
+
+class ReportAdmin(LargeTableAdmin):
     list_display = ('student', 'activity', 'status', 'handled_by')
-    list_filter = ('status', 'activity', 'student')
-    search_fields = ('student__username', 'activity__title')
+    list_filter = ('status', autocomplete_filter('activity', 'Hoạt động'), autocomplete_filter('student', 'Sinh viên'))
+    list_select_related = ('student', 'activity', 'handled_by')
+    # Tìm theo tiền tố để dùng được chỉ mục của username / title
+    search_fields = ('^student__username', '^activity__title')
+    autocomplete_fields = ('student', 'activity', 'handled_by')
     readonly_fields = ['image']
 
     def image(self, report):
@@ -216,22 +359,25 @@ class CommentAdmin(BaseAdmin):
     list_display = ('user', 'newsfeed', 'content')
     search_fields = ('content',)
 
-class MessageAdmin(BaseAdmin):
+class MessageAdmin(LargeTableAdmin):
     list_display = ('sender', 'receiver', 'content', 'timestamp')
-    search_fields = ('sender__username', 'receiver__username', 'content')
-    list_filter = ('sender', 'receiver')
+    search_fields = ('^sender__username', '^receiver__username')
+    list_filter = (autocomplete_filter('sender', 'Người gửi'), autocomplete_filter('receiver', 'Người nhận'))
+    list_select_related = ('sender', 'receiver')
 
 admin_site=MyScoreAdmin(name='EduScore')
 
 admin_site.register(User, UserAdmin)
 admin_site.register(Department)
-admin_site.register(Class)
+admin_site.register(Class, ClassAdmin)
 admin_site.register(Category,CategoryAdmin)
 admin_site.register(Activity, ActivityAdmin)
 admin_site.register(Participation, ParticipationAdmin)
 admin_site.register(EvaluationCriteria, EvaluationCriteriaAdmin)
 admin_site.register(EvaluationGroup, EvaluationGroupAdmin)
 admin_site.register(DisciplinePoint, DisciplinePointAdmin)
+admin_site.register(ScoreRollup, ScoreRollupAdmin)
+admin_site.register(ScoreReport, ScoreReportAdmin)
 admin_site.register(Report, ReportAdmin)
 admin_site.register(NewsFeed, NewsFeedAdmin)
 admin_site.register(Like, LikeAdmin)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ScoresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'scores'
+
+    def ready(self):
+        from scores import scheme  # noqa: F401 - đăng ký signal làm mới bộ nhớ đệm
+        from scores import search  # noqa: F401 - đăng ký signal cập nhật chỉ mục tìm kiếm
+        from scores import feed  # noqa: F401 - đăng ký signal cập nhật bộ đếm like / bình luận
+        from scores import caching  # noqa: F401 - đăng ký signal tăng phiên bản cho phản hồi có điều kiện
+        from scores import dashboard  # noqa: F401 - đăng ký signal làm mất hiệu lực bảng điều khiển sinh viên
+        from scores import rollups  # noqa: F401 - đăng ký signal chuyển bảng tổng hợp khi xóa lớp / khoa
+        from scores import leaderboard  # noqa: F401 - đăng ký signal cập nhật bảng đếm xếp hạng khi xóa
@@ -0,0 +1,438 @@
+"""
+Các bài đo hiệu năng chạy bằng `manage.py benchmark <tên>`.
+
+Mỗi bài đo tự tạo dữ liệu riêng (tên có tiền tố bench-) trên CSDL đang cấu hình và xóa đi
+khi kết thúc, trừ khi chạy với --keep. Không chạy trên CSDL production.
+"""
+import random
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.db import OperationalError, connection
+from django.test import override_settings
+from rest_framework import pagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from scores import fastpath, feed, leaderboard, paginators, scoring, search, serializers
+from scores.models import (Activity, Category, Class, Comment, Department, DisciplinePoint, EvaluationCriteria,
+                           EvaluationGroup, Like, NewsFeed, PendingLike, Tag, User)
+from scores.seeding import WORDS
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Fixture:
+    """Dữ liệu tạm cho một lần đo."""
+
+    def __init__(self, students=1, groups=3, criteria_per_group=2, max_score=50):
+        self.prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        self.department = Department.objects.create(name=self.prefix, code=self.prefix[-10:])
+        self.student_class = Class.objects.create(name=self.prefix, code=self.prefix[-10:],
+                                                  department=self.department)
+        self.category = Category.objects.create(name=self.prefix)
+        self.staff = User.objects.create(username=f'{self.prefix}-staff', is_staff=True)
+        self.activity = Activity.objects.create(title=self.prefix, description='', start_date=date.today(),
+                                                end_date=date.today(), created_by=self.staff, capacity=students,
+                                                category=self.category)
+        self.groups = [EvaluationGroup.objects.create(name=f'{self.prefix}-g{i}', max_score=max_score)
+                       for i in range(groups)]
+        self.criteria = [EvaluationCriteria.objects.create(group=g, name=f'{g.name}-c{j}')
+                         for g in self.groups for j in range(criteria_per_group)]
+        User.objects.bulk_create([
+            User(username=f'{self.prefix}-sv{i}', department=self.department, student_class=self.student_class)
+            for i in range(students)
+        ])
+        self.students = list(User.objects.filter(username__startswith=f'{self.prefix}-sv').order_by('id'))
+        # bulk_create không qua User.save
+        leaderboard.rebuild()
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=self.prefix).delete()
+        EvaluationGroup.objects.filter(name__startswith=self.prefix).delete()
+        Category.objects.filter(name=self.prefix).delete()
+        Department.objects.filter(name=self.prefix).delete()
+
+
+def timed(fn, repeat):
+    """Gọi fn(i) repeat lần, trả về (trung bình, p95) theo mili giây."""
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return sum(samples) / len(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def is_lock_error(e):
+    message = str(e).lower()
+    return 'locked' in message or 'deadlock' in message or 'lock wait' in message
+
+
+class Runner:
+    """Chạy job(thread_index, i) song song trên nhiều luồng, mỗi luồng một kết nối CSDL."""
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def retry(self, fn, *args, **kwargs):
+        """Gọi fn, thử lại nếu CSDL báo khóa / deadlock (SQLite chỉ cho một luồng ghi)."""
+        for attempt in range(50):
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                with self.lock:
+                    self.retries += 1
+                time.sleep(0.005 * (attempt + 1))
+        raise RuntimeError('Gave up after 50 lock retries')
+
+    def run(self, jobs_per_thread, job):
+        """Trả về số giây đã chạy."""
+        errors = []
+
+        def worker(index):
+            try:
+                for i in range(jobs_per_thread):
+                    job(index, i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=worker, args=(t,)) for t in range(self.threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise errors[0]
+        return elapsed
+
+
+@benchmark('scoring')
+def bench_scoring(out, threads=8, writes=100, students=50, keep=False, seed=42, **kwargs):
+    """Ghi điểm đồng thời cho một sinh viên và cho nhiều sinh viên, kiểm tra tổng điểm cuối cùng."""
+    # Điểm tối đa đủ lớn để tổng mong đợi không bị chặn
+    fixture = Fixture(students=students, max_score=writes * threads * 11)
+    rng = random.Random(seed)
+    plan = [[(rng.choice(fixture.criteria), rng.randint(1, 10)) for i in range(writes)] for t in range(threads)]
+
+    try:
+        for scenario, pick_student in [
+            ('one student', lambda t, i: fixture.students[0]),
+            ('many students', lambda t, i: fixture.students[(t * writes + i) % len(fixture.students)]),
+        ]:
+            # Xóa điểm đi qua sổ điểm nên tổng điểm của sinh viên về 0
+            DisciplinePoint.objects.filter(student__in=fixture.students).delete()
+
+            runner = Runner(threads)
+
+            def job(t, i):
+                criteria, score = plan[t][i]
+                point = runner.retry(DisciplinePoint.objects.create, student_id=pick_student(t, i).pk,
+                                     activity_id=fixture.activity.pk, criteria_id=criteria.pk, score=score)
+                # Một nửa số lần ghi là sửa điểm vừa tạo để kiểm tra cả đường cập nhật
+                if i % 2:
+                    point.score += 1
+                    runner.retry(point.save)
+
+            elapsed = runner.run(writes, job)
+
+            expected = {}
+            for t in range(threads):
+                for i in range(writes):
+                    student = pick_student(t, i)
+                    expected[student.pk] = expected.get(student.pk, 0) + plan[t][i][1] + (i % 2)
+            actual = dict(User.objects.filter(pk__in=expected).values_list('id', 'total_score'))
+            mismatches = scoring.check_ledger(list(expected))
+
+            assert actual == expected, f'{scenario}: totals differ from expected'
+            assert not mismatches, f'{scenario}: ledger differs from recompute: {mismatches[:5]}'
+
+            total_writes = threads * writes + threads * (writes // 2)
+            out(f'{scenario}: {total_writes} writes from {threads} threads in {elapsed:.2f}s '
+                f'({total_writes / elapsed:.0f} writes/s, {runner.retries} lock retries), totals OK')
+    finally:
+        if not keep:
+            fixture.cleanup()
+
+
+@benchmark('activity_search')
+def bench_activity_search(out, size=100000, queries=50, keep=False, seed=42, **kwargs):
+    """So sánh ?q= bằng title__icontains với chỉ mục tìm kiếm trên `size` hoạt động."""
+    fixture = Fixture()
+    rng = random.Random(seed)
+    # Từ điển cỡ thật hơn: các từ ghép hai âm tiết, tần suất theo phân phối Zipf
+    vocabulary = list(dict.fromkeys(a + b for a in WORDS for b in WORDS))
+    rng.shuffle(vocabulary)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+    def words(k):
+        return ' '.join(rng.choices(vocabulary, weights, k=k))
+
+    try:
+        started = time.perf_counter()
+        for start in range(0, size, 5000):
+            Activity.objects.bulk_create([
+                Activity(title=words(4).capitalize(), description=f'<p>{words(15)}</p>', start_date=date.today(),
+                         end_date=date.today(), created_by=fixture.staff, capacity=10, category=fixture.category)
+                for i in range(start, min(size, start + 5000))
+            ])
+        ids = list(Activity.objects.filter(category=fixture.category).values_list('id', flat=True))
+        out(f'created {len(ids)} activities in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        for start in range(0, len(ids), 1000):
+            search.index_activities(ids[start:start + 1000])
+        out(f'indexed in {time.perf_counter() - started:.1f}s '
+            f'({"FULLTEXT" if search.use_fulltext() else "inverted index"})')
+
+        # Một từ, hai từ và một tiền tố như người dùng đang gõ
+        terms = [rng.choice([w, f'{w} {rng.choice(vocabulary[:200])}', w[:4]])
+                 for w in rng.choices(vocabulary[:1000], k=queries)]
+        activities = Activity.objects.filter(category=fixture.category)
+
+        def icontains(i):
+            page = activities.filter(title__icontains=terms[i]).order_by('-id')
+            page.count()
+            list(page[:20])
+
+        def indexed(i):
+            page = search.search(activities, terms[i])
+            page.count()
+            list(page[:20])
+
+        for name, fn in [('title__icontains', icontains), ('search index', indexed)]:
+            mean, p95 = timed(fn, queries)
+            out(f'{name}: {queries} queries, mean {mean:.1f} ms, p95 {p95:.1f} ms (count + first page)')
+    finally:
+        if not keep:
+            fixture.cleanup()
+
+
+@benchmark('feed_pagination')
+def bench_feed_pagination(out, size=100000, queries=50, keep=False, **kwargs):
+    """Thời gian lấy một trang newsfeed ở các độ sâu khác nhau: OFFSET (trang số) và con trỏ (keyset)."""
+    fixture = Fixture()
+
+    try:
+        started = time.perf_counter()
+        for start in range(0, size, 5000):
+            activities = Activity.objects.bulk_create([
+                Activity(title=f'{fixture.prefix} {i}', description='', start_date=date.today(), end_date=date.today(),
+                         created_by=fixture.staff, capacity=10, category=fixture.category)
+                for i in range(start, min(size, start + 5000))
+            ])
+            if activities[0].pk is None:
+                # MySQL: bulk_create không trả về id
+                activities = Activity.objects.filter(title__in=[a.title for a in activities])
+            NewsFeed.objects.bulk_create([NewsFeed(activity=a, created_by=fixture.staff) for a in activities])
+        out(f'created {size} newsfeed items in {time.perf_counter() - started:.1f}s')
+
+        # Giống NewsFeedViewSet: toàn bộ newsfeed đang hiển thị (dữ liệu tạm chiếm gần hết bảng)
+        feeds = NewsFeed.objects.filter(active=True)
+        ordered = feeds.order_by('-timestamp', '-id')
+        total = ordered.count()
+        factory = APIRequestFactory()
+
+        class OffsetPaginator(pagination.PageNumberPagination):
+            page_size = 20
+
+        keyset = paginators.NewsFeedPaginator()
+        for depth in [0, total // 10, total // 2, total - 20]:
+            offset_request = Request(factory.get('/', {'page': depth // 20 + 1}))
+            offset_ms, offset_p95 = timed(lambda i: OffsetPaginator().paginate_queryset(ordered, offset_request),
+                                          queries)
+
+            cursor = {}
+            if depth:
+                previous = ordered.values('timestamp', 'id')[depth - 1]
+                cursor = {'cursor': keyset.encode_cursor([previous['timestamp'], previous['id']])}
+            keyset_request = Request(factory.get('/', {'page_size': 20, **cursor}))
+            keyset_ms, keyset_p95 = timed(lambda i: keyset.paginate_queryset(feeds, keyset_request), queries)
+
+            out(f'row {depth:>7}: offset mean {offset_ms:.1f} ms (p95 {offset_p95:.1f}), '
+                f'cursor mean {keyset_ms:.1f} ms (p95 {keyset_p95:.1f})')
+    finally:
+        if not keep:
+            fixture.cleanup()
+
+
+@benchmark('likes')
+def bench_likes(out, threads=8, writes=100, students=50, keep=False, seed=42, **kwargs):
+    """
+    Thích / bỏ thích đồng thời trên một newsfeed (bài đăng cho toàn trường), ghi ngay và qua hàng đợi.
+    Kiểm tra không có like trùng / mất và like_count đúng bằng số Like sau khi ghi xong.
+    """
+    fixture = Fixture(students=students)
+    newsfeed = NewsFeed.objects.create(activity=fixture.activity, created_by=fixture.staff)
+    rng = random.Random(seed)
+    # Mỗi sinh viên chỉ do một luồng thao tác nên trạng thái cuối cùng xác định được
+    owned = [fixture.students[t::threads] for t in range(threads)]
+    assert all(owned), 'need at least as many students as threads'
+    plan = [[(owned[t][i % len(owned[t])], rng.random() < 0.6) for i in range(writes)] for t in range(threads)]
+    expected = {student.pk: liked for steps in plan for student, liked in steps}
+
+    try:
+        for mode in [feed.MODE_SYNC, feed.MODE_BUFFERED]:
+            Like.objects.filter(newsfeed=newsfeed).delete()
+            feed.refresh_counters([newsfeed.pk])
+
+            with override_settings(SCORES_LIKE_MODE=mode):
+                runner = Runner(threads)
+                done = threading.Event()
+                flushes = []
+
+                def flusher():
+                    # Worker xả hàng đợi chạy song song với đợt thao tác
+                    try:
+                        while not done.is_set():
+                            flushes.append(runner.retry(feed.flush_likes, 200))
+                            time.sleep(0.01)
+                    finally:
+                        connection.close()
+
+                def job(t, i):
+                    student, liked = plan[t][i]
+                    runner.retry(feed.set_like, student, newsfeed, liked)
+
+                background = threading.Thread(target=flusher) if mode == feed.MODE_BUFFERED else None
+                if background:
+                    background.start()
+                elapsed = runner.run(writes, job)
+                done.set()
+                if background:
+                    background.join()
+
+                started = time.perf_counter()
+                while feed.flush_likes():
+                    pass
+                drain = time.perf_counter() - started
+
+            liked = sorted(Like.objects.filter(newsfeed=newsfeed).values_list('user_id', flat=True))
+            newsfeed.refresh_from_db()
+            wanted = sorted(pk for pk, state in expected.items() if state)
+            assert len(liked) == len(set(liked)), f'{mode}: duplicate likes'
+            assert liked == wanted, f'{mode}: {len(set(wanted) - set(liked))} lost, ' \
+                                    f'{len(set(liked) - set(wanted))} unexpected likes'
+            assert newsfeed.like_count == len(liked), f'{mode}: like_count {newsfeed.like_count} != {len(liked)}'
+            assert not PendingLike.objects.filter(newsfeed=newsfeed).exists(), f'{mode}: queue not drained'
+
+            toggles = threads * writes
+            out(f'{mode}: {toggles} toggles from {threads} threads in {elapsed:.2f}s '
+                f'({toggles / elapsed:.0f} toggles/s, {runner.retries} lock retries, '
+                f'{sum(flushes)} flushed during burst, final drain {drain * 1000:.0f} ms), '
+                f'{len(liked)} likes, like_count OK')
+    finally:
+        if not keep:
+            fixture.cleanup()
+
+
+@benchmark('serialization')
+def bench_serialization(out, size=100000, queries=50, keep=False, seed=42, **kwargs):
+    """
+    Số dòng / giây của serializer DRF + JSONRenderer so với đường nhanh (scores/fastpath.py) cho các API
+    danh sách, mỗi lần một trang 100 dòng (gồm cả truy vấn); kiểm tra hai bên cho ra cùng từng byte.
+    """
+    fixture = Fixture()
+    rng = random.Random(seed)
+    page_size = 100
+    tags = []
+
+    try:
+        started = time.perf_counter()
+        tags = Tag.objects.bulk_create([Tag(name=f'{fixture.prefix}-{w}') for w in dict.fromkeys(WORDS)])
+        tags = list(Tag.objects.filter(name__startswith=fixture.prefix))
+        for start in range(0, size, 5000):
+            Activity.objects.bulk_create([
+                Activity(title=f'{fixture.prefix} {i} {rng.choice(WORDS)}', description=f'<p>{rng.choice(WORDS)}</p>',
+                         start_date=date.today(), end_date=date.today(), created_by=fixture.staff, capacity=10,
+                         category=fixture.category, image=f'activities/2025/03/{i}.jpg' if i % 2 else None)
+                for i in range(start, min(size, start + 5000))
+            ])
+        activities = list(Activity.objects.filter(category=fixture.category).values_list('id', flat=True))
+        for start in range(0, len(activities), 5000):
+            Activity.tags.through.objects.bulk_create([
+                Activity.tags.through(activity_id=a, tag_id=t.pk)
+                for a in activities[start:start + 5000] for t in rng.sample(tags, 3)
+            ])
+            NewsFeed.objects.bulk_create([NewsFeed(activity_id=a, created_by=fixture.staff)
+                                          for a in activities[start:start + 5000]])
+        users = User.objects.bulk_create([
+            User(username=f'{fixture.prefix}-u{i}', first_name=rng.choice(WORDS), last_name=rng.choice(WORDS),
+                 avatar=f'image/upload/v17340{i:05d}/avatar_{i}.jpg' if i % 3 else None)
+            for i in range(min(size, 5000))
+        ])
+        users = list(User.objects.filter(username__startswith=f'{fixture.prefix}-u').order_by('id'))
+        leaderboard.rebuild()
+        newsfeed = NewsFeed.objects.filter(activity_id=activities[0]).get()
+        Like.objects.bulk_create([Like(user=u, newsfeed=newsfeed) for u in users])
+        Comment.objects.bulk_create([Comment(user=rng.choice(users), newsfeed=newsfeed, content=rng.choice(WORDS))
+                                     for i in range(min(size, 5000))])
+        feed.refresh_counters([newsfeed.pk])
+        out(f'created {len(activities)} activities / newsfeed items, {len(users)} likes and comments '
+            f'in {time.perf_counter() - started:.1f}s')
+
+        request = Request(APIRequestFactory().get('/', HTTP_HOST='localhost'))
+        request.user = fixture.staff
+        context = {'request': request}
+        newsfeeds = NewsFeed.objects.filter(activity__category=fixture.category) \
+            .annotate(liked_by_me=feed.liked_subquery(fixture.staff)).order_by('-timestamp', '-id')
+        comments = feed.thread_comments(newsfeed).order_by('-created_date', '-id')
+        activity_query = Activity.objects.prefetch_related('tags').filter(category=fixture.category) \
+            .order_by('-created_date', '-id')
+
+        endpoints = [
+            ('categories', len(activities),
+             lambda s: serializers.CategorySerializer(Category.objects.order_by('-id')[s], many=True).data,
+             lambda s: fastpath.category_rows(fastpath.category_values(Category.objects.order_by('-id'))[s])),
+            ('activities', len(activities),
+             lambda s: serializers.ActivityDetailsSerializer(activity_query[s], many=True, context=context).data,
+             lambda s: fastpath.activity_rows(fastpath.activity_values(activity_query)[s], request)),
+            ('newsfeed', len(activities),
+             lambda s: serializers.NewsFeedSerializer(newsfeeds[s], many=True).data,
+             lambda s: fastpath.newsfeed_rows(fastpath.newsfeed_values(newsfeeds)[s])),
+            ('likes', len(users),
+             lambda s: serializers.UserSerializer([like.user for like in newsfeed.like_set.select_related('user')
+                                                   .order_by('id')[s]], many=True).data,
+             lambda s: fastpath.liker_rows(fastpath.liker_values(newsfeed).order_by('id')[s])),
+            ('comments', len(users),
+             lambda s: serializers.CommentSerializer(comments[s], many=True).data,
+             lambda s: fastpath.comment_rows(fastpath.comment_values(comments)[s])),
+        ]
+        renderer, fast_renderer = JSONRenderer(), fastpath.FastJSONRenderer()
+        for name, total, reference, fast in endpoints:
+            pages = [slice(start, start + page_size)
+                     for start in rng.choices(range(0, max(1, total - page_size + 1)), k=queries)]
+            for s in pages[:5]:
+                assert renderer.render(reference(s)) == fast_renderer.render(fast(s)), f'{name}: output differs'
+
+            rows = sum(len(reference(s)) for s in pages[:1]) or 1
+            reference_ms, reference_p95 = timed(lambda i: renderer.render(reference(pages[i])), queries)
+            fast_ms, fast_p95 = timed(lambda i: fast_renderer.render(fast(pages[i])), queries)
+            out(f'{name}: serializer {rows / reference_ms * 1000:.0f} rows/s (p95 {reference_p95:.1f} ms/page), '
+                f'fast path {rows / fast_ms * 1000:.0f} rows/s (p95 {fast_p95:.1f} ms/page), '
+                f'{reference_ms / fast_ms:.1f}x, output identical')
+        out(f'JSON encoder: {"orjson" if fastpath.orjson else "json (orjson not installed)"}')
+    finally:
+        if not keep:
+            fixture.cleanup()
+            Tag.objects.filter(name__startswith=fixture.prefix).delete()
@@ -0,0 +1,156 @@
+"""
+Phản hồi có điều kiện (ETag / Last-Modified, 304) và bộ nhớ đệm phản hồi cho các API chỉ đọc.
+
+Mỗi loại dữ liệu có một số hiệu phiên bản (DataVersion) được signal tăng khi ghi. Validator của một
+phản hồi là các phiên bản nó phụ thuộc kèm đường dẫn, tham số và phạm vi người dùng nên kiểm tra chỉ
+tốn một truy vấn; khóa cache chứa luôn các phiên bản nên khi dữ liệu đổi, bản cũ tự hết hiệu lực.
+Giá trị đổi liên tục (bộ đếm thích / bình luận) không có phiên bản chung mà được đọc lại cho từng trang
+(xem tham số live của conditional_response), để mỗi lượt thích không làm mất cache của mọi người dùng.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from scores.models import Activity, Category, DataVersion, NewsFeed, Participation, Tag
+
+CATEGORIES = 'api:categories'
+ACTIVITIES = 'api:activities'
+PARTICIPATIONS = 'api:participations'
+NEWSFEED = 'api:newsfeed'
+
+CACHE_TIMEOUT = getattr(settings, 'SCORES_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def bump(*names):
+    for name in names:
+        DataVersion.bump(name)
+
+
+def versions(names):
+    current = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    return [current.get(name, 0) for name in names]
+
+
+class ConditionalResponseMixin:
+    """
+    Cho list() (và các action gọi conditional_response) trả 304 khi dữ liệu chưa đổi, và lưu phản hồi
+    đầy đủ vào cache. Lớp con khai báo version_names; per_user = True nếu nội dung khác nhau theo người dùng.
+    """
+    version_names = ()
+    per_user = False
+
+    def get_version_names(self):
+        return list(self.version_names)
+
+    def get_cache_scope(self, request):
+        if not self.per_user:
+            return 'public'
+        return f'user:{request.user.pk}' if request.user.is_authenticated else 'anonymous'
+
+    def conditional_response(self, request, build, names=None, live=None):
+        """
+        live: hàm nhận dữ liệu trang (từ cache) và trả về (dữ liệu đã phủ các giá trị hiện tại, các giá trị đó).
+        Khi có live, phần cache dùng chung cho mọi người dùng và ETag tính thêm từ các giá trị hiện tại.
+        """
+        names = self.get_version_names() if names is None else names
+        current = versions(names)
+        # Đường dẫn tuyệt đối: phản hồi có link next / ảnh theo host của yêu cầu
+        uri = request.build_absolute_uri(request.path)
+        params = sorted(request.query_params.lists())
+        if live is not None:
+            return self.live_response(request, build, live, repr((uri, params, current)))
+
+        key = repr((uri, params, self.get_cache_scope(request), current))
+        digest = hashlib.md5(key.encode()).hexdigest()
+        etag = quote_etag(digest)
+        # Phiên bản lấy theo thời gian (ns) nên phiên bản lớn nhất cũng là thời điểm đổi gần nhất
+        last_modified = max(current) // 10 ** 9 if max(current, default=0) else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            cache_key = f'scores:response:{digest}'
+            data = cache.get(cache_key)
+            if data is None:
+                response = build()
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data, CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        if self.per_user:
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def live_response(self, request, build, live, key):
+        cache_key = f'scores:response:{hashlib.md5(key.encode()).hexdigest()}'
+        data = cache.get(cache_key)
+        if data is None:
+            response = build()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(cache_key, data, CACHE_TIMEOUT)
+
+        data, values = live(data)
+        # Không có Last-Modified: giá trị hiện tại không gắn với phiên bản theo thời gian
+        etag = quote_etag(hashlib.md5(repr((key, self.get_cache_scope(request), values)).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag) or Response(data)
+        response['ETag'] = etag
+        if self.per_user:
+            patch_cache_control(response, private=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, lambda: super(ConditionalResponseMixin, self).list(
+            request, *args, **kwargs))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_categories(sender, raw=False, **kwargs):
+    # Tên danh mục có trong chỉ mục tìm kiếm hoạt động
+    if not raw:
+        bump(CATEGORIES, ACTIVITIES)
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_activities(sender, raw=False, **kwargs):
+    if not raw:
+        bump(ACTIVITIES)
+
+
+@receiver(m2m_changed, sender=Activity.tags.through)
+def bump_activity_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(ACTIVITIES)
+
+
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def bump_participations(sender, raw=False, **kwargs):
+    if not raw:
+        bump(PARTICIPATIONS)
+
+
+@receiver(post_save, sender=NewsFeed)
+@receiver(post_delete, sender=NewsFeed)
+def bump_newsfeed(sender, raw=False, **kwargs):
+    # Thích / bình luận không tăng phiên bản: bộ đếm và liked_by_me được đọc lại cho từng trang
+    if not raw:
+        bump(NEWSFEED)
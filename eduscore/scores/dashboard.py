@@ -0,0 +1,99 @@
+"""
+Bảng điều khiển của một sinh viên: danh sách tham gia kèm tóm tắt hoạt động, điểm theo nhóm / tiêu chí
+(đã chặn theo điểm tối đa của nhóm) và thứ hạng, trả về trong một yêu cầu.
+
+Phần lịch sử và điểm được lưu cache theo từng sinh viên. Khóa cache gồm User.score_sequence (sequence nhật ký
+điểm của chính sinh viên, ghi cùng tổng điểm nên đường ghi điểm không phải ghi thêm gì), phiên bản danh sách
+tham gia của sinh viên, phiên bản hoạt động và phiên bản thang điểm. Thay đổi không đi qua sổ điểm (vd. điểm
+chuyển tiêu chí trong cùng nhóm khi ghi hàng loạt) có thể hiển thị cũ tối đa caching.CACHE_TIMEOUT; khi sinh
+viên còn trong hàng đợi tính lại thì không dùng cache.
+Hồ sơ, tổng điểm và thứ hạng luôn đọc trực tiếp (thứ hạng là các phép đếm trên chỉ mục, số truy vấn cố định).
+"""
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from scores import caching, fastpath, leaderboard, scheme, scoring
+from scores.models import DataVersion, DisciplinePoint, Participation, User
+
+PARTICIPATION_FIELDS = ['id', 'is_completed', 'created_date', 'activity', 'activity__title', 'activity__start_date',
+                        'activity__end_date', 'activity__status', 'activity__category__name']
+
+
+def participations_version_name(student_id):
+    return f'api:dashboard:participations:{student_id}'
+
+
+def students():
+    # Hồ sơ, lớp, khoa và tổng điểm trong một truy vấn
+    return User.objects.select_related('student_class', 'department').only(
+        'id', 'username', 'first_name', 'last_name', 'total_score', 'score_sequence', 'student_class_id',
+        'department_id', 'is_active', 'is_staff', 'is_superuser', 'student_class__name', 'department__name')
+
+
+def participation_rows(student_id):
+    """Các lần tham gia mới nhất trước, nối sẵn hoạt động và danh mục trong một truy vấn."""
+    rows = Participation.objects.filter(student_id=student_id, active=True).order_by('-created_date', '-id') \
+        .values(*PARTICIPATION_FIELDS)
+    return [{
+        'id': row['id'], 'is_completed': row['is_completed'], 'created_date': fastpath.iso_datetime(row['created_date']),
+        'activity': {'id': row['activity'], 'title': row['activity__title'],
+                     'start_date': row['activity__start_date'].isoformat(),
+                     'end_date': row['activity__end_date'].isoformat(),
+                     'status': row['activity__status'], 'category': row['activity__category__name']},
+    } for row in rows]
+
+
+def breakdown(student_id, evaluation_scheme):
+    """Điểm theo nhóm (thô và đã chặn) kèm điểm từng tiêu chí; tổng là tổng điểm đã chặn của các nhóm."""
+    sums = {row['criteria_id']: row for row in DisciplinePoint.objects.filter(student_id=student_id)
+            .values('criteria_id').annotate(score=Sum('score'), point_count=Count('id')).order_by()}
+
+    groups = []
+    total = 0
+    for group_id, group in sorted(evaluation_scheme.groups.items()):
+        criteria = []
+        for criteria_id in sorted(evaluation_scheme.group_criteria.get(group_id, [])):
+            row = sums.get(criteria_id, {})
+            criteria.append({'id': criteria_id, 'name': evaluation_scheme.criteria[criteria_id]['name'],
+                             'score': row.get('score') or 0, 'point_count': row.get('point_count', 0)})
+        raw = sum(c['score'] for c in criteria)
+        capped = min(raw, group['max_score'])
+        total += capped
+        groups.append({'id': group_id, 'name': group['name'], 'max_score': group['max_score'],
+                       'raw_score': raw, 'score': capped, 'criteria': criteria})
+    return {'total_score': total, 'groups': groups}
+
+
+def get_dashboard(student):
+    """student lấy từ students(). Phần được cache tính lại chỉ khi dữ liệu của sinh viên đã đổi."""
+    evaluation_scheme = scheme.get_scheme()
+    pending = scoring.is_pending(student.pk)
+    current = caching.versions([participations_version_name(student.pk), caching.ACTIVITIES])
+    key = f'scores:dashboard:{student.pk}:{student.score_sequence}-{"-".join(map(str, current))}-' \
+          f'{evaluation_scheme.version}'
+    data = None if pending else cache.get(key)
+    if data is None:
+        data = {'participations': participation_rows(student.pk),
+                'breakdown': breakdown(student.pk, evaluation_scheme)}
+        if not pending:
+            cache.set(key, data, caching.CACHE_TIMEOUT)
+
+    return {
+        'student': {'id': student.pk, 'username': student.username, 'first_name': student.first_name,
+                    'last_name': student.last_name,
+                    'class': student.student_class.name if student.student_class_id else None,
+                    'department': student.department.name if student.department_id else None},
+        'total_score': student.total_score,
+        'pending': pending,
+        **data,
+        'ranks': leaderboard.student_ranks(student),
+    }
+
+
+@receiver(post_save, sender=Participation)
+@receiver(post_delete, sender=Participation)
+def invalidate_participation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DataVersion.bump(participations_version_name(instance.student_id))
@@ -0,0 +1,122 @@
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from scores.models import DisciplinePoint
+
+CSV_HEADER = ['Student', 'Full Name', 'Class', 'Department', 'Activity', 'Group', 'Criteria', 'Score',
+              'Created At']
+CSV_FIELDS = ['pk', 'student__username', 'student__first_name', 'student__last_name',
+              'student__student_class__name', 'student__department__name', 'activity__title',
+              'criteria__group__name', 'criteria__name', 'score', 'created_date']
+
+ROSTER_HEADER = ['Student', 'Full Name', 'Class', 'Department', 'Completed', 'Has Proof', 'Registered At']
+ROSTER_FIELDS = ['pk', 'student__username', 'student__first_name', 'student__last_name',
+                 'student__student_class__name', 'student__department__name', 'is_completed', 'proof', 'created_date']
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Đối tượng giả file cho csv.writer: write() trả về chính dòng vừa ghi thay vì lưu lại."""
+
+    def write(self, value):
+        return value
+
+
+def _day_start(value, name):
+    d = parse_date(value)
+    if d is None:
+        raise ValueError(f'Invalid {name}: {value!r}, expected YYYY-MM-DD')
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def filter_points(params):
+    """
+    Lọc DisciplinePoint theo tham số class, department, activity, date_from, date_to (YYYY-MM-DD, tính cả
+    ngày cuối). Tham số sai định dạng -> ValueError.
+    """
+    points = DisciplinePoint.objects.all()
+    for param, field in [('class', 'student__student_class_id'), ('department', 'student__department_id'),
+                         ('activity', 'activity_id')]:
+        value = params.get(param)
+        if value:
+            if not value.isdigit():
+                raise ValueError(f'Invalid {param}: {value!r}')
+            points = points.filter(**{field: int(value)})
+
+    if params.get('date_from'):
+        points = points.filter(created_date__gte=_day_start(params['date_from'], 'date_from'))
+    if params.get('date_to'):
+        points = points.filter(created_date__lt=_day_start(params['date_to'], 'date_to') + timedelta(days=1))
+    return points
+
+
+def iter_rows(points, chunk_size=None, fields=None):
+    """
+    Duyệt các dòng (bỏ cột pk đầu tiên của fields) theo từng khối chunk_size, phân trang theo khóa chính.
+    Không dùng một con trỏ duy nhất vì driver MySQL đọc cả tập kết quả vào bộ nhớ.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    points = points.order_by('pk').values_list(*(fields or CSV_FIELDS))
+    last_pk = 0
+    while True:
+        rows = list(points.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            return
+        for row in rows:
+            yield row[1:]
+        last_pk = rows[-1][0]
+
+
+def encode(lines, compress=False):
+    """Mã hóa UTF-8 các đoạn văn bản; compress=True thì nén gzip dần theo luồng."""
+    if not compress:
+        for chunk in lines:
+            yield chunk.encode('utf-8')
+        return
+
+    # wbits=31: định dạng gzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in lines:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def csv_lines(header, rows, chunk_size=None):
+    """Các đoạn CSV, mỗi đoạn chunk_size dòng."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    writer = csv.writer(Echo())
+    # BOM để Excel nhận đúng UTF-8 (tên tiếng Việt)
+    yield '\ufeff' + writer.writerow(header)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(points, compress=False, chunk_size=None):
+    """Sinh nội dung CSV (bytes) từng phần; compress=True thì nén gzip dần theo luồng."""
+    rows = ([username, f'{last_name} {first_name}'.strip(), class_name or '', department_name or '',
+             activity, group, criteria, score, created_date.isoformat()]
+            for username, first_name, last_name, class_name, department_name, activity, group, criteria, score,
+            created_date in iter_rows(points, chunk_size))
+    return encode(csv_lines(CSV_HEADER, rows, chunk_size), compress)
+
+
+def stream_roster_csv(participations, compress=False, chunk_size=None):
+    """Danh sách sinh viên tham gia hoạt động dưới dạng CSV (bytes), ghi dần như stream_csv."""
+    rows = ([username, f'{last_name} {first_name}'.strip(), class_name or '', department_name or '',
+             'yes' if completed else 'no', 'yes' if proof else 'no', created_date.isoformat()]
+            for username, first_name, last_name, class_name, department_name, completed, proof, created_date
+            in iter_rows(participations, chunk_size, ROSTER_FIELDS))
+    return encode(csv_lines(ROSTER_HEADER, rows, chunk_size), compress)
@@ -0,0 +1,187 @@
+"""
+Đường nhanh chỉ-đọc cho các API danh sách: dựng dict trực tiếp từ các dòng values() thay vì đi qua
+field của DRF, phần đầu URL (ảnh tĩnh, Cloudinary) chỉ dựng một lần cho mỗi yêu cầu.
+
+Kết quả phải giống từng byte với serializer tương ứng; `manage.py benchmark serialization` và test
+kiểm tra điều này. Khi thêm field vào serializer nhớ sửa cả hàm ở đây.
+"""
+import re
+
+from cloudinary import CloudinaryResource
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+from rest_framework.renderers import JSONRenderer
+
+from scores.models import Tag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ACTIVITY_FIELDS = ['id', 'title', 'description', 'start_date', 'end_date', 'created_by', 'capacity', 'status',
+                   'category', 'image']
+NEWSFEED_FIELDS = ['id', 'activity', 'created_date', 'like_count', 'comment_count', 'liked_by_me']
+USER_FIELDS = ['id', 'username', 'first_name', 'last_name', 'avatar']
+ROSTER_FIELDS = ['id', 'student', 'student__username', 'student__first_name', 'student__last_name',
+                 'student__student_class__name', 'student__department__name', 'is_completed', 'proof', 'created_date']
+COMMENT_FIELDS = ['id', 'user', 'user__username', 'user__avatar', 'newsfeed', 'content', 'created_date']
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer dùng orjson nếu có cài đặt, cho cùng kết quả với JSONRenderer (dạng gọn).
+    Kiểu orjson tự định dạng khác DRF (datetime, ...) hoặc không hỗ trợ thì quay về JSONRenderer.
+    Lưu ý: số thực dạng mũ khác cách viết (1e16 / 1e+16) nên chỉ dùng cho API không trả số thực.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:  # gồm cả orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def iso_datetime(value):
+    # Giống serializers.DateTimeField (ISO 8601 theo múi giờ hiện tại, UTC viết là Z)
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def image_prefix(request):
+    """Phần đầu URL ảnh tĩnh như BaseSerializer.get_image; None nếu không có request."""
+    return request.build_absolute_uri('/static/') if request is not None else None
+
+
+def image_url(name, prefix):
+    if not name:
+        return None
+    if name.startswith('http'):
+        return name
+    return prefix + iri_to_uri(name) if prefix is not None else None
+
+
+class CloudinaryUrls:
+    """URL ảnh Cloudinary như resource.url, phần đầu (theo cấu hình) dựng một lần cho mỗi loại tài nguyên."""
+    SIMPLE_PUBLIC_ID = re.compile(r'[A-Za-z0-9_\-/]+')
+
+    def __init__(self):
+        self.prefixes = {}
+
+    def url(self, resource):
+        if not resource:
+            return ''
+        # Public id có ký tự cần mã hóa hoặc không có version: để thư viện tự dựng
+        if not resource.version or not self.SIMPLE_PUBLIC_ID.fullmatch(resource.public_id or ''):
+            return resource.url
+        key = (resource.resource_type, resource.type)
+        prefix = self.prefixes.get(key)
+        if prefix is None:
+            probe = CloudinaryResource('x', format='jpg', version='1', type=resource.type,
+                                       resource_type=resource.resource_type)
+            prefix = self.prefixes[key] = probe.url[:-len('v1/x.jpg')]
+        url = f'{prefix}v{resource.version}/{resource.public_id}'
+        return f'{url}.{resource.format}' if resource.format else url
+
+
+def values(queryset, fields, ordering=()):
+    """queryset.values(*fields) kèm các cột sắp xếp mà phân trang theo con trỏ cần đọc từ dòng cuối."""
+    extra = [f.lstrip('-') for f in ordering if f.lstrip('-') not in fields and f.lstrip('-') != 'pk']
+    return queryset.values(*fields, *extra)
+
+
+def category_values(queryset):
+    return queryset.values('id', 'name')
+
+
+def category_rows(rows):
+    return list(rows)
+
+
+def activity_values(queryset, ordering=()):
+    return values(queryset.prefetch_related(None), ACTIVITY_FIELDS, ordering)
+
+
+def activity_rows(rows, request=None):
+    """Như ActivityDetailsSerializer(many=True); thẻ của cả trang lấy bằng một truy vấn."""
+    rows = list(rows)
+    tags = {row['id']: [] for row in rows}
+    # Cùng truy vấn với prefetch_related('tags') nên thẻ có cùng thứ tự
+    for activity_id, tag_id, name in Tag.objects.filter(activity__in=list(tags)) \
+            .values_list('activity__id', 'id', 'name'):
+        tags[activity_id].append({'id': tag_id, 'name': name})
+
+    prefix = image_prefix(request)
+    return [{
+        'id': row['id'], 'title': row['title'], 'description': row['description'],
+        'start_date': row['start_date'].isoformat(), 'end_date': row['end_date'].isoformat(),
+        'created_by': row['created_by'], 'capacity': row['capacity'], 'status': row['status'],
+        'category': row['category'], 'image': image_url(row['image'], prefix), 'tags': tags[row['id']],
+    } for row in rows]
+
+
+def newsfeed_values(queryset, ordering=()):
+    # liked_by_me chỉ có khi queryset được annotate (feed.liked_subquery); NewsFeedViewSet.list không annotate mà
+    # phủ like_count, comment_count, liked_by_me lên trang bằng feed.live_counters (live() của conditional_response)
+    fields = NEWSFEED_FIELDS if 'liked_by_me' in queryset.query.annotations else NEWSFEED_FIELDS[:-1]
+    return values(queryset, fields, ordering)
+
+
+def newsfeed_rows(rows):
+    return [{
+        'id': row['id'], 'activity': row['activity'], 'created_date': iso_datetime(row['created_date']),
+        'like_count': row['like_count'], 'comment_count': row['comment_count'],
+        'liked_by_me': row.get('liked_by_me', False),
+    } for row in rows]
+
+
+def user_rows(rows):
+    """Như UserSerializer(many=True) với các dòng values(*USER_FIELDS)."""
+    urls = CloudinaryUrls()
+    return [{
+        'id': row['id'], 'username': row['username'], 'first_name': row['first_name'],
+        'last_name': row['last_name'], 'avatar': urls.url(row['avatar']),
+    } for row in rows]
+
+
+def liker_values(newsfeed):
+    return newsfeed.like_set.values(*[f'user__{f}' for f in USER_FIELDS])
+
+
+def liker_rows(rows):
+    return user_rows({f: row[f'user__{f}'] for f in USER_FIELDS} for row in rows)
+
+
+def comment_values(queryset, ordering=()):
+    return values(queryset, COMMENT_FIELDS, ordering)
+
+
+def comment_rows(rows):
+    urls = CloudinaryUrls()
+    return [{
+        'id': row['id'], 'user': row['user'],
+        'author': {'id': row['user'], 'username': row['user__username'], 'avatar': urls.url(row['user__avatar'])},
+        'newsfeed': row['newsfeed'], 'content': row['content'], 'created_date': iso_datetime(row['created_date']),
+    } for row in rows]
+
+
+def roster_values(queryset):
+    # Một truy vấn nối sinh viên, lớp, khoa cho cả trang
+    return queryset.values(*ROSTER_FIELDS)
+
+
+def roster_rows(rows):
+    return [{
+        'id': row['id'],
+        'student': {'id': row['student'], 'username': row['student__username'],
+                    'first_name': row['student__first_name'], 'last_name': row['student__last_name'],
+                    'class': row['student__student_class__name'], 'department': row['student__department__name']},
+        'is_completed': row['is_completed'], 'has_proof': bool(row['proof']),
+        'created_date': iso_datetime(row['created_date']),
+    } for row in rows]
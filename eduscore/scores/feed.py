@@ -0,0 +1,171 @@
+import hashlib
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from scores.models import Comment, Like, NewsFeed, PendingLike
+
+MODE_SYNC = 'sync'
+MODE_BUFFERED = 'buffered'
+DELETE_CHUNK_SIZE = 200
+
+
+def is_buffered():
+    return getattr(settings, 'SCORES_LIKE_MODE', MODE_SYNC) == MODE_BUFFERED
+
+
+def like_count_subquery():
+    return Coalesce(Subquery(Like.objects.filter(newsfeed=OuterRef('pk')).order_by()
+                             .values('newsfeed').annotate(n=Count('id')).values('n')), 0)
+
+
+def comment_count_subquery():
+    return Coalesce(Subquery(Comment.objects.filter(newsfeed=OuterRef('pk'), active=True).order_by()
+                             .values('newsfeed').annotate(n=Count('id')).values('n')), 0)
+
+
+def refresh_counters(newsfeed_ids=None):
+    """Đếm lại like_count / comment_count từ bảng Like, Comment (sau khi ghi hàng loạt bỏ qua signal)."""
+    newsfeeds = NewsFeed.objects.all()
+    if newsfeed_ids is not None:
+        newsfeeds = newsfeeds.filter(pk__in=newsfeed_ids)
+    return newsfeeds.update(like_count=like_count_subquery(), comment_count=comment_count_subquery())
+
+
+def thread_comments(newsfeed):
+    """Bình luận đang hiển thị của newsfeed kèm thông tin người viết (một truy vấn cho cả trang)."""
+    return newsfeed.comment_set.filter(active=True).select_related('user') \
+        .only('id', 'user_id', 'newsfeed_id', 'content', 'created_date', 'user__username', 'user__avatar')
+
+
+def comments_etag(newsfeed, params=()):
+    """
+    ETag của luồng bình luận: đổi khi có bình luận mới (id mới nhất) hoặc bị xóa / ẩn (comment_count),
+    kèm tham số trang. Chỉ tốn một truy vấn tìm theo chỉ mục (newsfeed, created_date, id).
+    """
+    latest = thread_comments(newsfeed).order_by('-created_date', '-id').values_list('id', flat=True).first()
+    key = repr((newsfeed.pk, newsfeed.comment_count, latest, sorted(params)))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def liked_subquery(user):
+    """Người dùng đã thích newsfeed chưa, tính cả thao tác còn chờ trong hàng đợi (nếu có)."""
+    liked = Exists(Like.objects.filter(newsfeed=OuterRef('pk'), user=user))
+    if not is_buffered():
+        return liked
+    return Coalesce(Subquery(PendingLike.objects.filter(newsfeed=OuterRef('pk'), user=user).values('liked')[:1]),
+                    liked)
+
+
+def live_counters(user, newsfeed_ids):
+    """
+    {id: (like_count, comment_count, liked_by_me)} hiện tại của các newsfeed trong một trang, một truy vấn
+    theo khóa chính; phủ lên trang newsfeed đã cache (dùng chung cho mọi người dùng).
+    """
+    newsfeeds = NewsFeed.objects.filter(pk__in=newsfeed_ids) \
+        .annotate(liked=liked_subquery(user) if user.is_authenticated else Value(False))
+    return {pk: (like_count, comment_count, bool(liked))
+            for pk, like_count, comment_count, liked in newsfeeds.values_list('id', 'like_count', 'comment_count',
+                                                                               'liked')}
+
+
+def is_liked(user, newsfeed):
+    return NewsFeed.objects.filter(pk=newsfeed.pk).annotate(liked=liked_subquery(user)) \
+        .values_list('liked', flat=True).first() or False
+
+
+def set_like(user, newsfeed, liked):
+    """
+    Đặt trạng thái thích (idempotent): gọi lại với cùng giá trị không đổi gì.
+    Chế độ buffered chỉ ghi một dòng PendingLike (upsert), không chạm tới Like hay bộ đếm của newsfeed.
+    """
+    if is_buffered():
+        # MySQL (ON DUPLICATE KEY UPDATE) không nhận unique_fields
+        unique_fields = ['user', 'newsfeed'] if connection.features.supports_update_conflicts_with_target else None
+        PendingLike.objects.bulk_create(
+            [PendingLike(user=user, newsfeed=newsfeed, liked=liked, requested_date=timezone.now())],
+            update_conflicts=True, update_fields=['liked', 'requested_date'], unique_fields=unique_fields,
+        )
+        return
+
+    if liked:
+        try:
+            with transaction.atomic():
+                Like.objects.create(user=user, newsfeed=newsfeed)
+        except IntegrityError:
+            pass  # đã thích (có thể do yêu cầu song song)
+    else:
+        # delete() vẫn gửi post_delete cho từng dòng nên like_count giảm đúng số dòng đã xóa
+        Like.objects.filter(user=user, newsfeed=newsfeed).delete()
+
+
+def flush_likes(batch_size=1000):
+    """
+    Ghi một lô thao tác thích đang chờ vào Like rồi đếm lại like_count của các newsfeed liên quan
+    (mỗi newsfeed một lần cho cả lô). Trả về số thao tác đã ghi.
+    """
+    with transaction.atomic():
+        pending = PendingLike.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Nhiều worker chạy song song sẽ lấy các lô khác nhau
+            pending = pending.select_for_update(skip_locked=True)
+        pending = list(pending.values_list('id', 'user_id', 'newsfeed_id', 'liked', 'requested_date')[:batch_size])
+        if not pending:
+            return 0
+
+        Like.objects.bulk_create([Like(user_id=user_id, newsfeed_id=newsfeed_id)
+                                  for pk, user_id, newsfeed_id, liked, requested_date in pending if liked],
+                                 ignore_conflicts=True)
+        unliked = {}
+        for pk, user_id, newsfeed_id, liked, requested_date in pending:
+            if not liked:
+                unliked.setdefault(newsfeed_id, []).append(user_id)
+        for newsfeed_id, user_ids in unliked.items():
+            Like.objects.filter(newsfeed_id=newsfeed_id, user_id__in=user_ids).delete()
+
+        newsfeed_ids = {newsfeed_id for pk, user_id, newsfeed_id, liked, requested_date in pending}
+        NewsFeed.objects.filter(pk__in=newsfeed_ids).update(like_count=like_count_subquery())
+
+        # Chỉ xóa các thao tác không bị gửi lại trong lúc đang ghi (chia nhỏ để điều kiện OR không quá sâu)
+        for start in range(0, len(pending), DELETE_CHUNK_SIZE):
+            done = Q()
+            for pk, user_id, newsfeed_id, liked, requested_date in pending[start:start + DELETE_CHUNK_SIZE]:
+                done |= Q(pk=pk, requested_date=requested_date)
+            PendingLike.objects.filter(done).delete()
+
+    return len(pending)
+
+
+@receiver(post_save, sender=Like)
+def count_like(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        NewsFeed.objects.filter(pk=instance.newsfeed_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_delete, sender=Like)
+def uncount_like(sender, instance, **kwargs):
+    NewsFeed.objects.filter(pk=instance.newsfeed_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.active:
+            NewsFeed.objects.filter(pk=instance.newsfeed_id).update(comment_count=F('comment_count') + 1)
+    elif update_fields is None or 'active' in update_fields:
+        # Bình luận có thể vừa bị ẩn / hiện lại: đếm lại (COUNT dùng chỉ mục (newsfeed, ...))
+        refresh_counters([instance.newsfeed_id])
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.active:
+        NewsFeed.objects.filter(pk=instance.newsfeed_id, comment_count__gt=0) \
+            .update(comment_count=F('comment_count') - 1)
@@ -0,0 +1,121 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from scores import scheme
+from scores.models import Activity, Tag
+
+ActivityTag = Activity.tags.through
+
+ACTIVITY_STATUSES = {value for value, label in Activity._meta.get_field('status').choices}
+
+
+def split_param(params, name):
+    value = params.get(name)
+    return [v.strip() for v in value.split(',') if v.strip()] if value else []
+
+
+def parse_ids(params, name):
+    values = split_param(params, name)
+    if not all(v.isdigit() for v in values):
+        raise ValidationError({name: 'A comma separated list of integers is required.'})
+    return [int(v) for v in values]
+
+
+def parse_day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValidationError({name: 'A date in YYYY-MM-DD format is required.'})
+    return day
+
+
+def filter_activities(queryset, params):
+    """
+    Lọc hoạt động theo tags (a,b,c; tags_match=all|any), category_id / categories (1,2,3), status (open,closed),
+    date_from / date_to (hoạt động diễn ra giao với khoảng ngày).
+
+    Lọc thẻ bằng EXISTS trên bảng trung gian (có chỉ mục (activity, tag)) thay vì JOIN,
+    nên mỗi hoạt động chỉ xuất hiện một lần dù có nhiều thẻ khớp.
+    """
+    tag_names = split_param(params, 'tags')
+    if params.get('tag'):
+        tag_names.append(params['tag'])
+    if tag_names:
+        match = params.get('tags_match', 'any')
+        if match not in ('all', 'any'):
+            raise ValidationError({'tags_match': 'Must be one of all, any.'})
+
+        tag_ids = set(Tag.objects.filter(name__in=tag_names).values_list('id', flat=True))
+        if match == 'all':
+            if len(tag_ids) < len(set(tag_names)):
+                return queryset.none()
+            for tag_id in tag_ids:
+                queryset = queryset.filter(Exists(ActivityTag.objects.filter(activity_id=OuterRef('pk'),
+                                                                             tag_id=tag_id)))
+        else:
+            queryset = queryset.filter(Exists(ActivityTag.objects.filter(activity_id=OuterRef('pk'),
+                                                                         tag_id__in=tag_ids)))
+
+    category_ids = parse_ids(params, 'categories') + parse_ids(params, 'category_id')
+    if category_ids:
+        queryset = queryset.filter(category_id__in=category_ids)
+
+    statuses = split_param(params, 'status')
+    if statuses:
+        if not set(statuses) <= ACTIVITY_STATUSES:
+            raise ValidationError({'status': f'Must be among {", ".join(sorted(ACTIVITY_STATUSES))}.'})
+        queryset = queryset.filter(status__in=statuses)
+
+    for name, lookup in [('date_from', 'end_date__gte'), ('date_to', 'start_date__lte')]:
+        day = parse_day(params, name)
+        if day:
+            queryset = queryset.filter(**{lookup: day})
+
+    return queryset
+
+
+def filter_roster(queryset, params):
+    """Lọc danh sách tham gia theo completed (true|false), class, department (id)."""
+    completed = params.get('completed')
+    if completed:
+        if completed.lower() not in ('true', 'false', '1', '0'):
+            raise ValidationError({'completed': 'Must be one of true, false.'})
+        queryset = queryset.filter(is_completed=completed.lower() in ('true', '1'))
+
+    for name, lookup in [('class', 'student__student_class_id__in'), ('department', 'student__department_id__in')]:
+        ids = parse_ids(params, name)
+        if ids:
+            queryset = queryset.filter(**{lookup: ids})
+    return queryset
+
+
+def filter_points(queryset, params):
+    """
+    Lọc điểm rèn luyện theo student_id, class, department, activity, criteria, group (id, a,b,c) và
+    date_from / date_to (ngày tạo). Nhóm được đổi thành danh sách tiêu chí theo thang điểm nên không cần JOIN;
+    ngày được đổi thành khoảng thời gian để dùng được chỉ mục trên created_date.
+    """
+    for name, lookup in [('student_id', 'student_id__in'), ('class', 'student__student_class_id__in'),
+                         ('department', 'student__department_id__in'), ('activity', 'activity_id__in'),
+                         ('criteria', 'criteria_id__in')]:
+        ids = parse_ids(params, name)
+        if ids:
+            queryset = queryset.filter(**{lookup: ids})
+
+    group_ids = parse_ids(params, 'group')
+    if group_ids:
+        group_criteria = scheme.get_scheme().group_criteria
+        queryset = queryset.filter(criteria_id__in=[c for g in group_ids for c in group_criteria.get(g, [])])
+
+    for name, lookup, offset in [('date_from', 'created_date__gte', 0), ('date_to', 'created_date__lt', 1)]:
+        day = parse_day(params, name)
+        if day:
+            start = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+            queryset = queryset.filter(**{lookup: start})
+    return queryset
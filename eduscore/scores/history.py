@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.utils import timezone
+
+from scores.models import ScoreEvent, ScoreSnapshot, StudentGroupScore
+
+# Cứ mỗi SNAPSHOT_INTERVAL sự kiện của một sinh viên thì chụp lại toàn bộ điểm,
+# nên truy vấn theo thời điểm chỉ phát lại tối đa chừng ấy sự kiện
+SNAPSHOT_INTERVAL = getattr(settings, 'SCORES_SNAPSHOT_INTERVAL', 50)
+
+
+def record_events(events, sequences):
+    """
+    Ghi các ScoreEvent (chưa có sequence / created_date) sau khi sổ điểm đã được cập nhật.
+    sequences là {student_id: User.score_sequence} đọc từ các dòng User đang bị khóa (scoring.lock_students),
+    được cập nhật tại chỗ; người gọi ghi lại User.score_sequence cùng câu UPDATE tổng điểm, nên không cần
+    truy vấn MAX(sequence).
+    """
+    if not events:
+        return
+
+    now = timezone.now()
+    due = {}
+    for e in events:
+        e.sequence = sequences[e.student_id] + 1
+        e.created_date = now
+        sequences[e.student_id] = e.sequence
+        if e.sequence % SNAPSHOT_INTERVAL == 0:
+            due[e.student_id] = e
+    ScoreEvent.objects.bulk_create(events, batch_size=1000)
+
+    take_snapshots(due, now)
+
+
+def take_snapshots(last_events, at=None):
+    """Chụp điểm hiện tại của các sinh viên; last_events là {student_id: sự kiện cuối vừa ghi}."""
+    if not last_events:
+        return
+
+    group_scores = {student_id: {} for student_id in last_events}
+    for student_id, group_id, capped_score in StudentGroupScore.objects.filter(student_id__in=last_events) \
+            .values_list('student_id', 'group_id', 'capped_score'):
+        group_scores[student_id][str(group_id)] = capped_score
+
+    at = at or timezone.now()
+    ScoreSnapshot.objects.bulk_create([
+        ScoreSnapshot(student_id=student_id, sequence=e.sequence, group_scores=group_scores[student_id],
+                      total_score=e.total_score, created_date=at)
+        for student_id, e in last_events.items()
+    ], batch_size=1000)
+
+
+def score_as_of(student_id, at):
+    """Điểm theo nhóm và tổng điểm của sinh viên tại thời điểm `at`: snapshot gần nhất + phát lại phần đuôi."""
+    snapshot = ScoreSnapshot.objects.filter(student_id=student_id, created_date__lte=at) \
+        .order_by('-sequence').first()
+
+    groups = dict(snapshot.group_scores) if snapshot else {}
+    total_score = snapshot.total_score if snapshot else 0
+    sequence = snapshot.sequence if snapshot else 0
+
+    events = ScoreEvent.objects.filter(student_id=student_id, sequence__gt=sequence, created_date__lte=at) \
+        .order_by('sequence').values_list('sequence', 'group_id', 'group_score', 'total_score')
+    replayed = 0
+    for sequence, group_id, group_score, total_score in events:
+        groups[str(group_id)] = group_score
+        replayed += 1
+
+    return {
+        'student_id': student_id,
+        'as_of': at,
+        'total_score': total_score,
+        'group_scores': groups,
+        'sequence': sequence,
+        'events_replayed': replayed,
+    }
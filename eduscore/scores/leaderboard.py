@@ -0,0 +1,225 @@
+"""
+Bảng xếp hạng theo lớp / khoa / toàn trường.
+
+Mỗi phạm vi giữ số sinh viên theo từng mức tổng điểm (LeaderboardScore) và kích thước phạm vi (LeaderboardScope).
+Đường ghi điểm chuyển sinh viên từ mức điểm cũ sang mức mới (scoring.apply_point_delta, rebuild_ledger); User.save
+chuyển khi sinh viên đổi lớp / khoa / trạng thái. Thứ hạng = 1 + tổng số sinh viên ở các mức cao hơn, đọc trên
+bảng đếm (số mức điểm khác nhau nhỏ hơn nhiều so với số sinh viên), không đếm trên bảng User.
+
+Ghi User hàng loạt không qua save() (bulk_create, update()) phải gọi rebuild() sau đó.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from scores.models import Class, Department, LeaderboardScope, LeaderboardScore, User
+
+SCOPE_SCHOOL = 'school'
+SCOPE_DEPARTMENT = 'department'
+SCOPE_CLASS = 'class'
+SCOPES = (SCOPE_SCHOOL, SCOPE_DEPARTMENT, SCOPE_CLASS)
+SCHOOL_ID = 0
+
+# Các cột của User quyết định sinh viên được đếm trong những phạm vi nào
+MEMBER_FIELDS = ('student_class_id', 'department_id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def students():
+    return User.objects.filter(is_active=True, is_staff=False, is_superuser=False)
+
+
+def scopes_for(student_class_id, department_id):
+    scopes = [(SCOPE_SCHOOL, SCHOOL_ID)]
+    if department_id:
+        scopes.append((SCOPE_DEPARTMENT, department_id))
+    if student_class_id:
+        scopes.append((SCOPE_CLASS, student_class_id))
+    return scopes
+
+
+def member_scopes(student):
+    """Các phạm vi mà sinh viên được đếm; student là User hoặc dòng values() có đủ MEMBER_FIELDS."""
+    row = student if isinstance(student, dict) else {f: getattr(student, f) for f in MEMBER_FIELDS}
+    if not row['is_active'] or row['is_staff'] or row['is_superuser']:
+        return []
+    return scopes_for(row['student_class_id'], row['department_id'])
+
+
+def scope_students(scope, scope_id):
+    if scope == SCOPE_CLASS:
+        return students().filter(student_class_id=scope_id)
+    if scope == SCOPE_DEPARTMENT:
+        return students().filter(department_id=scope_id)
+    return students()
+
+
+def scope_filter(scopes):
+    q = Q()
+    for scope, scope_id in scopes:
+        q |= Q(scope=scope, scope_id=scope_id)
+    return q
+
+
+def apply_moves(moves):
+    """
+    Cập nhật bảng đếm theo danh sách (scopes, old_total, new_total): sinh viên rời mức old_total và vào mức
+    new_total trong mỗi phạm vi của scopes; old_total = None khi sinh viên mới vào phạm vi, new_total = None khi rời.
+    """
+    counts = {}
+    sizes = {}
+    for scopes, old_total, new_total in moves:
+        for scope in scopes:
+            if old_total is not None:
+                counts[(*scope, old_total)] = counts.get((*scope, old_total), 0) - 1
+                sizes[scope] = sizes.get(scope, 0) - 1
+            if new_total is not None:
+                counts[(*scope, new_total)] = counts.get((*scope, new_total), 0) + 1
+                sizes[scope] = sizes.get(scope, 0) + 1
+
+    with transaction.atomic(savepoint=False):
+        add(LeaderboardScore, ('scope', 'scope_id', 'total_score'), 'student_count',
+            {key: n for key, n in counts.items() if n})
+        add(LeaderboardScope, ('scope', 'scope_id'), 'size', {key: n for key, n in sizes.items() if n})
+
+
+def add(model, key_fields, field, deltas):
+    """Cộng deltas ({khóa: số}) vào cột field bằng một câu UPDATE, tạo các dòng còn thiếu."""
+    if not deltas:
+        return
+
+    def keys_filter(keys):
+        q = Q()
+        for key in keys:
+            q |= Q(**dict(zip(key_fields, key)))
+        return q
+
+    def update(deltas):
+        # Không xuống dưới 0 nếu bảng đếm đã lệch vì User bị ghi không qua save(); rebuild() để sửa
+        change = Case(*[When(keys_filter([key]), then=Value(n)) for key, n in deltas.items()],
+                      default=Value(0), output_field=IntegerField())
+        return model.objects.filter(keys_filter(deltas)).update(**{field: Greatest(F(field) + change, 0)})
+
+    if update(deltas) < len(deltas):
+        existing = set(model.objects.filter(keys_filter(deltas)).values_list(*key_fields))
+        missing = {key: n for key, n in deltas.items() if key not in existing}
+        model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key in missing], ignore_conflicts=True)
+        update(missing)
+
+
+@transaction.atomic
+def rebuild():
+    """Dựng lại bảng đếm từ User (sau khi ghi User hàng loạt, hoặc khi bảng đếm bị lệch)."""
+    counts = {}
+    for scope, field in [(SCOPE_SCHOOL, None), (SCOPE_DEPARTMENT, 'department_id'),
+                         (SCOPE_CLASS, 'student_class_id')]:
+        if field:
+            rows = students().filter(**{f'{field}__isnull': False}).values_list(field, 'total_score')
+        else:
+            rows = students().values_list('total_score')
+        for *scope_id, total_score, n in rows.annotate(n=Count('id')).order_by():
+            counts[(scope, scope_id[0] if scope_id else SCHOOL_ID, total_score)] = n
+
+    sizes = {}
+    for (scope, scope_id, total_score), n in counts.items():
+        sizes[(scope, scope_id)] = sizes.get((scope, scope_id), 0) + n
+
+    LeaderboardScore.objects.all().delete()
+    LeaderboardScope.objects.all().delete()
+    LeaderboardScore.objects.bulk_create([LeaderboardScore(scope=scope, scope_id=scope_id, total_score=total_score,
+                                                           student_count=n)
+                                          for (scope, scope_id, total_score), n in counts.items()], batch_size=1000)
+    LeaderboardScope.objects.bulk_create([LeaderboardScope(scope=scope, scope_id=scope_id, size=n)
+                                          for (scope, scope_id), n in sizes.items()], batch_size=1000)
+    return len(counts)
+
+
+def scope_sizes(scopes):
+    sizes = dict.fromkeys(scopes, 0)
+    for scope, scope_id, size in LeaderboardScope.objects.filter(scope_filter(scopes)) \
+            .values_list('scope', 'scope_id', 'size'):
+        sizes[(scope, scope_id)] = size
+    return sizes
+
+
+def count_above(scopes, total_score):
+    """{(scope, scope_id): (số sinh viên có điểm cao hơn total_score, số mức điểm khác nhau cao hơn)}."""
+    above = dict.fromkeys(scopes, (0, 0))
+    for r in LeaderboardScore.objects.filter(scope_filter(scopes), total_score__gt=total_score) \
+            .values('scope', 'scope_id').annotate(above=Sum('student_count'),
+                                                  distinct=Count('id', filter=Q(student_count__gt=0))).order_by():
+        above[(r['scope'], r['scope_id'])] = (r['above'], r['distinct'])
+    return above
+
+
+def percentile(rank, size):
+    # Tỉ lệ sinh viên trong phạm vi có điểm không cao hơn
+    return round(100.0 * (size - rank + 1) / size, 2) if size else None
+
+
+def rank_rows(scope, scope_id, rows, offset, size):
+    """
+    Gắn rank / dense_rank / percentile cho một trang sinh viên đã sắp theo (-total_score, id).
+    offset là số dòng đứng trước trang; chỉ dòng đầu trang cần đọc bảng đếm, các dòng sau suy ra theo vị trí.
+    """
+    if not rows:
+        return []
+
+    above, distinct = count_above([(scope, scope_id)], rows[0]['total_score'])[(scope, scope_id)]
+    rank, dense_rank = above + 1, distinct + 1
+    previous = rows[0]['total_score']
+    result = []
+    for position, row in enumerate(rows, start=offset + 1):
+        if row['total_score'] != previous:
+            rank = position
+            dense_rank += 1
+            previous = row['total_score']
+        result.append({
+            'rank': rank, 'dense_rank': dense_rank, 'percentile': percentile(rank, size),
+            'total_score': row['total_score'],
+            'student': {'id': row['id'], 'username': row['username'], 'first_name': row['first_name'],
+                        'last_name': row['last_name']},
+        })
+    return result
+
+
+def student_ranks(student):
+    """Thứ hạng của sinh viên trong lớp, khoa và toàn trường: hai truy vấn trên bảng đếm cho cả ba phạm vi."""
+    ranked = bool(member_scopes(student))
+    scopes = scopes_for(student.student_class_id, student.department_id)
+    sizes = scope_sizes(scopes)
+    above = count_above(scopes, student.total_score)
+    result = {}
+    for scope, scope_id in scopes:
+        count, distinct = above[(scope, scope_id)]
+        rank = count + 1 if ranked else None
+        result[scope] = {
+            'scope_id': scope_id,
+            'size': sizes[(scope, scope_id)],
+            'rank': rank,
+            'dense_rank': distinct + 1 if ranked else None,
+            'percentile': percentile(rank, sizes[(scope, scope_id)]) if ranked else None,
+            'total_score': student.total_score,
+        }
+    return result
+
+
+@receiver(pre_delete, sender=User)
+def remove_deleted_student(sender, instance, **kwargs):
+    # Bỏ sinh viên khỏi bảng đếm theo dòng trên CSDL, rồi đánh dấu dòng sắp xóa là không hoạt động để các lần
+    # trừ điểm khi xóa dây chuyền điểm của sinh viên (chạy sau signal này) không chuyển mức điểm nữa
+    with transaction.atomic(savepoint=False):
+        row = User.objects.select_for_update().filter(pk=instance.pk).values('total_score', *MEMBER_FIELDS).first()
+        if row is not None and member_scopes(row):
+            apply_moves([(member_scopes(row), row['total_score'], None)])
+            User.objects.filter(pk=instance.pk).update(is_active=False)
+
+
+@receiver(pre_delete, sender=Class)
+@receiver(pre_delete, sender=Department)
+def remove_deleted_scope(sender, instance, **kwargs):
+    # Sinh viên của lớp / khoa bị xóa được SET_NULL bằng một câu UPDATE, không qua User.save
+    scope = SCOPE_CLASS if sender is Class else SCOPE_DEPARTMENT
+    LeaderboardScore.objects.filter(scope=scope, scope_id=instance.pk).delete()
+    LeaderboardScope.objects.filter(scope=scope, scope_id=instance.pk).delete()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scores.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = 'Chạy bài đo hiệu năng (tạo và xóa dữ liệu tạm trên CSDL đang cấu hình)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS))
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=100, help='Số lần ghi mỗi luồng')
+        parser.add_argument('--students', type=int, default=50)
+        parser.add_argument('--size', type=int, default=100000, help='Số dòng dữ liệu cho các bài đo truy vấn')
+        parser.add_argument('--queries', type=int, default=50, help='Số truy vấn đo cho mỗi cách')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Giữ lại dữ liệu tạm sau khi đo')
+
+    def handle(self, *args, **options):
+        name = options.pop('name')
+        try:
+            BENCHMARKS[name](self.stdout.write, **options)
+        except AssertionError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from scores import scheme, scoring
+
+
+class Command(BaseCommand):
+    help = 'So sánh sổ điểm theo nhóm (StudentGroupScore) với kết quả tính lại từ DisciplinePoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, action='append', dest='students',
+                            help='Chỉ kiểm tra sinh viên này (có thể lặp lại)')
+        parser.add_argument('--fix', action='store_true', help='Ghi lại sổ điểm nếu phát hiện sai lệch')
+
+    def handle(self, *args, **options):
+        student_ids = options['students']
+        scheme.get_scheme(refresh=True)
+        mismatches = scoring.check_ledger(student_ids)
+
+        for m in mismatches:
+            target = f"group {m['group_id']}" if m['group_id'] is not None else 'total_score'
+            self.stdout.write(f"student {m['student_id']} {target}: expected {m['expected']}, got {m['actual']}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Ledger is consistent.'))
+            return
+
+        if options['fix']:
+            affected = sorted({m['student_id'] for m in mismatches})
+            scoring.rebuild_ledger(affected)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt ledger for {len(affected)} student(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} mismatch(es) found. Run with --fix to rebuild.'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scores import feed
+from scores.models import PendingLike
+
+
+class Command(BaseCommand):
+    help = 'Ghi các thao tác thích đang chờ vào Like (dùng khi SCORES_LIKE_MODE = "buffered")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Chạy liên tục, chờ thao tác mới khi hàng đợi rỗng')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Số giây chờ giữa hai lần kiểm tra khi --loop')
+
+    def handle(self, *args, **options):
+        flushed = 0
+        while True:
+            count = feed.flush_likes(options['batch_size'])
+            flushed += count
+            if count:
+                self.stdout.write(f'Flushed {count} like(s), {PendingLike.objects.count()} still pending.')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {flushed} like(s) flushed.'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scores import scoring
+from scores.models import ScoreRecomputeJob
+
+
+class Command(BaseCommand):
+    help = 'Xử lý hàng đợi tính lại điểm (dùng khi SCORES_RECOMPUTE_MODE = "deferred")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Chạy liên tục, chờ yêu cầu mới khi hàng đợi rỗng')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Số giây chờ giữa hai lần kiểm tra khi --loop')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            count = scoring.process_recompute_queue(options['batch_size'])
+            processed += count
+            if count:
+                self.stdout.write(f'Recomputed {count} student(s), '
+                                  f'{ScoreRecomputeJob.objects.count()} still pending.')
+            elif options['loop']:
+                time.sleep(options['sleep'])
+            else:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {processed} student(s) recomputed.'))
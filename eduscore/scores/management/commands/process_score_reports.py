@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scores import reports
+
+
+class Command(BaseCommand):
+    help = 'Tạo các báo cáo PDF điểm rèn luyện đang chờ (yêu cầu từ trang quản trị)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Chạy liên tục, chờ yêu cầu mới khi hàng đợi rỗng')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Số giây chờ giữa hai lần kiểm tra khi --loop')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            report = reports.claim_next()
+            if report is None:
+                if options['loop']:
+                    time.sleep(options['sleep'])
+                    continue
+                break
+
+            started = time.monotonic()
+            try:
+                rows = reports.generate(report)
+            except Exception as e:
+                self.stderr.write(f'{report}: failed: {e}')
+                continue
+            processed += 1
+            self.stdout.write(f'{report.scope} {report.scope_id} v{report.data_version}: '
+                              f'{rows} row(s) in {time.monotonic() - started:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {processed} report(s) generated.'))
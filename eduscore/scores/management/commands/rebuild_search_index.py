@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from scores import search
+
+
+class Command(BaseCommand):
+    help = 'Tạo lại chỉ mục tìm kiếm hoạt động (FULLTEXT trên MySQL, chỉ mục đảo ngược với CSDL khác)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} activit(ies).'))
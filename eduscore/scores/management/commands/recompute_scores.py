@@ -0,0 +1,120 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from scores import scheme, scoring
+from scores.models import User
+
+NO_PARTITION = 'none'
+
+
+def recompute_partition(partition, key, chunk_size, dry_run):
+    """Tính lại điểm cho mọi sinh viên trong một khoa / lớp, từng khối chunk_size sinh viên."""
+    students = User.objects.order_by('id')
+    field = 'department_id' if partition == 'department' else 'student_class_id'
+    if key == NO_PARTITION:
+        students = students.filter(**{f'{field}__isnull': True})
+    else:
+        students = students.filter(**{field: key})
+
+    student_ids = list(students.values_list('id', flat=True))
+    changed_students = changed_points = 0
+    for start in range(0, len(student_ids), chunk_size):
+        s, p = scoring.recompute_students(student_ids[start:start + chunk_size], dry_run=dry_run)
+        changed_students += s
+        changed_points += p
+
+    return key, len(student_ids), changed_students, changed_points
+
+
+def init_worker():
+    django.setup()
+    # Không dùng lại kết nối CSDL kế thừa từ tiến trình cha
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Tính lại total_score, sổ điểm theo nhóm và group_total_score cho toàn trường'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partition', choices=['department', 'class'], default='department',
+                            help='Chia việc theo khoa hoặc theo lớp')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Số sinh viên mỗi truy vấn gom nhóm')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ báo cáo số dòng sẽ thay đổi')
+        parser.add_argument('--resume', action='store_true', help='Bỏ qua các phần đã xong ở lần chạy trước')
+        parser.add_argument('--state-file', default=os.path.join(settings.BASE_DIR, '.recompute_scores.json'),
+                            help='Tệp lưu tiến độ để chạy tiếp khi bị gián đoạn')
+
+    def handle(self, *args, **options):
+        partition = options['partition']
+        dry_run = options['dry_run']
+        state_file = options['state_file']
+
+        # Nhóm / tiêu chí có thể vừa được sửa bằng update() không phát signal. Khi chạy thử chỉ nạp lại
+        # bản chụp của tiến trình này, không tăng phiên bản dùng chung (làm mất cache của mọi tiến trình khác)
+        if dry_run:
+            scheme.get_scheme(refresh=True)
+        else:
+            scheme.invalidate()
+
+        field = 'department_id' if partition == 'department' else 'student_class_id'
+        keys = [str(k) if k is not None else NO_PARTITION
+                for k in User.objects.values_list(field, flat=True).distinct().order_by(field)]
+
+        done = set()
+        if options['resume'] and os.path.exists(state_file):
+            with open(state_file) as f:
+                state = json.load(f)
+            if state.get('partition') == partition:
+                done = set(state['done'])
+                self.stdout.write(f'Resuming: {len(done)} of {len(keys)} partition(s) already done.')
+        pending = [k for k in keys if k not in done]
+
+        workers = max(1, options['workers'])
+        if connection.vendor == 'sqlite':
+            # SQLite chỉ cho một tiến trình ghi tại một thời điểm
+            workers = 1
+
+        started = time.monotonic()
+        totals = [0, 0, 0]
+        finished = [0]
+
+        def record(result):
+            key, students, changed_students, changed_points = result
+            totals[0] += students
+            totals[1] += changed_students
+            totals[2] += changed_points
+            if not dry_run:
+                done.add(key)
+                with open(state_file, 'w') as f:
+                    json.dump({'partition': partition, 'done': sorted(done)}, f)
+            self.stdout.write(f'[{len(keys) - len(pending) + finished[0]}/{len(keys)}] {partition} {key}: '
+                              f'{students} student(s), {changed_students} total(s) and '
+                              f'{changed_points} group total(s) {"would change" if dry_run else "updated"}')
+
+        if workers == 1:
+            for key in pending:
+                finished[0] += 1
+                record(recompute_partition(partition, key, options['chunk_size'], dry_run))
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                futures = [pool.submit(recompute_partition, partition, key, options['chunk_size'], dry_run)
+                           for key in pending]
+                for future in as_completed(futures):
+                    finished[0] += 1
+                    record(future.result())
+
+        if not dry_run and os.path.exists(state_file):
+            os.remove(state_file)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{totals[0]} student(s) processed in {time.monotonic() - started:.1f}s: '
+            f'{totals[1]} total(s), {totals[2]} group total(s) {"would change" if dry_run else "updated"}.'))
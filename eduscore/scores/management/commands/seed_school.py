@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scores.seeding import DEFAULTS, PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu trường học giả lập (bulk_create, seed cố định) để kiểm thử tải. Không chạy trên production.'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULTS.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, default=default)
+        parser.add_argument('--prefix', default='seed', help='Tiền tố tên của dữ liệu được sinh')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Số dòng mỗi câu INSERT')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Số sinh viên mỗi giao dịch')
+
+    def handle(self, *args, **options):
+        seeder = Seeder(prefix=options['prefix'], seed=options['seed'], batch_size=options['batch_size'],
+                        chunk_size=options['chunk_size'], out=self.stdout.write,
+                        **{name: options[name] for name in DEFAULTS})
+        if seeder.exists():
+            raise CommandError(f'Data with prefix "{options["prefix"]}" already exists; use another --prefix.')
+
+        started = time.perf_counter()
+        created = seeder.run()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {", ".join(f"{n} {name}" for name, n in created.items())} '
+            f'in {time.perf_counter() - started:.1f}s. Password of generated accounts: {PASSWORD}'))
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-17 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def build_ledger(apps, schema_editor):
+    DisciplinePoint = apps.get_model('scores', 'DisciplinePoint')
+    EvaluationGroup = apps.get_model('scores', 'EvaluationGroup')
+    StudentGroupScore = apps.get_model('scores', 'StudentGroupScore')
+    User = apps.get_model('scores', 'User')
+
+    max_scores = dict(EvaluationGroup.objects.values_list('id', 'max_score'))
+    rows = DisciplinePoint.objects.values('student_id', 'criteria__group_id').annotate(raw=Sum('score')).order_by()
+
+    entries = []
+    totals = {}
+    for r in rows:
+        capped = min(r['raw'], max_scores[r['criteria__group_id']])
+        entries.append(StudentGroupScore(student_id=r['student_id'], group_id=r['criteria__group_id'],
+                                         raw_score=r['raw'], capped_score=capped))
+        totals[r['student_id']] = totals.get(r['student_id'], 0) + capped
+    StudentGroupScore.objects.bulk_create(entries, batch_size=1000)
+
+    users = list(User.objects.only('id', 'total_score'))
+    for u in users:
+        u.total_score = totals.get(u.id, 0)
+    User.objects.bulk_update(users, ['total_score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0012_evaluationcriteria_evaluationgroup_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentGroupScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('raw_score', models.FloatField(default=0)),
+                ('capped_score', models.FloatField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scores.evaluationgroup')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('student', 'group')},
+            },
+        ),
+        migrations.RunPython(build_ledger, migrations.RunPython.noop),
+    ]
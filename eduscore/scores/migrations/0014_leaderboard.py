@@ -0,0 +1,51 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0013_studentgroupscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('scope', models.CharField(choices=[('school', 'School'), ('department', 'Department'), ('class', 'Class')], max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('refreshed_version', models.PositiveIntegerField(default=0)),
+                ('size', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'scope_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('total_score', models.FloatField(default=0)),
+                ('rank', models.PositiveIntegerField()),
+                ('dense_rank', models.PositiveIntegerField()),
+                ('percentile', models.FloatField()),
+                ('leaderboard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='scores.leaderboard')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['leaderboard', 'rank'], name='scores_lead_leaderb_c7f995_idx')],
+                'unique_together': {('leaderboard', 'student')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0015_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreRecomputeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_date', models.DateTimeField()),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score_recompute_job', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
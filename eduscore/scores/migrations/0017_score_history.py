@@ -0,0 +1,70 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def initial_snapshots(apps, schema_editor):
+    # Điểm hiện tại làm mốc đầu tiên cho lịch sử
+    StudentGroupScore = apps.get_model('scores', 'StudentGroupScore')
+    ScoreSnapshot = apps.get_model('scores', 'ScoreSnapshot')
+    User = apps.get_model('scores', 'User')
+
+    group_scores = {}
+    for student_id, group_id, capped_score in StudentGroupScore.objects.values_list('student_id', 'group_id',
+                                                                                     'capped_score'):
+        group_scores.setdefault(student_id, {})[str(group_id)] = capped_score
+
+    now = timezone.now()
+    ScoreSnapshot.objects.bulk_create([
+        ScoreSnapshot(student_id=student_id, sequence=0, group_scores=group_scores[student_id],
+                      total_score=total_score, created_date=now)
+        for student_id, total_score in User.objects.filter(pk__in=group_scores).values_list('id', 'total_score')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0016_scorerecomputejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete'), ('recompute', 'Recompute')], max_length=20)),
+                ('point_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('delta', models.FloatField()),
+                ('group_score', models.FloatField()),
+                ('total_score', models.FloatField()),
+                ('created_date', models.DateTimeField()),
+                ('group', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='scores.evaluationgroup')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'created_date'], name='scores_scor_student_8c3e6d_idx')],
+                'unique_together': {('student', 'sequence')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ScoreSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('group_scores', models.JSONField(default=dict)),
+                ('total_score', models.FloatField()),
+                ('created_date', models.DateTimeField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'created_date'], name='scores_scor_student_90f32f_idx')],
+                'unique_together': {('student', 'sequence')},
+            },
+        ),
+        migrations.RunPython(initial_snapshots, migrations.RunPython.noop),
+    ]
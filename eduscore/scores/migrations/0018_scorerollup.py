@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:11
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_rollups(apps, schema_editor):
+    DisciplinePoint = apps.get_model('scores', 'DisciplinePoint')
+    ScoreRollup = apps.get_model('scores', 'ScoreRollup')
+
+    buckets = {
+        'excellent': Count('id', filter=Q(score__gte=90)),
+        'good': Count('id', filter=Q(score__gte=75, score__lt=90)),
+        'average': Count('id', filter=Q(score__gte=50, score__lt=75)),
+        'poor': Count('id', filter=Q(score__lt=50)),
+    }
+    rollups = []
+    for scope, field in [('class', 'student__student_class_id'), ('department', 'student__department_id')]:
+        rows = DisciplinePoint.objects.values(field).annotate(
+            total_score=Sum('score'), point_count=Count('id'), student_count=Count('student', distinct=True),
+            **buckets,
+        ).order_by()
+        for r in rows:
+            scope_id = r.pop(field) or 0
+            rollups.append(ScoreRollup(scope=scope, scope_id=scope_id, **r))
+    ScoreRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0017_score_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active', models.BooleanField(default=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('scope', models.CharField(choices=[('class', 'Class'), ('department', 'Department')], max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField(default=0)),
+                ('total_score', models.FloatField(default=0)),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('excellent', models.PositiveIntegerField(default=0)),
+                ('good', models.PositiveIntegerField(default=0)),
+                ('average', models.PositiveIntegerField(default=0)),
+                ('poor', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'scope_id')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
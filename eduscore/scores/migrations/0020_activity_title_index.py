@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0019_scorereport'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activity',
+            name='title',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:23
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+# Chép lại từ scores.search tại thời điểm tạo migration, để migration không đổi theo mã hiện hành
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+MAX_TERM_WEIGHT = 10.0
+MAX_TERM_LENGTH = 50
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFD', text or '').replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def document_fields(title, description, category, tags):
+    title_text = ' '.join(tokenize(' '.join([title or '', *tags])))
+    body_text = ' '.join(tokenize(' '.join([strip_tags(description or ''), category or ''])))
+    return title_text, body_text
+
+
+def term_weights(title_text, body_text):
+    weights = {}
+    for text, weight in [(title_text, TITLE_WEIGHT), (body_text, BODY_WEIGHT)]:
+        for term in text.split():
+            term = term[:MAX_TERM_LENGTH]
+            weights[term] = min(weights.get(term, 0) + weight, MAX_TERM_WEIGHT)
+    return weights
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE scores_activitysearchdocument '
+                          'ADD FULLTEXT INDEX scores_search_title_ft (title), '
+                          'ADD FULLTEXT INDEX scores_search_title_body_ft (title, body)')
+
+
+def build_search_index(apps, schema_editor):
+    Activity = apps.get_model('scores', 'Activity')
+    ActivitySearchDocument = apps.get_model('scores', 'ActivitySearchDocument')
+    ActivitySearchTerm = apps.get_model('scores', 'ActivitySearchTerm')
+    fulltext = schema_editor.connection.vendor == 'mysql'
+
+    documents = []
+    terms = []
+    for activity in Activity.objects.select_related('category').prefetch_related('tags').iterator(chunk_size=1000):
+        title, body = document_fields(activity.title, activity.description, activity.category.name,
+                                      [t.name for t in activity.tags.all()])
+        documents.append(ActivitySearchDocument(activity_id=activity.pk, title=title, body=body))
+        if not fulltext:
+            terms.extend(ActivitySearchTerm(activity_id=activity.pk, term=term, weight=weight)
+                         for term, weight in term_weights(title, body).items())
+        if len(documents) >= 1000:
+            ActivitySearchDocument.objects.bulk_create(documents)
+            ActivitySearchTerm.objects.bulk_create(terms, batch_size=5000)
+            documents, terms = [], []
+    ActivitySearchDocument.objects.bulk_create(documents)
+    ActivitySearchTerm.objects.bulk_create(terms, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0020_activity_title_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySearchDocument',
+            fields=[
+                ('activity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='scores.activity')),
+                ('title', models.TextField()),
+                ('body', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ActivitySearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=50)),
+                ('weight', models.FloatField()),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='scores.activity')),
+            ],
+            options={
+                'unique_together': {('term', 'activity')},
+            },
+        ),
+        migrations.RunPython(add_fulltext_indexes, migrations.RunPython.noop),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0021_activity_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['created_date', 'id'], name='activity_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['newsfeed', 'created_date', 'id'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newsfeed',
+            index=models.Index(fields=['timestamp', 'id'], name='newsfeed_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:37
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_interactions(apps, schema_editor):
+    NewsFeed = apps.get_model('scores', 'NewsFeed')
+    Like = apps.get_model('scores', 'Like')
+    Comment = apps.get_model('scores', 'Comment')
+
+    NewsFeed.objects.update(
+        like_count=Coalesce(Subquery(Like.objects.filter(newsfeed=OuterRef('pk')).order_by()
+                                     .values('newsfeed').annotate(n=Count('id')).values('n')), 0),
+        comment_count=Coalesce(Subquery(Comment.objects.filter(newsfeed=OuterRef('pk'), active=True).order_by()
+                                        .values('newsfeed').annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0022_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsfeed',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='newsfeed',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_interactions, migrations.RunPython.noop),
+    ]
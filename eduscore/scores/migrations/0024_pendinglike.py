@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0023_newsfeed_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('liked', models.BooleanField()),
+                ('requested_date', models.DateTimeField()),
+                ('newsfeed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scores.newsfeed')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'newsfeed')},
+            },
+        ),
+    ]
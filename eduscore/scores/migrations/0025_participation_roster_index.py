@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0024_pendinglike'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participation',
+            index=models.Index(fields=['activity', 'is_completed', 'id'], name='participation_roster_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0025_participation_roster_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='disciplinepoint',
+            index=models.Index(fields=['created_date', 'id'], name='point_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disciplinepoint',
+            index=models.Index(fields=['student', 'criteria'], name='point_student_criteria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disciplinepoint',
+            index=models.Index(fields=['student', 'created_date'], name='point_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disciplinepoint',
+            index=models.Index(fields=['activity', 'student'], name='point_activity_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disciplinepoint',
+            index=models.Index(fields=['criteria', 'created_date'], name='point_criteria_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0026_disciplinepoint_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='scorerollup',
+            name='average',
+        ),
+        migrations.RemoveField(
+            model_name='scorerollup',
+            name='excellent',
+        ),
+        migrations.RemoveField(
+            model_name='scorerollup',
+            name='good',
+        ),
+        migrations.RemoveField(
+            model_name='scorerollup',
+            name='poor',
+        ),
+    ]
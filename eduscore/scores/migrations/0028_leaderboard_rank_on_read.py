@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('scores', '0027_scorerollup_drop_buckets'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='LeaderboardEntry',
+        ),
+        migrations.DeleteModel(
+            name='Leaderboard',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['total_score', 'is_active', 'is_staff', 'is_superuser'], name='user_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['student_class', 'total_score', 'is_active', 'is_staff', 'is_superuser'], name='user_class_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['department', 'total_score', 'is_active', 'is_staff', 'is_superuser'], name='user_department_rank_idx'),
+        ),
+    ]
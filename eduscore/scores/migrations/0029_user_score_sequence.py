@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:40
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_score_sequence(apps, schema_editor):
+    # sequence cuối hiện có trong nhật ký (snapshot khởi tạo có sequence 0)
+    ScoreEvent = apps.get_model('scores', 'ScoreEvent')
+    User = apps.get_model('scores', 'User')
+
+    last = ScoreEvent.objects.filter(student_id=OuterRef('pk')).values('student_id') \
+        .annotate(sequence=Max('sequence')).values('sequence')
+    User.objects.filter(pk__in=ScoreEvent.objects.values('student_id')) \
+        .update(score_sequence=Coalesce(Subquery(last), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0028_leaderboard_rank_on_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='score_sequence',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_score_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.4 on 2026-10-17 21:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counts(apps, schema_editor):
+    # Như scores.leaderboard.rebuild, chép lại vì migration không dùng mã của ứng dụng
+    User = apps.get_model('scores', 'User')
+    LeaderboardScore = apps.get_model('scores', 'LeaderboardScore')
+    LeaderboardScope = apps.get_model('scores', 'LeaderboardScope')
+
+    students = User.objects.filter(is_active=True, is_staff=False, is_superuser=False)
+    counts = {}
+    for total_score, n in students.values_list('total_score').annotate(n=Count('id')).order_by():
+        counts[('school', 0, total_score)] = n
+    for scope, field in [('department', 'department_id'), ('class', 'student_class_id')]:
+        for scope_id, total_score, n in students.filter(**{f'{field}__isnull': False}) \
+                .values_list(field, 'total_score').annotate(n=Count('id')).order_by():
+            counts[(scope, scope_id, total_score)] = n
+
+    sizes = {}
+    for (scope, scope_id, total_score), n in counts.items():
+        sizes[(scope, scope_id)] = sizes.get((scope, scope_id), 0) + n
+    LeaderboardScore.objects.bulk_create([LeaderboardScore(scope=scope, scope_id=scope_id, total_score=total_score,
+                                                           student_count=n)
+                                          for (scope, scope_id, total_score), n in counts.items()], batch_size=1000)
+    LeaderboardScope.objects.bulk_create([LeaderboardScope(scope=scope, scope_id=scope_id, size=n)
+                                          for (scope, scope_id), n in sizes.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0029_user_score_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardScope',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField(default=0)),
+                ('size', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'scope_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField(default=0)),
+                ('total_score', models.FloatField()),
+                ('student_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'scope_id', 'total_score')},
+            },
+        ),
+        migrations.RunPython(fill_counts, migrations.RunPython.noop),
+    ]
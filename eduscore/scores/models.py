@@ -1,6 +1,11 @@
-from django.db import models
+import time
 
 from django.db import models
+
+from django.db import models, transaction
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
 from ckeditor.fields import RichTextField
 from cloudinary.models import CloudinaryField
@@ -10,6 +15,53 @@ class User(AbstractUser):
     department = models.ForeignKey('Department', on_delete=models.SET_NULL, null=True, blank=True)
     student_class = models.ForeignKey('Class', on_delete=models.SET_NULL, null=True, blank=True)
     total_score = models.FloatField(default=0)
+    # sequence của ScoreEvent cuối cùng của sinh viên, ghi cùng câu UPDATE total_score
+    score_sequence = models.PositiveBigIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        # Bảng xếp hạng đếm "số sinh viên có điểm cao hơn" theo phạm vi; các cột lọc sinh viên được xếp hạng
+        # nằm cuối chỉ mục để phép đếm chỉ đọc chỉ mục
+        indexes = [
+            models.Index(fields=['total_score', 'is_active', 'is_staff', 'is_superuser'], name='user_rank_idx'),
+            models.Index(fields=['student_class', 'total_score', 'is_active', 'is_staff', 'is_superuser'],
+                         name='user_class_rank_idx'),
+            models.Index(fields=['department', 'total_score', 'is_active', 'is_staff', 'is_superuser'],
+                         name='user_department_rank_idx'),
+        ]
+
+    # Chỉ sổ điểm (scoring) ghi các cột này bằng UPDATE riêng trên dòng đã khóa
+    LEDGER_FIELDS = ('total_score', 'score_sequence')
+    # Đổi các cột này phải chuyển sinh viên sang dòng tổng hợp và bảng đếm xếp hạng của phạm vi mới
+    SCOPE_FIELDS = ('student_class', 'department', 'is_active', 'is_staff', 'is_superuser')
+
+    def save(self, *args, **kwargs):
+        from scores import leaderboard, rollups
+
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                leaderboard.apply_moves([(leaderboard.member_scopes(self), None, self.total_score)])
+            return
+
+        # Lưu hồ sơ không ghi đè tổng điểm / sequence bằng giá trị đã đọc từ trước (có thể đã cũ)
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.LEDGER_FIELDS]
+        if not {f.removesuffix('_id') for f in kwargs['update_fields']} & set(self.SCOPE_FIELDS):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Khóa dòng sinh viên như đường ghi điểm (scoring.lock_students) trước khi đọc phạm vi cũ
+            previous = User.objects.select_for_update().filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+            if previous is None:
+                return
+            # Tổng điểm trên CSDL là của sổ điểm, không phải giá trị (có thể cũ) trên đối tượng
+            leaderboard.apply_moves([(leaderboard.member_scopes(previous), previous.total_score, None),
+                                     (leaderboard.member_scopes(self), None, previous.total_score)])
+            if (previous.student_class_id, previous.department_id) != (self.student_class_id, self.department_id):
+                rollups.move_student(self.pk, (previous.student_class_id, previous.department_id),
+                                     (self.student_class_id, self.department_id))
 
 class BaseModel(models.Model):
     active = models.BooleanField(default=True)
@@ -41,7 +93,7 @@ class Category(BaseModel):
         return self.name
 
 class Activity(BaseModel):
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     description = RichTextField()
     start_date = models.DateField()
     end_date = models.DateField()
@@ -57,9 +109,33 @@ class Activity(BaseModel):
     tags = models.ManyToManyField('Tag')
     max_score = models.FloatField(default=0)
 
+    class Meta:
+        # Phân trang theo con trỏ (-created_date, -id)
+        indexes = [models.Index(fields=['created_date', 'id'], name='activity_feed_idx')]
+
     def __str__(self):
         return self.title
 
+class ActivitySearchDocument(models.Model):
+    """Văn bản tìm kiếm của hoạt động (đã chuẩn hóa), có chỉ mục FULLTEXT trên MySQL."""
+    activity = models.OneToOneField(Activity, primary_key=True, related_name='search_document',
+                                    on_delete=models.CASCADE)
+    # Tiêu đề và tên thẻ (trọng số cao)
+    title = models.TextField()
+    # Mô tả đã bỏ thẻ HTML và tên danh mục
+    body = models.TextField()
+
+
+class ActivitySearchTerm(models.Model):
+    """Chỉ mục đảo ngược dùng khi CSDL không hỗ trợ FULLTEXT (SQLite khi chạy test)."""
+    activity = models.ForeignKey(Activity, related_name='search_terms', on_delete=models.CASCADE)
+    term = models.CharField(max_length=50)
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ('term', 'activity')
+
+
 class Participation(BaseModel):
     student = models.ForeignKey(User, on_delete=models.CASCADE)
     activity = models.ForeignKey(Activity, on_delete=models.CASCADE)
@@ -68,6 +144,8 @@ class Participation(BaseModel):
 
     class Meta:
         unique_together = ('student', 'activity')
+        # Danh sách tham gia của một hoạt động, lọc theo hoàn thành, phân trang theo id
+        indexes = [models.Index(fields=['activity', 'is_completed', 'id'], name='participation_roster_idx')]
 
 
 class EvaluationGroup(BaseModel):
@@ -83,7 +161,10 @@ class EvaluationCriteria(BaseModel):
     name = models.CharField(max_length=255)
     score= models.FloatField(default=0)
     def __str__(self):
-        return f"{self.name} ({self.group.name})"
+        from scores import scheme
+
+        group = scheme.get_scheme().groups.get(self.group_id)
+        return f"{self.name} ({group['name'] if group else self.group.name})"
 
 
 class DisciplinePoint(BaseModel):
@@ -93,38 +174,188 @@ class DisciplinePoint(BaseModel):
     score = models.FloatField(default=0)
     group_total_score = models.FloatField(default=0)
 
-    def save(self, *args, **kwargs):
-        self.calculate_group_total_score()
+    class Meta:
+        # Danh sách /disciplined/ phân trang theo (-created_date, -id); các bộ lọc thường gặp theo
+        # sinh viên, hoạt động, tiêu chí kèm cột thứ hai để lọc / tổng hợp chỉ đọc trên chỉ mục
+        indexes = [
+            models.Index(fields=['created_date', 'id'], name='point_list_idx'),
+            models.Index(fields=['student', 'criteria'], name='point_student_criteria_idx'),
+            models.Index(fields=['student', 'created_date'], name='point_student_date_idx'),
+            models.Index(fields=['activity', 'student'], name='point_activity_student_idx'),
+            models.Index(fields=['criteria', 'created_date'], name='point_criteria_date_idx'),
+        ]
 
-        self.update_student_total_score()
-        super().save(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        from scores import rollups, scoring
+
+        with transaction.atomic():
+            deferred = scoring.is_deferred()
+            locked = {}
+            if not deferred:
+                # Khóa sinh viên (mới và hiện tại của điểm) trước dòng điểm và trước khi đọc tổng nhóm, nên mọi lần
+                # ghi điểm của một sinh viên, kể cả ghi group_total_score của các điểm cùng nhóm, chạy tuần tự
+                locked = scoring.lock_students([self.student_id], point_id=self.pk)
+
+            previous = None
+            if self.pk:
+                previous = DisciplinePoint.objects.select_for_update().filter(pk=self.pk).values(
+                    'student_id', 'activity_id', 'criteria_id', 'score'
+                ).first()
+
+            if deferred:
+                # Chỉ ghi điểm, việc tính lại do process_score_queue đảm nhận
+                super().save(*args, **kwargs)
+                scoring.enqueue_recompute({self.student_id, previous['student_id'] if previous else self.student_id})
+                changes = self.rollup_changes(previous)
+                rollups.apply_changes(changes)
+                return
+
+            self.calculate_group_total_score()
+            super().save(*args, **kwargs)
+            self.update_group_siblings(previous)
+            self.update_student_total_score(previous, locked)
+
+            # Bảng tổng hợp cập nhật sau cùng, như mọi đường ghi điểm khác (xem scoring.lock_students)
+            changes = self.rollup_changes(previous)
+            rollups.apply_changes(changes)
+
+    def rollup_changes(self, previous):
+        if previous is None:
+            return [(self.student_id, None, self.score)]
+        if previous['student_id'] != self.student_id:
+            return [(previous['student_id'], previous['score'], None), (self.student_id, None, self.score)]
+        if previous['score'] != self.score or previous['criteria_id'] != self.criteria_id \
+                or previous['activity_id'] != self.activity_id:
+            # Điểm không đổi vẫn cần tăng phiên bản của bảng tổng hợp (báo cáo PDF dựa vào đó)
+            return [(self.student_id, previous['score'], self.score)]
+        return []
+
+    def group_points(self):
+        """Các điểm cùng sinh viên, hoạt động và nhóm tiêu chí (kể cả điểm này)."""
+        from scores import scheme
+
+        evaluation_scheme = scheme.get_scheme()
+        return DisciplinePoint.objects.filter(
+            student_id=self.student_id,
+            activity_id=self.activity_id,
+            criteria_id__in=evaluation_scheme.group_criteria[evaluation_scheme.group_of(self.criteria_id)]
+        )
 
     def calculate_group_total_score(self):
-        evaluation_group = self.criteria.group
-
-        group_total = DisciplinePoint.objects.filter(
-            student=self.student,
-            activity=self.activity,
-            criteria__group=evaluation_group
-        ).aggregate(total=models.Sum('score'))['total'] or 0
-
-        self.group_total_score = min(group_total, evaluation_group.max_score)
-
-    def update_student_total_score(self):
-        evaluation_groups = EvaluationGroup.objects.all()
-
-        total_score = 0
-
-        for group in evaluation_groups:
-            group_total = DisciplinePoint.objects.filter(
-                student=self.student,
-                criteria__group=group
-            ).aggregate(total=models.Sum('score'))['total'] or 0
+        from scores import scheme
+
+        evaluation_scheme = scheme.get_scheme()
+        group_id = evaluation_scheme.group_of(self.criteria_id)
+        group_total = self.group_points().exclude(pk=self.pk).aggregate(total=models.Sum('score'))['total'] or 0
+
+        self.group_total_score = min(group_total + self.score, evaluation_scheme.max_score(group_id))
+
+    def update_group_siblings(self, previous=None):
+        """
+        Ghi group_total_score mới cho các điểm khác cùng nhóm bằng một câu UPDATE, để mọi điểm của
+        (sinh viên, hoạt động, nhóm) có cùng giá trị như sau scoring.refresh_group_totals.
+        """
+        from scores import scheme, scoring
+
+        self.group_points().exclude(pk=self.pk).update(group_total_score=self.group_total_score)
+
+        if previous:
+            evaluation_scheme = scheme.get_scheme()
+            if (previous['student_id'], previous['activity_id'], evaluation_scheme.group_of(previous['criteria_id'])) \
+                    != (self.student_id, self.activity_id, evaluation_scheme.group_of(self.criteria_id)):
+                # Điểm rời nhóm cũ: tính lại tổng của các điểm còn lại ở đó
+                scoring.refresh_group_totals(pairs=[(previous['student_id'], previous['activity_id'])])
+
+    def update_student_total_score(self, previous=None, locked=None):
+        from scores import scheme, scoring
+
+        locked = locked or {}
+        evaluation_scheme = scheme.get_scheme()
+        group_id = evaluation_scheme.group_of(self.criteria_id)
+        delta = self.score
+
+        if previous:
+            previous_group_id = evaluation_scheme.group_of(previous['criteria_id'])
+            if (previous['student_id'], previous_group_id) == (self.student_id, group_id):
+                delta -= previous['score']
+            else:
+                # Điểm bị chuyển sang sinh viên / nhóm khác: trừ khỏi sổ cũ
+                scoring.apply_point_delta(
+                    previous['student_id'], previous_group_id, -previous['score'], create=False,
+                    locked=locked.get(previous['student_id']), point_id=self.pk)
+
+        total_score = scoring.apply_point_delta(
+            self.student_id, group_id, delta, locked=locked.get(self.student_id), point_id=self.pk,
+            action=ScoreEvent.ACTION_UPDATE if previous else ScoreEvent.ACTION_CREATE)
+        if DisciplinePoint.student.is_cached(self):
+            self.student.total_score = total_score
+
+
+@receiver(pre_delete, sender=DisciplinePoint)
+def remember_deleted_point(sender, instance, origin=None, **kwargs):
+    from scores import scoring
+
+    # Một lần xóa (QuerySet.delete, xóa dây chuyền từ Activity / User) xóa mọi dòng trước khi gửi post_delete;
+    # nhớ các điểm của cả lần xóa trên origin để bảng tổng hợp chỉ được cập nhật một lần, sau điểm cuối cùng
+    pending = {'remaining': set(), 'points': [], 'locked': set()}
+    if origin is not None:
+        if not hasattr(origin, '_deleting_points'):
+            origin._deleting_points = pending
+        pending = origin._deleting_points
+        pending['remaining'].add(instance.pk)
+
+    # Khóa sinh viên trước khi xóa dòng điểm, cùng thứ tự với DisciplinePoint.save
+    if not scoring.is_deferred() and instance.student_id not in pending['locked']:
+        scoring.lock_students([instance.student_id])
+        pending['locked'].add(instance.student_id)
+
+
+@receiver(post_delete, sender=DisciplinePoint)
+def remove_point_from_ledger(sender, instance, origin=None, **kwargs):
+    from scores import rollups, scheme, scoring
+
+    if scoring.is_deferred():
+        scoring.enqueue_recompute([instance.student_id])
+    else:
+        group_id = scheme.get_scheme().group_of(instance.criteria_id)
+        if group_id is not None:
+            scoring.apply_point_delta(instance.student_id, group_id, -instance.score, create=False,
+                                      point_id=instance.pk, action=ScoreEvent.ACTION_DELETE)
+
+    # Số sinh viên có điểm tính theo số điểm còn lại sau cả lần xóa, nên các điểm cùng lần xóa phải được
+    # gộp lại; tính riêng từng điểm sẽ trừ một sinh viên nhiều lần
+    pending = getattr(origin, '_deleting_points', None)
+    if pending is None:
+        finish_point_delete([instance])
+        return
+    pending['remaining'].discard(instance.pk)
+    pending['points'].append(instance)
+    if not pending['remaining']:
+        del origin._deleting_points
+        finish_point_delete(pending['points'])
+
+
+def finish_point_delete(points):
+    from scores import rollups, scoring
+
+    if not scoring.is_deferred():
+        # Các điểm còn lại cùng nhóm nhận group_total_score mới (chế độ deferred: process_score_queue tính lại)
+        scoring.refresh_group_totals(pairs={(p.student_id, p.activity_id) for p in points})
+    rollups.apply_changes([(p.student_id, p.score, None) for p in points])
+
+
+class StudentGroupScore(BaseModel):
+    """Sổ điểm của sinh viên theo từng nhóm tiêu chí, cập nhật theo delta mỗi lần ghi điểm."""
+    student = models.ForeignKey(User, related_name='group_scores', on_delete=models.CASCADE)
+    group = models.ForeignKey(EvaluationGroup, on_delete=models.CASCADE)
+    raw_score = models.FloatField(default=0)
+    capped_score = models.FloatField(default=0)
 
-            total_score += min(group_total, group.max_score)
+    class Meta:
+        unique_together = ('student', 'group')
 
-        self.student.total_score = total_score
-        self.student.save()
+    def __str__(self):
+        return f"{self.student_id} - {self.group_id}: {self.capped_score}"
 
 class Report(BaseModel):
     student = models.ForeignKey(User,  related_name='student_reports', on_delete=models.CASCADE)
@@ -142,6 +373,12 @@ class NewsFeed(BaseModel):
     activity = models.OneToOneField(Activity, on_delete=models.CASCADE)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Bộ đếm cập nhật bằng F() khi tạo / xóa Like, Comment (xem scores/feed.py)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['timestamp', 'id'], name='newsfeed_feed_idx')]
 
     def __str__(self):
         return self.activity.title
@@ -162,9 +399,25 @@ class Like(Interaction):
     class Meta:
         unique_together = ('user', 'newsfeed')
 
+class PendingLike(models.Model):
+    """Thao tác thích / bỏ thích đang chờ ghi vào Like (SCORES_LIKE_MODE = 'buffered'); mỗi cặp một dòng."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    newsfeed = models.ForeignKey(NewsFeed, on_delete=models.CASCADE)
+    liked = models.BooleanField()
+    requested_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'newsfeed')
+
+    def __str__(self):
+        return f"{self.user_id} {'like' if self.liked else 'unlike'} {self.newsfeed_id}"
+
 class Comment(Interaction):
     content = models.CharField(max_length=255, null=False)
 
+    class Meta:
+        indexes = [models.Index(fields=['newsfeed', 'created_date', 'id'], name='comment_thread_idx')]
+
 class Message(BaseModel):
     sender = models.ForeignKey(User, related_name='sent_messages', on_delete=models.CASCADE)
     receiver = models.ForeignKey(User,related_name='received_messages', on_delete=models.CASCADE)
@@ -173,3 +426,160 @@ class Message(BaseModel):
 
     class Meta:
         ordering = ['-timestamp']
+
+
+class DataVersion(models.Model):
+    """Số hiệu phiên bản dùng chung giữa các tiến trình để làm mất hiệu lực bộ nhớ đệm cục bộ."""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        # Lấy theo thời gian (ns) để một lần tăng bị rollback không bị dùng lại ở lần tăng sau
+        now = time.time_ns()
+        if not cls.objects.filter(name=name).update(version=Greatest(models.F('version') + 1, now)):
+            cls.objects.get_or_create(name=name, defaults={'version': now})
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+
+class ScoreRollup(BaseModel):
+    """Tổng hợp điểm rèn luyện theo lớp / khoa cho trang thống kê, cập nhật theo delta mỗi lần ghi điểm."""
+    SCOPE_CLASS = 'class'
+    SCOPE_DEPARTMENT = 'department'
+
+    scope = models.CharField(max_length=20, choices=[(SCOPE_CLASS, 'Class'), (SCOPE_DEPARTMENT, 'Department')])
+    # 0: sinh viên chưa được xếp lớp / khoa
+    scope_id = models.PositiveBigIntegerField(default=0)
+    total_score = models.FloatField(default=0)
+    point_count = models.PositiveIntegerField(default=0)
+    student_count = models.PositiveIntegerField(default=0)
+    # Tăng mỗi lần điểm trong phạm vi thay đổi; dùng làm khóa cho báo cáo đã tạo sẵn
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'scope_id')
+
+    @property
+    def avg_score(self):
+        return self.total_score / self.point_count if self.point_count else None
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id}"
+
+
+class LeaderboardScore(models.Model):
+    """Số sinh viên được xếp hạng có đúng total_score trong một phạm vi; thứ hạng đếm trên bảng nhỏ này."""
+    scope = models.CharField(max_length=20)
+    # 0: toàn trường
+    scope_id = models.PositiveBigIntegerField(default=0)
+    total_score = models.FloatField()
+    student_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'scope_id', 'total_score')
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} {self.total_score}: {self.student_count}"
+
+
+class LeaderboardScope(models.Model):
+    """Số sinh viên được xếp hạng của một phạm vi (lớp / khoa / toàn trường)."""
+    scope = models.CharField(max_length=20)
+    scope_id = models.PositiveBigIntegerField(default=0)
+    size = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'scope_id')
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id}: {self.size}"
+
+
+class ScoreReport(models.Model):
+    """Báo cáo PDF tạo nền theo lớp / khoa / toàn trường; khóa theo phạm vi và phiên bản dữ liệu."""
+    SCOPE_SCHOOL = 'school'
+    SCOPE_DEPARTMENT = 'department'
+    SCOPE_CLASS = 'class'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    scope = models.CharField(max_length=20, choices=[(SCOPE_SCHOOL, 'School'), (SCOPE_DEPARTMENT, 'Department'),
+                                                     (SCOPE_CLASS, 'Class')])
+    # 0: toàn trường
+    scope_id = models.PositiveBigIntegerField(default=0)
+    data_version = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=20, default=STATUS_PENDING,
+                              choices=[(STATUS_PENDING, 'Đang chờ'), (STATUS_RUNNING, 'Đang tạo'),
+                                       (STATUS_DONE, 'Hoàn tất'), (STATUS_FAILED, 'Lỗi')])
+    file_name = models.CharField(max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_date = models.DateTimeField(auto_now_add=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('scope', 'scope_id', 'data_version')
+        indexes = [models.Index(fields=['status', 'created_date'])]
+
+    def __str__(self):
+        return f"{self.scope} {self.scope_id} v{self.data_version} ({self.status})"
+
+
+class ScoreRecomputeJob(models.Model):
+    """Yêu cầu tính lại điểm đang chờ; mỗi sinh viên có tối đa một dòng (các yêu cầu trùng được gộp)."""
+    student = models.OneToOneField(User, related_name='score_recompute_job', on_delete=models.CASCADE)
+    requested_date = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.student_id} @ {self.requested_date}"
+
+
+class ScoreEvent(models.Model):
+    """Nhật ký chỉ-ghi-thêm các thay đổi điểm, kèm điểm nhóm (đã chặn) và tổng điểm sau thay đổi."""
+    ACTION_CREATE = 'create'
+    ACTION_UPDATE = 'update'
+    ACTION_DELETE = 'delete'
+    ACTION_RECOMPUTE = 'recompute'
+
+    student = models.ForeignKey(User, related_name='score_events', on_delete=models.CASCADE)
+    # Số thứ tự sự kiện của từng sinh viên, dùng để phát lại sau snapshot
+    sequence = models.PositiveBigIntegerField()
+    action = models.CharField(
+        max_length=20,
+        choices=[(ACTION_CREATE, 'Create'), (ACTION_UPDATE, 'Update'), (ACTION_DELETE, 'Delete'),
+                 (ACTION_RECOMPUTE, 'Recompute')]
+    )
+    # Không ràng buộc khóa ngoại để lịch sử còn nguyên khi điểm / nhóm bị xóa
+    point_id = models.PositiveBigIntegerField(null=True, blank=True)
+    group = models.ForeignKey(EvaluationGroup, on_delete=models.DO_NOTHING, db_constraint=False)
+    delta = models.FloatField()
+    group_score = models.FloatField()
+    total_score = models.FloatField()
+    created_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('student', 'sequence')
+        indexes = [models.Index(fields=['student', 'created_date'])]
+
+
+class ScoreSnapshot(models.Model):
+    """Điểm theo nhóm và tổng điểm của sinh viên tại sự kiện thứ `sequence`."""
+    student = models.ForeignKey(User, related_name='score_snapshots', on_delete=models.CASCADE)
+    sequence = models.PositiveBigIntegerField()
+    group_scores = models.JSONField(default=dict)
+    total_score = models.FloatField()
+    created_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('student', 'sequence')
+        indexes = [models.Index(fields=['student', 'created_date'])]
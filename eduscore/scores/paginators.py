@@ -1,5 +1,160 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class ItemPaginator(pagination.PageNumberPagination):
-    page_size = 2
\ No newline at end of file
+    page_size = 2
+
+
+class LeaderboardPaginator(pagination.PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    # Kích thước phạm vi đọc từ bảng đếm xếp hạng (view gán trước khi phân trang) thay cho COUNT(*) trên User
+    count = None
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = Paginator(object_list, per_page)
+        if self.count is not None:
+            paginator.count = self.count
+        return paginator
+
+
+class KeysetPaginator(pagination.BasePagination):
+    """
+    Phân trang theo con trỏ (keyset) trên bộ khóa sắp xếp, vd. (-created_date, -id): trang sau lọc
+    "nhỏ hơn dòng cuối của trang trước" thay vì OFFSET, không COUNT(*), và không lệch khi có dòng mới.
+
+    Dùng thứ tự của queryset nếu đã order_by (vd. theo độ liên quan khi tìm kiếm), ngược lại dùng ordering;
+    khóa chính luôn được thêm vào cuối để thứ tự là duy nhất.
+    """
+    ordering = ('-created_date', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def decode_cursor(self, request, size):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(b64decode(encoded.encode('ascii'), altchars=b'-_', validate=True))
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != size:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, values):
+        values = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+        return b64encode(json.dumps(values, separators=(',', ':')).encode(), altchars=b'-_').decode('ascii')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = self.get_ordering(queryset)
+        fields = [f.lstrip('-') for f in ordering]
+        queryset = queryset.order_by(*ordering)
+
+        cursor = self.decode_cursor(request, len(fields))
+        if cursor is not None:
+            # (a, b, id) < (x, y, z) viết thành a < x OR (a = x AND b < y) OR ...
+            after = Q()
+            for i, (field, value) in enumerate(zip(ordering, cursor)):
+                lookup = 'lt' if field.startswith('-') else 'gt'
+                condition = Q(**{f'{fields[i]}__{lookup}': value})
+                for previous, previous_value in zip(fields[:i], cursor[:i]):
+                    condition &= Q(**{previous: previous_value})
+                after |= condition
+            # Điều kiện thừa trên cột đầu để CSDL tìm theo khoảng trên chỉ mục thay vì quét từ đầu
+            bound = 'lte' if ordering[0].startswith('-') else 'gte'
+            after &= Q(**{f'{fields[0]}__{bound}': cursor[0]})
+            try:
+                queryset = queryset.filter(after)
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        size = self.get_page_size(request)
+        try:
+            rows = list(queryset[:size + 1])
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            last = rows[-1]
+            if isinstance(last, dict):
+                # Dòng values() (đường nhanh trong scores/fastpath.py) phải có đủ các cột sắp xếp
+                values = [last['id' if f == 'pk' else f] for f in fields]
+            else:
+                values = [getattr(last, f) for f in fields]
+            self.next_cursor = self.encode_cursor(values)
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ActivityPaginator(KeysetPaginator):
+    ordering = ('-created_date', '-id')
+
+
+class NewsFeedPaginator(KeysetPaginator):
+    ordering = ('-timestamp', '-id')
+
+
+class CommentPaginator(KeysetPaginator):
+    ordering = ('-created_date', '-id')
+
+
+class RosterPaginator(KeysetPaginator):
+    # Thứ tự đăng ký tham gia
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+
+
+class DisciplinePointPaginator(KeysetPaginator):
+    ordering = ('-created_date', '-id')
+    page_size = 50
+    max_page_size = 500
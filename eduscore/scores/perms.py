@@ -4,3 +4,10 @@ from rest_framework import permissions
 class OwnerPerms(permissions.IsAuthenticated):
     def has_object_permission(self, request, view, instance):
         return super().has_permission(request, view) and request.user == instance.user
+
+
+class ActivityOrganizerPerms(permissions.IsAuthenticated):
+    """Cán bộ hoặc người tạo hoạt động."""
+    def has_object_permission(self, request, view, activity):
+        return super().has_permission(request, view) and (request.user.is_staff
+                                                          or activity.created_by_id == request.user.pk)
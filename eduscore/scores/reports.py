@@ -0,0 +1,177 @@
+"""
+Báo cáo PDF điểm rèn luyện, tạo nền bằng `manage.py process_score_reports`.
+
+Mỗi báo cáo được khóa theo (phạm vi, phiên bản dữ liệu); phiên bản lấy từ ScoreRollup nên khi điểm trong
+phạm vi chưa đổi thì tệp đã tạo được dùng lại ngay.
+"""
+import os
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from scores import exports
+from scores.models import Class, Department, DisciplinePoint, ScoreReport, ScoreRollup, User
+
+REPORT_DIR = getattr(settings, 'SCORES_REPORT_DIR', os.path.join(settings.BASE_DIR, 'score_reports'))
+# Font TTF có dấu tiếng Việt (vd. DejaVuSans.ttf); không cấu hình thì dùng Helvetica
+FONT_PATH = getattr(settings, 'SCORES_REPORT_FONT', None)
+ROWS_PER_PAGE = 35
+
+TABLE_HEADER = ['Sinh viên', 'Họ tên', 'Lớp', 'Hoạt động', 'Nhóm', 'Tiêu chí', 'Điểm', 'Ngày']
+COLUMN_WIDTHS = [70, 110, 70, 150, 110, 110, 40, 60]
+
+
+def data_version(scope, scope_id=0):
+    if scope == ScoreReport.SCOPE_SCHOOL:
+        # Mỗi thay đổi điểm tăng đúng một dòng khoa nên tổng các phiên bản khoa tăng dần
+        return ScoreRollup.objects.filter(scope=ScoreRollup.SCOPE_DEPARTMENT) \
+            .aggregate(version=Sum('version'))['version'] or 0
+    return ScoreRollup.objects.filter(scope=scope, scope_id=scope_id).values_list('version', flat=True).first() or 0
+
+
+def request_report(scope, scope_id=0, user=None):
+    """Lấy báo cáo ứng với dữ liệu hiện tại, tạo yêu cầu mới (đang chờ) nếu chưa có."""
+    report, created = ScoreReport.objects.get_or_create(
+        scope=scope, scope_id=scope_id, data_version=data_version(scope, scope_id),
+        defaults={'requested_by': user},
+    )
+    if report.status == ScoreReport.STATUS_FAILED:
+        ScoreReport.objects.filter(pk=report.pk).update(status=ScoreReport.STATUS_PENDING, error='')
+        report.status = ScoreReport.STATUS_PENDING
+    return report
+
+
+def report_path(report):
+    return os.path.join(REPORT_DIR, report.file_name)
+
+
+def is_ready(report):
+    return report.status == ScoreReport.STATUS_DONE and os.path.exists(report_path(report))
+
+
+def scope_name(scope, scope_id):
+    if scope == ScoreReport.SCOPE_CLASS:
+        return Class.objects.filter(pk=scope_id).values_list('name', flat=True).first() or f'Lớp {scope_id}'
+    if scope == ScoreReport.SCOPE_DEPARTMENT:
+        return Department.objects.filter(pk=scope_id).values_list('name', flat=True).first() or f'Khoa {scope_id}'
+    return 'Toàn trường'
+
+
+def sections(scope, scope_id):
+    """Các phần của báo cáo: [(tiêu đề, queryset DisciplinePoint)], mỗi phần bắt đầu trang mới."""
+    points = DisciplinePoint.objects.all()
+    if scope == ScoreReport.SCOPE_CLASS:
+        return [(scope_name(scope, scope_id), points.filter(student__student_class_id=scope_id))]
+    if scope == ScoreReport.SCOPE_DEPARTMENT:
+        # Cùng nguồn với data_version: sinh viên thuộc khoa (User.department), chia theo lớp của các sinh viên đó
+        points = points.filter(student__department_id=scope_id)
+        classes = Class.objects.filter(pk__in=User.objects.filter(department_id=scope_id)
+                                       .values('student_class_id')).order_by('name')
+        return [(c.name, points.filter(student__student_class=c)) for c in classes] + \
+               [('Chưa xếp lớp', points.filter(student__student_class__isnull=True))]
+    return [(d.name, points.filter(student__department=d)) for d in Department.objects.order_by('name')] + \
+           [('Chưa xếp khoa', points.filter(student__department__isnull=True))]
+
+
+def render(report, path):
+    """Ghi báo cáo ra tệp, mỗi trang một bảng ROWS_PER_PAGE dòng; trả về số dòng điểm."""
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Table, TableStyle
+    except ImportError:
+        raise RuntimeError('reportlab is required to generate PDF reports (pip install reportlab)')
+
+    font, bold = 'Helvetica', 'Helvetica-Bold'
+    if FONT_PATH:
+        pdfmetrics.registerFont(TTFont('ReportFont', FONT_PATH))
+        font = bold = 'ReportFont'
+
+    width, height = landscape(A4)
+    style = TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTNAME', (0, 0), (-1, 0), bold),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('ALIGN', (6, 1), (6, -1), 'RIGHT'),
+    ])
+    # Trang đã xong được nén ngay; dữ liệu điểm chỉ giữ trong bộ nhớ từng trang một
+    c = canvas.Canvas(path, pagesize=(width, height), pageCompression=1)
+    title = f'Báo cáo điểm rèn luyện - {scope_name(report.scope, report.scope_id)}'
+    c.setTitle(title)
+
+    def draw_page(section, rows, page):
+        c.setFont(bold, 14)
+        c.drawString(30, height - 40, title)
+        c.setFont(font, 10)
+        c.drawString(30, height - 58, f'{section} - trang {page}')
+        table = Table([TABLE_HEADER] + rows, colWidths=COLUMN_WIDTHS)
+        table.setStyle(style)
+        w, h = table.wrapOn(c, width - 60, height - 100)
+        table.drawOn(c, 30, height - 70 - h)
+        c.drawRightString(width - 30, 20, f'Phiên bản dữ liệu {report.data_version}')
+        c.showPage()
+
+    total = 0
+    for section, points in sections(report.scope, report.scope_id):
+        rows, page = [], 1
+        for username, first_name, last_name, class_name, department_name, activity, group, criteria, score, \
+                created_date in exports.iter_rows(points):
+            rows.append([username, f'{last_name} {first_name}'.strip(), class_name or '', activity[:40],
+                         group[:30], criteria[:30], f'{score:g}', created_date.strftime('%d/%m/%Y')])
+            if len(rows) == ROWS_PER_PAGE:
+                draw_page(section, rows, page)
+                total += len(rows)
+                rows, page = [], page + 1
+        if rows or page == 1:
+            draw_page(section, rows, page)
+            total += len(rows)
+
+    c.save()
+    return total
+
+
+def generate(report):
+    """Tạo tệp PDF cho một báo cáo đã được nhận xử lý; xóa các bản cũ hơn của cùng phạm vi khi xong."""
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    file_name = f'{report.scope}-{report.scope_id}-v{report.data_version}.pdf'
+    tmp_path = os.path.join(REPORT_DIR, f'.{file_name}.{os.getpid()}.tmp')
+    try:
+        row_count = render(report, tmp_path)
+        os.replace(tmp_path, os.path.join(REPORT_DIR, file_name))
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        ScoreReport.objects.filter(pk=report.pk).update(status=ScoreReport.STATUS_FAILED, error=str(e),
+                                                        finished_date=timezone.now())
+        raise
+
+    ScoreReport.objects.filter(pk=report.pk).update(status=ScoreReport.STATUS_DONE, file_name=file_name,
+                                                    row_count=row_count, error='', finished_date=timezone.now())
+
+    stale = ScoreReport.objects.filter(scope=report.scope, scope_id=report.scope_id,
+                                       data_version__lt=report.data_version, status=ScoreReport.STATUS_DONE)
+    for old in stale:
+        if old.file_name and os.path.exists(report_path(old)):
+            os.remove(report_path(old))
+    stale.delete()
+    return row_count
+
+
+def claim_next():
+    """Nhận một báo cáo đang chờ (chuyển sang running); None nếu hàng đợi rỗng."""
+    with transaction.atomic():
+        reports = ScoreReport.objects.filter(status=ScoreReport.STATUS_PENDING).order_by('created_date')
+        if connection.features.has_select_for_update_skip_locked:
+            reports = reports.select_for_update(skip_locked=True)
+        report = reports.first()
+        if report is not None:
+            ScoreReport.objects.filter(pk=report.pk).update(status=ScoreReport.STATUS_RUNNING)
+            report.status = ScoreReport.STATUS_RUNNING
+        return report
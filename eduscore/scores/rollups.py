@@ -0,0 +1,152 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from scores.models import Class, Department, DisciplinePoint, ScoreRollup, User
+
+NO_SCOPE = 0
+
+
+def apply_changes(changes):
+    """
+    Cập nhật bảng tổng hợp theo các thay đổi điểm đã được ghi xuống CSDL.
+    changes là danh sách (student_id, old_score, new_score); old_score = None khi tạo mới,
+    new_score = None khi xóa.
+    """
+    deltas = {}
+    for student_id, old_score, new_score in changes:
+        d = deltas.setdefault(student_id, {'total_score': 0, 'point_count': 0})
+        if old_score is not None:
+            d['total_score'] -= old_score
+            d['point_count'] -= 1
+        if new_score is not None:
+            d['total_score'] += new_score
+            d['point_count'] += 1
+    if not deltas:
+        return
+
+    # Số sinh viên có điểm chỉ đổi khi số điểm của sinh viên đi qua 0; lớp / khoa và số điểm hiện tại
+    # của sinh viên đọc trong cùng một truy vấn
+    users = User.objects.filter(pk__in=deltas)
+    if any(d['point_count'] for d in deltas.values()):
+        users = users.annotate(n=Count('disciplinepoint'))
+    else:
+        users = users.annotate(n=Value(0))
+
+    scope_deltas = {}
+    for student_id, class_id, department_id, n in users.values_list('id', 'student_class_id', 'department_id', 'n'):
+        d = deltas[student_id]
+        d['student_count'] = int(n > 0) - int(n - d['point_count'] > 0) if d['point_count'] else 0
+        for scope in [(ScoreRollup.SCOPE_CLASS, class_id or NO_SCOPE),
+                      (ScoreRollup.SCOPE_DEPARTMENT, department_id or NO_SCOPE)]:
+            total = scope_deltas.setdefault(scope, dict.fromkeys(d, 0))
+            for field, value in d.items():
+                total[field] += value
+    apply_scope_deltas(scope_deltas)
+
+
+def move_student(student_id, old_scopes, new_scopes):
+    """
+    Chuyển tổng điểm, số điểm và số sinh viên của một sinh viên từ lớp / khoa cũ sang lớp / khoa mới.
+    old_scopes, new_scopes là (student_class_id, department_id); gọi khi User đổi lớp / khoa (User.save).
+    """
+    totals = DisciplinePoint.objects.filter(student_id=student_id).aggregate(
+        total_score=Sum('score'), point_count=Count('id'))
+    if not totals['point_count']:
+        return
+
+    moved = {**totals, 'student_count': 1}
+    scope_deltas = {}
+    for sign, (class_id, department_id) in [(-1, old_scopes), (1, new_scopes)]:
+        for scope in [(ScoreRollup.SCOPE_CLASS, class_id or NO_SCOPE),
+                      (ScoreRollup.SCOPE_DEPARTMENT, department_id or NO_SCOPE)]:
+            total = scope_deltas.setdefault(scope, dict.fromkeys(moved, 0))
+            for field, value in moved.items():
+                total[field] += sign * value
+    apply_scope_deltas(scope_deltas)
+
+
+def merge_into_no_scope(scope, scope_id):
+    """Gộp dòng tổng hợp của một lớp / khoa sắp bị xóa vào dòng "chưa xếp lớp / khoa" (sinh viên bị SET_NULL)."""
+    row = ScoreRollup.objects.filter(scope=scope, scope_id=scope_id).values(
+        'total_score', 'point_count', 'student_count').first()
+    if row is None:
+        return
+    with transaction.atomic(savepoint=False):
+        apply_scope_deltas({(scope, NO_SCOPE): row})
+        ScoreRollup.objects.filter(scope=scope, scope_id=scope_id).delete()
+
+
+@receiver(pre_delete, sender=Class)
+@receiver(pre_delete, sender=Department)
+def move_deleted_scope(sender, instance, **kwargs):
+    # Sinh viên của lớp / khoa bị xóa được SET_NULL bằng một câu UPDATE, không qua User.save
+    merge_into_no_scope(ScoreRollup.SCOPE_CLASS if sender is Class else ScoreRollup.SCOPE_DEPARTMENT, instance.pk)
+
+
+def apply_scope_deltas(scope_deltas):
+    """Cộng {(scope, scope_id): {cột: delta}} vào bảng tổng hợp, tạo các dòng còn thiếu."""
+    if not scope_deltas:
+        return
+
+    with transaction.atomic(savepoint=False):
+        # Một câu UPDATE cho mọi phạm vi nên các dòng tổng hợp luôn bị khóa theo thứ tự chỉ mục
+        if update(scope_deltas) < len(scope_deltas):
+            existing = set(ScoreRollup.objects.filter(scope_filter(scope_deltas)).values_list('scope', 'scope_id'))
+            missing = {scope: d for scope, d in scope_deltas.items() if scope not in existing}
+            ScoreRollup.objects.bulk_create([ScoreRollup(scope=scope, scope_id=scope_id)
+                                             for scope, scope_id in missing], ignore_conflicts=True)
+            update(missing)
+
+
+def scope_filter(scopes):
+    q = Q()
+    for scope, scope_id in scopes:
+        q |= Q(scope=scope, scope_id=scope_id)
+    return q
+
+
+def update(scope_deltas):
+    """Cộng delta vào các dòng (scope, scope_id) đã có và tăng phiên bản; trả về số dòng được cập nhật."""
+    updates = {'version': F('version') + 1}
+    for field, output_field in [('total_score', FloatField()), ('point_count', IntegerField()),
+                                ('student_count', IntegerField())]:
+        values = {scope: d[field] for scope, d in scope_deltas.items() if d[field]}
+        if len(values) == len(scope_deltas) and len(set(values.values())) == 1:
+            updates[field] = F(field) + next(iter(values.values()))
+        elif values:
+            updates[field] = F(field) + Case(*[When(scope=scope, scope_id=scope_id, then=Value(value))
+                                               for (scope, scope_id), value in values.items()],
+                                             default=Value(0), output_field=output_field)
+    return ScoreRollup.objects.filter(scope_filter(scope_deltas)).update(**updates)
+
+
+def compute():
+    """Tính lại toàn bộ từ DisciplinePoint: {(scope, scope_id): giá trị các cột}."""
+    rollups = {}
+    for scope, field in [(ScoreRollup.SCOPE_CLASS, 'student__student_class_id'),
+                         (ScoreRollup.SCOPE_DEPARTMENT, 'student__department_id')]:
+        rows = DisciplinePoint.objects.values(field).annotate(
+            total_score=Sum('score'),
+            point_count=Count('id'),
+            student_count=Count('student', distinct=True),
+        ).order_by()
+        for r in rows:
+            scope_id = r.pop(field) or NO_SCOPE
+            rollups[(scope, scope_id)] = r
+    return rollups
+
+
+@transaction.atomic
+def rebuild():
+    rollups = compute()
+    # Giữ phiên bản tăng dần để báo cáo tạo trước khi tính lại không bị coi là còn mới
+    versions = {(scope, scope_id): version
+                for scope, scope_id, version in ScoreRollup.objects.values_list('scope', 'scope_id', 'version')}
+    ScoreRollup.objects.all().delete()
+    ScoreRollup.objects.bulk_create([ScoreRollup(scope=scope, scope_id=scope_id,
+                                                 version=versions.get((scope, scope_id), 0) + 1,
+                                                 **rollups.get((scope, scope_id), {}))
+                                     for scope, scope_id in rollups.keys() | versions.keys()], batch_size=1000)
+    return len(rollups)
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from scores.models import DataVersion, EvaluationCriteria, EvaluationGroup
+
+VERSION_NAME = 'evaluation_scheme'
+
+# Số giây giữa hai lần kiểm tra phiên bản dùng chung; trong khoảng này mỗi tiến trình dùng bản chụp cục bộ
+CHECK_INTERVAL = getattr(settings, 'SCORES_SCHEME_CHECK_INTERVAL', 1.0)
+
+
+class Scheme:
+    """Bản chụp chỉ-đọc của các nhóm tiêu chí, tiêu chí và điểm tối đa."""
+
+    def __init__(self, version, groups, criteria):
+        self.version = version
+        self.groups = groups
+        self.criteria = criteria
+        self.group_criteria = {group_id: [] for group_id in groups}
+        for criteria_id, c in criteria.items():
+            self.group_criteria.setdefault(c['group_id'], []).append(criteria_id)
+
+    @classmethod
+    def load(cls):
+        version = DataVersion.current(VERSION_NAME)
+        groups = {g['id']: g for g in EvaluationGroup.objects.values('id', 'name', 'max_score')}
+        criteria = {c['id']: c for c in EvaluationCriteria.objects.values('id', 'name', 'group_id', 'score')}
+        return cls(version, groups, criteria)
+
+    def group_of(self, criteria_id):
+        c = self.criteria.get(criteria_id)
+        if c is None:
+            c = get_scheme(refresh=True).criteria.get(criteria_id)
+        return c['group_id'] if c else None
+
+    def max_score(self, group_id):
+        group = self.groups.get(group_id)
+        if group is None:
+            group = get_scheme(refresh=True).groups.get(group_id)
+        return group['max_score'] if group else None
+
+
+_lock = threading.Lock()
+_snapshot = None
+_checked_at = 0.0
+
+
+def get_scheme(refresh=False):
+    global _snapshot, _checked_at
+
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and not refresh and now - _checked_at < CHECK_INTERVAL:
+        return snapshot
+
+    with _lock:
+        if snapshot is not None and not refresh and DataVersion.current(VERSION_NAME) == snapshot.version:
+            _checked_at = now
+            return snapshot
+
+        _snapshot = Scheme.load()
+        _checked_at = now
+        return _snapshot
+
+
+def invalidate():
+    global _snapshot
+
+    DataVersion.bump(VERSION_NAME)
+    _snapshot = None
+
+
+@receiver(post_save, sender=EvaluationGroup)
+@receiver(post_delete, sender=EvaluationGroup)
+@receiver(post_save, sender=EvaluationCriteria)
+@receiver(post_delete, sender=EvaluationCriteria)
+def invalidate_scheme(sender, **kwargs):
+    invalidate()
@@ -0,0 +1,474 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from scores import history, leaderboard, rollups, scheme
+from scores.models import Activity, DisciplinePoint, ScoreEvent, ScoreRecomputeJob, StudentGroupScore, User
+
+TOLERANCE = 1e-6
+
+MODE_SYNC = 'sync'
+MODE_DEFERRED = 'deferred'
+
+
+def is_deferred():
+    return getattr(settings, 'SCORES_RECOMPUTE_MODE', MODE_SYNC) == MODE_DEFERRED
+
+
+def lock_students(student_ids, point_id=None):
+    """
+    Khóa các dòng User theo thứ tự id; point_id: khóa thêm sinh viên hiện tại của điểm đó (điểm bị chuyển
+    sinh viên). Mọi đường ghi điểm khóa theo cùng một thứ tự: sinh viên, dòng điểm (kể cả các điểm cùng nhóm),
+    sổ điểm (hoặc hàng đợi tính lại), bảng đếm xếp hạng, cuối cùng là bảng tổng hợp ScoreRollup. Nhờ vậy các
+    lần ghi đồng thời cho cùng sinh viên chạy tuần tự và không deadlock.
+    Trả về {id: {'total_score', 'score_sequence', các cột leaderboard.MEMBER_FIELDS}} của các dòng đã khóa.
+    """
+    students = Q(pk__in=student_ids)
+    if point_id is not None:
+        students |= Q(pk__in=DisciplinePoint.objects.filter(pk=point_id).values('student_id'))
+    return {row['id']: row for row in User.objects.select_for_update().filter(students).order_by('id')
+            .values('id', 'total_score', 'score_sequence', *leaderboard.MEMBER_FIELDS)}
+
+
+def apply_point_delta(student_id, group_id, delta, create=True, locked=None, point_id=None,
+                      action=ScoreEvent.ACTION_UPDATE):
+    """
+    Cộng delta vào sổ (student, group), ghi ScoreEvent và trả về total_score mới của sinh viên.
+    Truyền locked (dòng của sinh viên trong kết quả lock_students, được cập nhật tại chỗ) nếu sinh viên
+    đã được khóa trong cùng giao dịch.
+    """
+    with transaction.atomic(savepoint=False):
+        if locked is None:
+            locked = lock_students([student_id]).get(student_id)
+        max_score = scheme.get_scheme().max_score(group_id)
+        if locked is None or max_score is None:
+            return locked and locked['total_score']
+
+        entry = StudentGroupScore.objects.select_for_update().filter(student_id=student_id, group_id=group_id).first()
+        if entry is None:
+            if not create:
+                return locked['total_score']
+            entry = StudentGroupScore(student_id=student_id, group_id=group_id)
+
+        old_capped = entry.capped_score
+        entry.raw_score += delta
+        entry.capped_score = min(entry.raw_score, max_score)
+        if entry.pk:
+            StudentGroupScore.objects.filter(pk=entry.pk).update(raw_score=entry.raw_score,
+                                                                 capped_score=entry.capped_score,
+                                                                 updated_date=timezone.now())
+        else:
+            entry.save()
+
+        old_total = locked['total_score']
+        locked['total_score'] += entry.capped_score - old_capped
+        sequences = {student_id: locked['score_sequence']}
+        history.record_events([ScoreEvent(student_id=student_id, group_id=group_id, point_id=point_id, action=action,
+                                          delta=delta, group_score=entry.capped_score,
+                                          total_score=locked['total_score'])], sequences)
+        locked['score_sequence'] = sequences[student_id]
+
+        # Tổng điểm và sequence của nhật ký ghi trong cùng một câu UPDATE; chỉ ghi các cột này,
+        # không ghi đè các cột hồ sơ khác của User
+        User.objects.filter(pk=student_id).update(total_score=F('total_score') + (entry.capped_score - old_capped),
+                                                  score_sequence=locked['score_sequence'])
+        leaderboard.apply_moves([(leaderboard.member_scopes(locked), old_total, locked['total_score'])])
+        return locked['total_score']
+
+
+def apply_point_deltas(changes, locked):
+    """
+    Bản hàng loạt của apply_point_delta: changes là danh sách (student_id, group_id, delta, point_id, action)
+    theo thứ tự ghi, locked là kết quả lock_students (được cập nhật tại chỗ). Mỗi điểm một ScoreEvent như khi
+    lưu từng điểm; sổ điểm, tổng điểm và bảng đếm xếp hạng được ghi một lần cho cả lô.
+    """
+    evaluation_scheme = scheme.get_scheme()
+    changes = [c for c in changes if c[0] in locked and evaluation_scheme.max_score(c[1]) is not None]
+    if not changes:
+        return
+
+    student_ids = {c[0] for c in changes}
+    entries = {(e.student_id, e.group_id): e for e in StudentGroupScore.objects.select_for_update()
+               .filter(student_id__in=student_ids, group_id__in={c[1] for c in changes})}
+    old_totals = {student_id: locked[student_id]['total_score'] for student_id in student_ids}
+
+    touched = {}
+    events = []
+    for student_id, group_id, delta, point_id, action in changes:
+        entry = entries.get((student_id, group_id))
+        if entry is None:
+            entry = entries[(student_id, group_id)] = StudentGroupScore(student_id=student_id, group_id=group_id)
+        old_capped = entry.capped_score
+        entry.raw_score += delta
+        entry.capped_score = min(entry.raw_score, evaluation_scheme.max_score(group_id))
+        touched[(student_id, group_id)] = entry
+        locked[student_id]['total_score'] += entry.capped_score - old_capped
+        events.append(ScoreEvent(student_id=student_id, group_id=group_id, point_id=point_id, action=action,
+                                 delta=delta, group_score=entry.capped_score,
+                                 total_score=locked[student_id]['total_score']))
+
+    now = timezone.now()
+    for entry in touched.values():
+        entry.updated_date = now
+    StudentGroupScore.objects.bulk_update([e for e in touched.values() if e.pk],
+                                          ['raw_score', 'capped_score', 'updated_date'], batch_size=1000)
+    StudentGroupScore.objects.bulk_create([e for e in touched.values() if not e.pk], batch_size=1000)
+
+    sequences = {student_id: locked[student_id]['score_sequence'] for student_id in student_ids}
+    history.record_events(events, sequences)
+    for student_id in student_ids:
+        locked[student_id]['score_sequence'] = sequences[student_id]
+    User.objects.bulk_update([User(pk=student_id, total_score=locked[student_id]['total_score'],
+                                   score_sequence=sequences[student_id]) for student_id in student_ids],
+                             ['total_score', 'score_sequence'], batch_size=1000)
+    leaderboard.apply_moves([(leaderboard.member_scopes(locked[student_id]), old_totals[student_id],
+                              locked[student_id]['total_score']) for student_id in student_ids])
+
+
+def fill_created_ids(points, after_id):
+    """
+    Gắn id cho các điểm vừa bulk_create khi CSDL không trả id (MySQL). Sinh viên của các điểm đang bị khóa nên
+    các dòng có id > after_id của họ chính là các dòng vừa chèn, theo đúng thứ tự chèn.
+    """
+    if not points or points[0].pk is not None:
+        return
+    ids = DisciplinePoint.objects.filter(student_id__in={p.student_id for p in points}, pk__gt=after_id) \
+        .order_by('id').values_list('id', flat=True)
+    for point, point_id in zip(points, ids):
+        point.pk = point_id
+
+
+def expected_group_scores(student_ids=None):
+    """Tính lại toàn bộ từ DisciplinePoint: {(student_id, group_id): (raw, capped)}."""
+    evaluation_scheme = scheme.get_scheme()
+
+    points = DisciplinePoint.objects.all()
+    if student_ids is not None:
+        points = points.filter(student_id__in=student_ids)
+
+    # Gom theo tiêu chí rồi cộng dồn theo nhóm trong bộ nhớ, tránh JOIN sang EvaluationCriteria
+    raw = {}
+    for r in points.values('student_id', 'criteria_id').annotate(total=Sum('score')).order_by():
+        key = (r['student_id'], evaluation_scheme.group_of(r['criteria_id']))
+        raw[key] = raw.get(key, 0) + r['total']
+
+    return {
+        (student_id, group_id): (total, min(total, evaluation_scheme.max_score(group_id)))
+        for (student_id, group_id), total in raw.items()
+    }
+
+
+def summarize_points(points):
+    """
+    Tổng hợp một tập điểm đã lọc bằng một truy vấn GROUP BY (sinh viên, tiêu chí): tổng, số điểm và theo nhóm
+    tổng thô / tổng đã chặn (mỗi sinh viên không vượt điểm tối đa của nhóm, tính trên chính tập đã lọc).
+    """
+    evaluation_scheme = scheme.get_scheme()
+    raw = {}
+    counts = {}
+    for r in points.order_by().values('student_id', 'criteria_id').annotate(total=Sum('score'), n=Count('id')):
+        group_id = evaluation_scheme.group_of(r['criteria_id'])
+        key = (r['student_id'], group_id)
+        raw[key] = raw.get(key, 0) + r['total']
+        counts[group_id] = counts.get(group_id, 0) + r['n']
+
+    groups = {}
+    for (student_id, group_id), total in raw.items():
+        g = groups.setdefault(group_id, {'raw_score': 0, 'score': 0})
+        g['raw_score'] += total
+        g['score'] += min(total, evaluation_scheme.max_score(group_id))
+
+    return {
+        'sum': sum(g['raw_score'] for g in groups.values()),
+        'count': sum(counts.values()),
+        'capped_sum': sum(g['score'] for g in groups.values()),
+        'student_count': len({student_id for student_id, group_id in raw}),
+        'groups': [{'id': group_id, 'name': evaluation_scheme.groups[group_id]['name'],
+                    'max_score': evaluation_scheme.max_score(group_id), 'point_count': counts[group_id], **g}
+                   for group_id, g in sorted(groups.items())],
+    }
+
+
+def check_ledger(student_ids=None):
+    """So sánh sổ điểm và total_score với kết quả tính lại, trả về danh sách sai lệch."""
+    expected = expected_group_scores(student_ids)
+
+    entries = StudentGroupScore.objects.all()
+    users = User.objects.all()
+    if student_ids is not None:
+        entries = entries.filter(student_id__in=student_ids)
+        users = users.filter(pk__in=student_ids)
+
+    actual = {
+        (e['student_id'], e['group_id']): (e['raw_score'], e['capped_score'])
+        for e in entries.values('student_id', 'group_id', 'raw_score', 'capped_score')
+    }
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        exp_raw, exp_capped = expected.get(key, (0, 0))
+        act_raw, act_capped = actual.get(key, (0, 0))
+        if abs(exp_raw - act_raw) > TOLERANCE or abs(exp_capped - act_capped) > TOLERANCE:
+            mismatches.append({
+                'student_id': key[0], 'group_id': key[1],
+                'expected': exp_capped, 'actual': act_capped,
+                'expected_raw': exp_raw, 'actual_raw': act_raw,
+            })
+
+    expected_totals = {}
+    for (student_id, group_id), (raw, capped) in expected.items():
+        expected_totals[student_id] = expected_totals.get(student_id, 0) + capped
+
+    for student_id, total_score in users.values_list('id', 'total_score'):
+        expected_total = expected_totals.get(student_id, 0)
+        if abs(expected_total - total_score) > TOLERANCE:
+            mismatches.append({
+                'student_id': student_id, 'group_id': None,
+                'expected': expected_total, 'actual': total_score,
+            })
+
+    return mismatches
+
+
+@transaction.atomic
+def rebuild_ledger(student_ids=None, dry_run=False):
+    """
+    Đồng bộ sổ điểm và total_score với kết quả tính lại cho các sinh viên được chỉ định
+    (hoặc tất cả). Chỉ ghi những dòng thay đổi; trả về tập id sinh viên bị thay đổi total_score.
+    """
+    locked = {}
+    if not dry_run:
+        locked = lock_students(student_ids if student_ids is not None else User.objects.values('id'))
+    expected = expected_group_scores(student_ids)
+
+    totals = {}
+    for (student_id, group_id), (raw, capped) in expected.items():
+        totals[student_id] = totals.get(student_id, 0) + capped
+
+    entries = StudentGroupScore.objects.all()
+    users = User.objects.all()
+    if student_ids is not None:
+        entries = entries.filter(student_id__in=student_ids)
+        users = users.filter(pk__in=student_ids)
+
+    to_update = []
+    to_delete = []
+    events = []
+    for entry in entries.only('id', 'student_id', 'group_id', 'raw_score', 'capped_score'):
+        key = (entry.student_id, entry.group_id)
+        if key not in expected:
+            to_delete.append(entry.id)
+            events.append(ScoreEvent(student_id=entry.student_id, group_id=entry.group_id,
+                                     delta=-entry.raw_score, group_score=0))
+            continue
+        raw, capped = expected.pop(key)
+        if abs(entry.raw_score - raw) > TOLERANCE or abs(entry.capped_score - capped) > TOLERANCE:
+            events.append(ScoreEvent(student_id=entry.student_id, group_id=entry.group_id,
+                                     delta=raw - entry.raw_score, group_score=capped))
+            entry.raw_score, entry.capped_score = raw, capped
+            to_update.append(entry)
+    to_create = []
+    for (student_id, group_id), (raw, capped) in expected.items():
+        to_create.append(StudentGroupScore(student_id=student_id, group_id=group_id, raw_score=raw,
+                                           capped_score=capped))
+        events.append(ScoreEvent(student_id=student_id, group_id=group_id, delta=raw, group_score=capped))
+
+    if not dry_run:
+        StudentGroupScore.objects.filter(pk__in=to_delete).delete()
+        StudentGroupScore.objects.bulk_update(to_update, ['raw_score', 'capped_score'], batch_size=1000)
+        StudentGroupScore.objects.bulk_create(to_create, batch_size=1000)
+
+    changed = set()
+    for student_id, total_score in users.values_list('id', 'total_score'):
+        if abs(total_score - totals.get(student_id, 0)) > TOLERANCE:
+            changed.add(student_id)
+    if not dry_run:
+        for e in events:
+            e.action = ScoreEvent.ACTION_RECOMPUTE
+            e.total_score = totals.get(e.student_id, 0)
+        sequences = {student_id: row['score_sequence'] for student_id, row in locked.items()}
+        history.record_events(events, sequences)
+
+        # Tổng điểm và sequence của nhật ký ghi cùng nhau cho mọi sinh viên đã đổi
+        written = changed | {e.student_id for e in events}
+        User.objects.bulk_update([User(pk=student_id, total_score=totals.get(student_id, 0),
+                                       score_sequence=sequences[student_id]) for student_id in written],
+                                 ['total_score', 'score_sequence'], batch_size=1000)
+        leaderboard.apply_moves([(leaderboard.member_scopes(locked[student_id]), locked[student_id]['total_score'],
+                                  totals.get(student_id, 0)) for student_id in changed])
+
+    return changed
+
+
+def refresh_group_totals(pairs=None, student_ids=None, dry_run=False):
+    """
+    Tính lại group_total_score cho mọi điểm thuộc các cặp (student_id, activity_id)
+    hoặc của các sinh viên được chỉ định. Trả về số điểm bị thay đổi.
+    """
+    if pairs is not None:
+        pairs = set(pairs)
+        student_ids = {s for s, a in pairs}
+    if not student_ids:
+        return 0
+
+    evaluation_scheme = scheme.get_scheme()
+    points = DisciplinePoint.objects.filter(student_id__in=student_ids)
+    if pairs is not None:
+        points = points.filter(activity_id__in={a for s, a in pairs})
+
+    sums = {}
+    for r in points.values('student_id', 'activity_id', 'criteria_id').annotate(total=Sum('score')).order_by():
+        key = (r['student_id'], r['activity_id'], evaluation_scheme.group_of(r['criteria_id']))
+        sums[key] = sums.get(key, 0) + r['total']
+
+    # Chỉ đọc các cột cần so sánh, chỉ dựng đối tượng (pk + group_total_score) cho các dòng thật sự đổi
+    changed = []
+    for point_id, student_id, activity_id, criteria_id, current in points.values_list(
+            'id', 'student_id', 'activity_id', 'criteria_id', 'group_total_score').order_by():
+        if pairs is not None and (student_id, activity_id) not in pairs:
+            continue
+        group_id = evaluation_scheme.group_of(criteria_id)
+        group_total = min(sums[(student_id, activity_id, group_id)], evaluation_scheme.max_score(group_id))
+        if abs(current - group_total) > TOLERANCE:
+            changed.append(DisciplinePoint(pk=point_id, group_total_score=group_total))
+    if not dry_run:
+        DisciplinePoint.objects.bulk_update(changed, ['group_total_score'], batch_size=1000)
+
+    return len(changed)
+
+
+def recompute_students(student_ids, dry_run=False):
+    """Tính lại toàn bộ điểm của một nhóm sinh viên: trả về (số sinh viên đổi tổng điểm, số điểm đổi group_total_score)."""
+    with transaction.atomic():
+        changed_students = rebuild_ledger(student_ids, dry_run=dry_run)
+        changed_points = refresh_group_totals(student_ids=student_ids, dry_run=dry_run)
+    return len(changed_students), changed_points
+
+
+def bulk_upsert_points(rows, upsert=True):
+    """
+    Ghi hàng loạt điểm rèn luyện. rows là danh sách (index, dict) đã qua kiểm tra
+    kiểu (student, activity, criteria, score). Trả về (created, updated, errors),
+    errors là danh sách {'index', 'errors'} cho các dòng bị bỏ qua.
+    """
+    student_ids = {r['student'] for i, r in rows}
+    activity_ids = {r['activity'] for i, r in rows}
+    criteria_ids = {r['criteria'] for i, r in rows}
+
+    known_students = set(User.objects.filter(pk__in=student_ids).values_list('id', flat=True))
+    known_activities = set(Activity.objects.filter(pk__in=activity_ids).values_list('id', flat=True))
+    evaluation_scheme = scheme.get_scheme()
+    if not criteria_ids <= evaluation_scheme.criteria.keys():
+        evaluation_scheme = scheme.get_scheme(refresh=True)
+    known_criteria = evaluation_scheme.criteria.keys()
+
+    errors = []
+    valid = {}
+    for index, r in rows:
+        row_errors = {}
+        if r['student'] not in known_students:
+            row_errors['student'] = [f"Invalid pk \"{r['student']}\" - object does not exist."]
+        if r['activity'] not in known_activities:
+            row_errors['activity'] = [f"Invalid pk \"{r['activity']}\" - object does not exist."]
+        if r['criteria'] not in known_criteria:
+            row_errors['criteria'] = [f"Invalid pk \"{r['criteria']}\" - object does not exist."]
+
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        elif upsert:
+            # Dòng sau ghi đè dòng trước nếu trùng (student, activity, criteria)
+            valid[(r['student'], r['activity'], r['criteria'])] = r['score']
+        else:
+            valid[index] = r
+
+    to_create = []
+    to_update = []
+    old_scores = {}
+    now = timezone.now()
+    with transaction.atomic():
+        locked = {}
+        if not is_deferred():
+            # Khóa sinh viên trước các dòng điểm, như DisciplinePoint.save
+            locked = lock_students(known_students)
+        if upsert:
+            existing = {}
+            for point in DisciplinePoint.objects.filter(student_id__in=student_ids, activity_id__in=activity_ids,
+                                                        criteria_id__in=criteria_ids).order_by('id'):
+                existing.setdefault((point.student_id, point.activity_id, point.criteria_id), point)
+
+            for key, score in valid.items():
+                point = existing.get(key)
+                if point is None:
+                    to_create.append(DisciplinePoint(student_id=key[0], activity_id=key[1], criteria_id=key[2],
+                                                     score=score))
+                elif point.score != score:
+                    old_scores[point.pk] = point.score
+                    point.score = score
+                    point.updated_date = now
+                    to_update.append(point)
+        else:
+            to_create = [DisciplinePoint(student_id=r['student'], activity_id=r['activity'],
+                                         criteria_id=r['criteria'], score=r['score']) for r in valid.values()]
+
+        last_id = None
+        if to_create and locked and not connection.features.can_return_rows_from_bulk_insert:
+            last_id = DisciplinePoint.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        DisciplinePoint.objects.bulk_create(to_create, batch_size=1000)
+        DisciplinePoint.objects.bulk_update(to_update, ['score', 'updated_date'], batch_size=1000)
+
+        touched = {(p.student_id, p.activity_id) for p in to_create + to_update}
+        if touched and is_deferred():
+            enqueue_recompute({s for s, a in touched})
+        elif touched:
+            # Ghi sổ theo từng điểm (sự kiện create / update kèm point_id), không dựng lại cả sổ như 'recompute'
+            if last_id is not None:
+                fill_created_ids(to_create, last_id)
+            group_of = evaluation_scheme.group_of
+            apply_point_deltas(
+                [(p.student_id, group_of(p.criteria_id), p.score, p.pk, ScoreEvent.ACTION_CREATE) for p in to_create] +
+                [(p.student_id, group_of(p.criteria_id), p.score - old_scores[p.pk], p.pk, ScoreEvent.ACTION_UPDATE)
+                 for p in to_update], locked)
+            refresh_group_totals(pairs=touched)
+
+        rollups.apply_changes([(p.student_id, None, p.score) for p in to_create] +
+                              [(p.student_id, old_scores[p.pk], p.score) for p in to_update])
+
+    return len(to_create), len(to_update), errors
+
+
+def enqueue_recompute(student_ids):
+    """Đưa sinh viên vào hàng đợi tính lại; yêu cầu trùng chỉ cập nhật requested_date của dòng sẵn có."""
+    now = timezone.now()
+    # MySQL (ON DUPLICATE KEY UPDATE) không nhận unique_fields
+    unique_fields = ['student'] if connection.features.supports_update_conflicts_with_target else None
+    ScoreRecomputeJob.objects.bulk_create(
+        [ScoreRecomputeJob(student_id=student_id, requested_date=now) for student_id in student_ids],
+        update_conflicts=True, update_fields=['requested_date'], unique_fields=unique_fields,
+    )
+
+
+def is_pending(student_id):
+    return ScoreRecomputeJob.objects.filter(student_id=student_id).exists()
+
+
+def process_recompute_queue(batch_size=500):
+    """Xử lý một lô yêu cầu đang chờ, trả về số sinh viên đã tính lại."""
+    with transaction.atomic():
+        jobs = ScoreRecomputeJob.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Nhiều worker chạy song song sẽ lấy các lô khác nhau
+            jobs = jobs.select_for_update(skip_locked=True)
+        jobs = list(jobs.values_list('id', 'student_id', 'requested_date')[:batch_size])
+        if not jobs:
+            return 0
+
+        recompute_students([student_id for job_id, student_id, requested_date in jobs])
+
+        # Chỉ xóa các yêu cầu không bị gửi lại trong lúc đang tính
+        done = Q()
+        for job_id, student_id, requested_date in jobs:
+            done |= Q(pk=job_id, requested_date=requested_date)
+        ScoreRecomputeJob.objects.filter(done).delete()
+
+    return len(jobs)
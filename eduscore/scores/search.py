@@ -0,0 +1,179 @@
+"""
+Tìm kiếm hoạt động theo tiêu đề, mô tả (đã bỏ thẻ HTML), tên thẻ và danh mục, có xếp hạng và khớp tiền tố.
+
+MySQL dùng chỉ mục FULLTEXT trên ActivitySearchDocument (BOOLEAN MODE). CSDL khác (SQLite khi chạy test)
+dùng chỉ mục đảo ngược ActivitySearchTerm do ứng dụng tự cập nhật mỗi khi hoạt động thay đổi.
+Văn bản được chuẩn hóa (chữ thường, bỏ dấu) nên "hien mau" tìm được "Hiến máu".
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.html import strip_tags
+
+from scores.models import Activity, ActivitySearchDocument, ActivitySearchTerm, Category, Tag
+
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+MAX_TERM_WEIGHT = 10.0
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 50
+# innodb_ft_min_token_size mặc định; từ ngắn hơn không có trong chỉ mục FULLTEXT
+MIN_FULLTEXT_TERM_LENGTH = 3
+# Ký tự lớn nhất dùng làm cận trên khi tìm theo tiền tố bằng khoảng (dùng được chỉ mục)
+PREFIX_END = '\U0010ffff'
+
+
+def use_fulltext():
+    return connection.vendor == 'mysql'
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFD', text or '').replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def document_fields(title, description, category, tags):
+    """(title, body) của tài liệu tìm kiếm; migration 0021 giữ bản sao riêng của hàm này."""
+    title_text = ' '.join(tokenize(' '.join([title or '', *tags])))
+    body_text = ' '.join(tokenize(' '.join([strip_tags(description or ''), category or ''])))
+    return title_text, body_text
+
+
+def term_weights(title_text, body_text):
+    weights = {}
+    for text, weight in [(title_text, TITLE_WEIGHT), (body_text, BODY_WEIGHT)]:
+        for term in text.split():
+            term = term[:MAX_TERM_LENGTH]
+            weights[term] = min(weights.get(term, 0) + weight, MAX_TERM_WEIGHT)
+    return weights
+
+
+def index_activities(activity_ids):
+    """Tạo lại tài liệu (và chỉ mục đảo ngược nếu cần) cho các hoạt động."""
+    activity_ids = list(activity_ids)
+    if not activity_ids:
+        return
+
+    documents = []
+    terms = []
+    for activity in Activity.objects.filter(pk__in=activity_ids).select_related('category') \
+            .prefetch_related('tags').only('id', 'title', 'description', 'category__name'):
+        title_text, body_text = document_fields(activity.title, activity.description, activity.category.name,
+                                                [t.name for t in activity.tags.all()])
+        documents.append(ActivitySearchDocument(activity_id=activity.pk, title=title_text, body=body_text))
+        if not use_fulltext():
+            terms.extend(ActivitySearchTerm(activity_id=activity.pk, term=term, weight=weight)
+                         for term, weight in term_weights(title_text, body_text).items())
+
+    with transaction.atomic(savepoint=False):
+        ActivitySearchDocument.objects.filter(activity_id__in=activity_ids).delete()
+        ActivitySearchDocument.objects.bulk_create(documents, batch_size=1000)
+        if not use_fulltext():
+            ActivitySearchTerm.objects.filter(activity_id__in=activity_ids).delete()
+            ActivitySearchTerm.objects.bulk_create(terms, batch_size=5000)
+
+
+def rebuild(batch_size=1000):
+    """Tạo lại chỉ mục cho toàn bộ hoạt động, trả về số hoạt động."""
+    ids = list(Activity.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), batch_size):
+        index_activities(ids[start:start + batch_size])
+    return len(ids)
+
+
+def matches(query):
+    """Queryset (activity_id, rank) các hoạt động khớp mọi từ trong query; None nếu query không có từ nào."""
+    terms = list(dict.fromkeys(t[:MAX_TERM_LENGTH] for t in tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+
+    if use_fulltext():
+        table = ActivitySearchDocument._meta.db_table
+        long_terms = [t for t in terms if len(t) >= MIN_FULLTEXT_TERM_LENGTH]
+        documents = ActivitySearchDocument.objects.all()
+        for term in terms:
+            if term not in long_terms:
+                documents = documents.filter(title__contains=term)
+        if not long_terms:
+            return documents.annotate(rank=Value(1.0)).values('activity_id', 'rank')
+
+        boolean_query = ' '.join(f'+{t}*' for t in long_terms)
+        return documents.annotate(
+            hit=RawSQL(f'MATCH(`{table}`.`title`, `{table}`.`body`) AGAINST (%s IN BOOLEAN MODE)', [boolean_query]),
+            rank=RawSQL(f'MATCH(`{table}`.`title`) AGAINST (%s IN BOOLEAN MODE) * {TITLE_WEIGHT} + '
+                        f'MATCH(`{table}`.`title`, `{table}`.`body`) AGAINST (%s IN BOOLEAN MODE)',
+                        [boolean_query, boolean_query]),
+        ).filter(hit__gt=0).values('activity_id', 'rank')
+
+    # Mỗi từ khớp theo tiền tố; điều kiện khoảng dùng được chỉ mục (term, activity)
+    conditions = [Q(term__gte=t, term__lt=t + PREFIX_END) for t in terms]
+    any_term = Q()
+    for condition in conditions:
+        any_term |= condition
+    return ActivitySearchTerm.objects.filter(any_term).values('activity_id').annotate(
+        rank=Sum('weight'),
+        **{f'matched_{i}': Max(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+           for i, condition in enumerate(conditions)},
+    ).filter(**{f'matched_{i}': 1 for i in range(len(conditions))}).values('activity_id', 'rank')
+
+
+def search(queryset, query):
+    """Lọc queryset Activity theo query, sắp xếp theo độ liên quan (search_rank) giảm dần."""
+    found = matches(query)
+    if found is None:
+        return queryset
+    return queryset.filter(pk__in=found.values('activity_id')).annotate(
+        search_rank=Subquery(found.filter(activity_id=OuterRef('pk')).values('rank')[:1])
+    ).order_by('-search_rank', '-id')
+
+
+@receiver(post_save, sender=Activity)
+def index_activity(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_activities([instance.pk])
+
+
+@receiver(m2m_changed, sender=Activity.tags.through)
+def index_activity_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_activities([instance.pk])
+    elif action == 'post_clear':
+        index_activities(getattr(instance, '_search_activity_ids', []))
+    else:
+        index_activities(pk_set or [])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(m2m_changed, sender=Activity.tags.through)
+def remember_tag_activities(sender, instance, action=None, reverse=False, **kwargs):
+    # Trước khi xóa thẻ (hoặc bỏ thẻ khỏi mọi hoạt động), nhớ các hoạt động cần cập nhật lại
+    if isinstance(instance, Tag) and action in (None, 'pre_clear'):
+        instance._search_activity_ids = list(instance.activity_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def reindex_after_tag_delete(sender, instance, **kwargs):
+    index_activities(getattr(instance, '_search_activity_ids', []))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        index_activities(instance.activity_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        index_activities(instance.activity_set.values_list('id', flat=True))
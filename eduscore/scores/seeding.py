@@ -0,0 +1,234 @@
+"""
+Sinh dữ liệu trường học giả lập để kiểm thử tải / quy mô, chạy bằng `manage.py seed_school`.
+
+Mọi bảng được ghi bằng bulk_create theo lô lớn, không qua save() của DisciplinePoint và không phát signal:
+group_total_score được tính sẵn trong bộ nhớ, bảng đếm xếp hạng dựng lại ngay sau khi tạo sinh viên, sổ điểm
+dựng lại bằng scoring.rebuild_ledger theo từng khối sinh viên, cuối cùng dựng lại bảng tổng hợp, chỉ mục tìm
+kiếm, bộ đếm newsfeed và tăng các phiên bản cache.
+Cùng seed và cùng tham số cho cùng dữ liệu (trừ id và ngày tạo). Không chạy trên CSDL production.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from scores import caching, feed, leaderboard, rollups, scheme, scoring, search
+from scores.models import (Activity, Category, Class, Comment, Department, DisciplinePoint, EvaluationCriteria,
+                           EvaluationGroup, Like, Message, NewsFeed, Participation, Tag, User)
+
+FIRST_NAMES = ['An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hùng', 'Khánh', 'Lan', 'Linh', 'Minh', 'Nam',
+               'Ngọc', 'Phúc', 'Quân', 'Sơn', 'Thảo', 'Trang', 'Tuấn', 'Vy', 'Yến']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ', 'Hồ', 'Ngô']
+# Từ vựng dùng để sinh tiêu đề / nội dung; benchmarks cũng dùng chung danh sách này
+WORDS = ['hiến', 'máu', 'tình', 'nguyện', 'mùa', 'hè', 'xanh', 'tiếp', 'sức', 'thi', 'dọn', 'rác', 'trồng', 'cây',
+         'hội', 'thao', 'văn', 'nghệ', 'học', 'thuật', 'kỹ', 'năng', 'cộng', 'đồng', 'giao', 'lưu', 'sinh', 'viên',
+         'khởi', 'nghiệp', 'môi', 'trường', 'an', 'toàn', 'giao', 'thông', 'hiến', 'tặng', 'sách', 'bóng', 'đá']
+STATUSES = ['open', 'closed', 'canceled']
+STATUS_WEIGHTS = [3, 6, 1]
+FIRST_DAY = date(2024, 9, 1)
+# Mật khẩu chung của mọi tài khoản được sinh, để kịch bản tải có thể đăng nhập
+PASSWORD = 'seed123456'
+
+DEFAULTS = {
+    'departments': 5,
+    'classes_per_department': 8,
+    'students': 2000,
+    'organizers': 10,
+    'categories': 8,
+    'tags': 40,
+    'activities': 500,
+    'participations_per_student': 10,
+    'groups': 4,
+    'criteria_per_group': 5,
+    'points_per_student': 20,
+    'likes_per_post': 20,
+    'comments_per_post': 5,
+    'messages': 5000,
+}
+
+
+class Seeder:
+    def __init__(self, prefix='seed', seed=42, batch_size=5000, chunk_size=1000, out=print, **counts):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.out = out
+        self.counts = {**DEFAULTS, **{k: v for k, v in counts.items() if v is not None}}
+        self.created = {}
+
+    def words(self, k):
+        return ' '.join(self.rng.choices(WORDS, k=k))
+
+    def insert(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.created[model.__name__] = self.created.get(model.__name__, 0) + len(objects)
+
+    def stage(self, name, fn):
+        started = time.perf_counter()
+        fn()
+        self.out(f'{name}: {time.perf_counter() - started:.1f}s')
+
+    def exists(self):
+        return User.objects.filter(username__startswith=f'{self.prefix}-').exists()
+
+    def run(self):
+        self.stage('evaluation scheme', self.seed_scheme)
+        self.stage('departments, classes and users', self.seed_people)
+        self.stage('categories, tags, activities and newsfeed', self.seed_activities)
+        self.stage('participations, points and ledger', self.seed_points)
+        self.stage('likes, comments and messages', self.seed_interactions)
+        self.stage('rollups, search index and counters', self.finish)
+        return self.created
+
+    def seed_scheme(self):
+        c = self.counts
+        with transaction.atomic():
+            self.insert(EvaluationGroup, [
+                EvaluationGroup(name=f'{self.prefix} nhóm {i + 1}', max_score=self.rng.choice([15, 20, 25, 30]))
+                for i in range(c['groups'])
+            ])
+            groups = list(EvaluationGroup.objects.filter(name__startswith=f'{self.prefix} nhóm ').order_by('id'))
+            self.insert(EvaluationCriteria, [
+                EvaluationCriteria(group=g, name=f'{self.words(2).capitalize()} {j + 1}', score=self.rng.randint(1, 10))
+                for g in groups for j in range(c['criteria_per_group'])
+            ])
+        # bulk_create không phát signal làm mới thang điểm
+        scheme.invalidate()
+        evaluation_scheme = scheme.get_scheme(refresh=True)
+        group_ids = {g.pk for g in groups}
+        self.criteria = [(criteria_id, criteria['group_id'], criteria['score'])
+                         for criteria_id, criteria in sorted(evaluation_scheme.criteria.items())
+                         if criteria['group_id'] in group_ids]
+        self.max_scores = {g.pk: g.max_score for g in groups}
+
+    def seed_people(self):
+        c = self.counts
+        code = self.prefix[:4]
+        with transaction.atomic():
+            self.insert(Department, [Department(name=f'{self.prefix} khoa {i + 1}', code=f'{code}-K{i + 1:03d}')
+                                     for i in range(c['departments'])])
+            departments = list(Department.objects.filter(name__startswith=f'{self.prefix} khoa ').order_by('id')
+                               .values_list('id', flat=True))
+            self.insert(Class, [
+                Class(name=f'{self.prefix} lớp {d + 1}.{i + 1}', code=f'{code}-{d * c["classes_per_department"] + i:05d}',
+                      department_id=department_id)
+                for d, department_id in enumerate(departments) for i in range(c['classes_per_department'])
+            ])
+            classes = list(Class.objects.filter(department_id__in=departments).order_by('id')
+                           .values_list('id', 'department_id'))
+
+            password = make_password(PASSWORD)
+            self.insert(User, [User(username=f'{self.prefix}-staff{i + 1}', password=password, is_staff=True)
+                               for i in range(c['organizers'])])
+            students = []
+            for i in range(c['students']):
+                class_id, department_id = classes[i % len(classes)]
+                students.append(User(username=f'{self.prefix}-sv{i + 1:07d}', password=password,
+                                     first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                                     email=f'{self.prefix}-sv{i + 1}@example.com',
+                                     department_id=department_id, student_class_id=class_id))
+                if len(students) >= self.batch_size:
+                    self.insert(User, students)
+                    students = []
+            self.insert(User, students)
+
+        # MySQL: bulk_create không trả về id, đọc lại theo tên đăng nhập
+        self.organizers = list(User.objects.filter(username__startswith=f'{self.prefix}-staff').order_by('id')
+                               .values_list('id', flat=True))
+        self.students = list(User.objects.filter(username__startswith=f'{self.prefix}-sv').order_by('id')
+                             .values_list('id', flat=True))
+        # bulk_create không qua User.save; rebuild_ledger sau đó chuyển mức điểm trên bảng đếm này
+        leaderboard.rebuild()
+
+    def seed_activities(self):
+        c = self.counts
+        with transaction.atomic():
+            self.insert(Category, [Category(name=f'{self.prefix} {self.words(2)} {i + 1}')
+                                   for i in range(c['categories'])])
+            categories = list(Category.objects.filter(name__startswith=f'{self.prefix} ').order_by('id')
+                              .values_list('id', flat=True))
+            self.insert(Tag, [Tag(name=f'{self.prefix}-{self.words(1)}-{i + 1}') for i in range(c['tags'])])
+            tags = list(Tag.objects.filter(name__startswith=f'{self.prefix}-').order_by('id')
+                        .values_list('id', flat=True))
+
+            activities = []
+            for i in range(c['activities']):
+                start = FIRST_DAY + timedelta(days=self.rng.randrange(365))
+                activities.append(Activity(
+                    title=f'{self.words(3).capitalize()} {i + 1}', description=f'<p>{self.words(20)}</p>',
+                    start_date=start, end_date=start + timedelta(days=self.rng.randrange(4)),
+                    created_by_id=self.rng.choice(self.organizers), capacity=self.rng.choice([50, 100, 200, 500]),
+                    status=self.rng.choices(STATUSES, STATUS_WEIGHTS)[0], category_id=self.rng.choice(categories),
+                ))
+            self.insert(Activity, activities)
+            self.activities = list(Activity.objects.filter(created_by__in=self.organizers).order_by('id')
+                                   .values_list('id', flat=True))
+
+            self.insert(Activity.tags.through, [
+                Activity.tags.through(activity_id=activity_id, tag_id=tag_id)
+                for activity_id in self.activities for tag_id in self.rng.sample(tags, min(3, len(tags)))
+            ])
+            self.insert(NewsFeed, [NewsFeed(activity_id=activity_id, created_by_id=self.rng.choice(self.organizers))
+                                   for activity_id in self.activities])
+            self.newsfeeds = list(NewsFeed.objects.filter(activity__created_by__in=self.organizers).order_by('id')
+                                  .values_list('id', flat=True))
+
+    def seed_points(self):
+        """Mỗi sinh viên tham gia vài hoạt động và được chấm điểm theo các tiêu chí ở chính các hoạt động đó."""
+        c = self.counts
+        per_student = min(c['participations_per_student'], len(self.activities))
+        for start in range(0, len(self.students), self.chunk_size):
+            chunk = self.students[start:start + self.chunk_size]
+            participations = []
+            points = []
+            for student_id in chunk:
+                activity_ids = self.rng.sample(self.activities, per_student)
+                participations.extend(Participation(student_id=student_id, activity_id=activity_id,
+                                                    is_completed=self.rng.random() < 0.8)
+                                      for activity_id in activity_ids)
+
+                pairs = [(a, criteria) for a in activity_ids for criteria in self.criteria]
+                student_points = [(a, criteria_id, group_id, float(self.rng.randint(1, max(1, int(score)))))
+                                  for a, (criteria_id, group_id, score)
+                                  in self.rng.sample(pairs, min(c['points_per_student'], len(pairs)))]
+                # group_total_score như DisciplinePoint.calculate_group_total_score sau khi đã ghi đủ
+                sums = {}
+                for a, criteria_id, group_id, score in student_points:
+                    sums[(a, group_id)] = sums.get((a, group_id), 0) + score
+                points.extend(DisciplinePoint(student_id=student_id, activity_id=a, criteria_id=criteria_id,
+                                              score=score,
+                                              group_total_score=min(sums[(a, group_id)], self.max_scores[group_id]))
+                              for a, criteria_id, group_id, score in student_points)
+
+            with transaction.atomic():
+                self.insert(Participation, participations)
+                self.insert(DisciplinePoint, points)
+                scoring.rebuild_ledger(chunk)
+            self.out(f'  {min(start + self.chunk_size, len(self.students))}/{len(self.students)} students, '
+                     f'{self.created[DisciplinePoint.__name__]} points')
+
+    def seed_interactions(self):
+        c = self.counts
+        likes = min(c['likes_per_post'], len(self.students))
+        with transaction.atomic():
+            for start in range(0, len(self.newsfeeds), self.chunk_size):
+                chunk = self.newsfeeds[start:start + self.chunk_size]
+                self.insert(Like, [Like(user_id=user_id, newsfeed_id=newsfeed_id) for newsfeed_id in chunk
+                                   for user_id in self.rng.sample(self.students, likes)])
+                self.insert(Comment, [Comment(user_id=self.rng.choice(self.students), newsfeed_id=newsfeed_id,
+                                              content=self.words(8).capitalize())
+                                      for newsfeed_id in chunk for i in range(c['comments_per_post'])])
+            if len(self.students) > 1:
+                self.insert(Message, [Message(sender_id=sender, receiver_id=receiver)
+                                      for sender, receiver in (self.rng.sample(self.students, 2)
+                                                               for i in range(c['messages']))])
+
+    def finish(self):
+        rollups.rebuild()
+        search.rebuild()
+        for start in range(0, len(self.newsfeeds), self.chunk_size):
+            feed.refresh_counters(self.newsfeeds[start:start + self.chunk_size])
+        caching.bump(caching.CATEGORIES, caching.ACTIVITIES, caching.PARTICIPATIONS, caching.NEWSFEED)
@@ -73,6 +73,14 @@ class DisciplinePointSerializer(serializers.ModelSerializer):
         fields = ['id', 'student','activity', 'criteria', 'score', 'group_total_score']
 
 
+class DisciplinePointBulkItemSerializer(serializers.Serializer):
+    # Chỉ kiểm tra kiểu dữ liệu, sự tồn tại của khóa ngoại được kiểm tra theo lô
+    student = serializers.IntegerField()
+    activity = serializers.IntegerField()
+    criteria = serializers.IntegerField()
+    score = serializers.FloatField()
+
+
 class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
@@ -80,10 +88,17 @@ class ReportSerializer(serializers.ModelSerializer):
         read_only_fields = ['student']
 
 class NewsFeedSerializer(serializers.ModelSerializer):
+    liked_by_me = serializers.SerializerMethodField()
+
+    def get_liked_by_me(self, newsfeed):
+        # Chỉ có khi queryset được annotate bằng feed.liked_subquery; NewsFeedViewSet.list lấy giá trị này từ
+        # feed.live_counters (live() của conditional_response) chứ không qua serializer
+        return getattr(newsfeed, 'liked_by_me', False)
+
     class Meta:
         model = NewsFeed
-        fields = ['id', 'activity', 'created_date']
-        read_only_fields = ['created_by']
+        fields = ['id', 'activity', 'created_date', 'like_count', 'comment_count', 'liked_by_me']
+        read_only_fields = ['created_by', 'like_count', 'comment_count']
 
 class LikeSerializer(serializers.ModelSerializer):
     user = UserSerializer()
@@ -95,9 +110,25 @@ class LikeSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
+    author = serializers.SerializerMethodField()
+
+    def get_author(self, comment):
+        # comment.user được select_related cùng trang bình luận
+        user = comment.user
+        return {'id': user.id, 'username': user.username, 'avatar': user.avatar.url if user.avatar else ''}
+
     class Meta:
         model = Comment
-        fields = ['id', 'user', 'newsfeed', 'content', 'created_date']
+        fields = ['id', 'user', 'author', 'newsfeed', 'content', 'created_date']
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    # Dòng do leaderboard.rank_rows tạo, thứ hạng tính khi đọc
+    rank = serializers.IntegerField()
+    dense_rank = serializers.IntegerField()
+    percentile = serializers.FloatField()
+    total_score = serializers.FloatField()
+    student = serializers.DictField()
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -0,0 +1,144 @@
+"""
+Thống kê phân loại sinh viên theo tổng điểm đã chặn (mỗi nhóm không vượt điểm tối đa).
+
+Dữ liệu lấy bằng một truy vấn trên sổ điểm theo nhóm, tính toán dạng vector bằng NumPy (có trong requirements.txt;
+nếu thiếu thì dùng Python thuần, cùng kết quả, xem ScoreStatsTests) và lưu vào cache theo phiên bản dữ liệu.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Coalesce
+
+from scores import leaderboard, scheme
+from scores.models import Class, StudentGroupScore
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Ngưỡng phân loại theo tổng điểm đã chặn: (tên, điểm tối thiểu)
+BUCKETS = [('excellent', 90), ('good', 75), ('average', 50), ('poor', None)]
+PERCENTILES = [10, 25, 50, 75, 90]
+CACHE_TIMEOUT = getattr(settings, 'SCORES_STATS_CACHE_TIMEOUT', 3600)
+
+
+def data_version():
+    """
+    Dấu vân tay của đầu vào thống kê, đọc bằng một truy vấn gộp: danh sách sinh viên, lớp và tổng điểm đã chặn
+    của từng sinh viên (trọng số theo id để phát hiện cả khi điểm chuyển giữa hai sinh viên), kèm phiên bản
+    thang điểm. Chỉ đổi khi chính các đầu vào này đổi; đường ghi điểm không phải cập nhật dòng dùng chung nào.
+    """
+    fingerprint = leaderboard.students().aggregate(
+        n=Count('id'),
+        total=Coalesce(Sum('total_score'), 0.0),
+        weighted=Coalesce(Sum(F('total_score') * F('id'), output_field=FloatField()), 0.0),
+        classes=Coalesce(Sum(Coalesce('student_class_id', 0) * F('id')), 0),
+    )
+    return (f"{fingerprint['n']}-{fingerprint['total']:.4f}-{fingerprint['weighted']:.4f}-"
+            f"{fingerprint['classes']}-{scheme.get_scheme().version}")
+
+
+def load():
+    """Trả về (danh sách (student_id, class_id), danh sách (student_id, group_id, raw_score))."""
+    students = leaderboard.students()
+    student_classes = list(students.order_by('id').values_list('id', 'student_class_id'))
+    group_sums = list(StudentGroupScore.objects.filter(student__in=students)
+                      .values_list('student_id', 'group_id', 'raw_score'))
+    return student_classes, group_sums
+
+
+def capped_totals(student_classes, group_sums):
+    """Tổng điểm đã chặn của từng sinh viên, theo thứ tự của student_classes."""
+    evaluation_scheme = scheme.get_scheme()
+    index = {student_id: i for i, (student_id, class_id) in enumerate(student_classes)}
+    rows = [(index[student_id], evaluation_scheme.max_score(group_id), raw)
+            for student_id, group_id, raw in group_sums if student_id in index]
+
+    if np is not None:
+        if not rows:
+            return np.zeros(len(student_classes))
+        positions, caps, raws = zip(*rows)
+        caps = np.array([float('inf') if c is None else c for c in caps], dtype=float)
+        capped = np.minimum(np.array(raws, dtype=float), caps)
+        return np.bincount(np.array(positions), weights=capped, minlength=len(student_classes))
+
+    totals = [0.0] * len(student_classes)
+    for position, cap, raw in rows:
+        totals[position] += raw if cap is None else min(raw, cap)
+    return totals
+
+
+def _percentile(ordered, q):
+    # Nội suy tuyến tính, giống numpy.percentile mặc định
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(totals):
+    """Số sinh viên, trung bình, trung vị, phân vị và số sinh viên mỗi mức phân loại."""
+    result = {'student_count': len(totals), 'mean': None, 'median': None,
+              'percentiles': {f'p{q}': None for q in PERCENTILES}}
+    result.update({name: 0 for name, minimum in BUCKETS})
+    if not len(totals):
+        return result
+
+    if np is not None:
+        values = np.asarray(totals, dtype=float)
+        mean = float(values.mean())
+        percentiles = [float(p) for p in np.percentile(values, PERCENTILES)]
+        median = float(np.median(values))
+        remaining = np.ones(len(values), dtype=bool)
+        for name, minimum in BUCKETS:
+            matched = remaining if minimum is None else remaining & (values >= minimum)
+            result[name] = int(matched.sum())
+            remaining &= ~matched
+    else:
+        ordered = sorted(totals)
+        mean = sum(ordered) / len(ordered)
+        percentiles = [_percentile(ordered, q) for q in PERCENTILES]
+        median = _percentile(ordered, 50)
+        for value in ordered:
+            for name, minimum in BUCKETS:
+                if minimum is None or value >= minimum:
+                    result[name] += 1
+                    break
+
+    result['mean'] = round(mean, 2)
+    result['median'] = round(median, 2)
+    result['percentiles'] = {f'p{q}': round(p, 2) for q, p in zip(PERCENTILES, percentiles)}
+    return result
+
+
+def compute():
+    student_classes, group_sums = load()
+    totals = capped_totals(student_classes, group_sums)
+
+    by_class = {}
+    for position, (student_id, class_id) in enumerate(student_classes):
+        by_class.setdefault(class_id, []).append(position)
+    class_names = dict(Class.objects.filter(pk__in=[c for c in by_class if c]).values_list('id', 'name'))
+
+    classes = []
+    for class_id, positions in sorted(by_class.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+        if np is not None:
+            class_totals = totals[np.array(positions)]
+        else:
+            class_totals = [totals[p] for p in positions]
+        classes.append({'class_id': class_id, 'name': class_names.get(class_id, 'Chưa xếp lớp'),
+                        **summarize(class_totals)})
+
+    return {'overall': summarize(totals), 'by_class': classes}
+
+
+def get_stats():
+    """Thống kê phân loại, tính lại chỉ khi dữ liệu đã đổi."""
+    version = data_version()
+    key = f'scores:classification:{version}'
+    result = cache.get(key)
+    if result is None:
+        result = {'data_version': version, **compute()}
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -1,3 +1,1243 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib.util
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from scores import (caching, exports, fastpath, feed, history, leaderboard, paginators, reports, rollups, scheme,
+                    scoring, search, serializers, stats)
+from scores.models import (Activity, Category, Class, Comment, DataVersion, Department, DisciplinePoint,
+                           EvaluationCriteria, EvaluationGroup, LeaderboardScope, LeaderboardScore, Like, NewsFeed,
+                           Participation, PendingLike, Report, ScoreEvent, ScoreRecomputeJob, ScoreReport, ScoreRollup,
+                           ScoreSnapshot, StudentGroupScore, Tag, User)
+
+
+class ScoreTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='CNTT', code='IT')
+        cls.student_class = Class.objects.create(name='DH21IT01', code='IT01', department=cls.department)
+        cls.staff = User.objects.create_user(username='staff', password='123', is_staff=True)
+        cls.student = User.objects.create_user(username='sv1', password='123', department=cls.department,
+                                               student_class=cls.student_class)
+        cls.category = Category.objects.create(name='Tình nguyện')
+        cls.activity = Activity.objects.create(title='Mùa hè xanh', description='<p>MHX</p>',
+                                               start_date=date(2025, 1, 1), end_date=date(2025, 1, 10),
+                                               created_by=cls.staff, capacity=100, category=cls.category)
+        cls.group_a = EvaluationGroup.objects.create(name='Ý thức học tập', max_score=20)
+        cls.group_b = EvaluationGroup.objects.create(name='Hoạt động xã hội', max_score=25)
+        cls.criteria_a = EvaluationCriteria.objects.create(group=cls.group_a, name='Tham gia', score=5)
+        cls.criteria_b = EvaluationCriteria.objects.create(group=cls.group_b, name='Tình nguyện', score=10)
+
+    def add_point(self, score, criteria=None, student=None, activity=None):
+        return DisciplinePoint.objects.create(student=student or self.student, activity=activity or self.activity,
+                                              criteria=criteria or self.criteria_a, score=score)
+
+    def total_score(self, student=None):
+        return User.objects.get(pk=(student or self.student).pk).total_score
+
+
+class StudentGroupScoreTests(ScoreTestCase):
+    def test_create_update_delete_adjust_ledger(self):
+        p1 = self.add_point(15)
+        p2 = self.add_point(10)
+        self.add_point(8, criteria=self.criteria_b)
+
+        entry = StudentGroupScore.objects.get(student=self.student, group=self.group_a)
+        self.assertEqual(entry.raw_score, 25)
+        self.assertEqual(entry.capped_score, 20)
+        self.assertEqual(p2.group_total_score, 20)
+        self.assertEqual(self.total_score(), 28)
+
+        p1.score = 2
+        p1.save()
+        self.assertEqual(self.total_score(), 20)
+
+        p2.delete()
+        self.assertEqual(self.total_score(), 10)
+        self.assertEqual(scoring.check_ledger(), [])
+
+    def test_moving_point_to_another_group(self):
+        p = self.add_point(12)
+        p.criteria = self.criteria_b
+        p.save()
+
+        self.assertEqual(StudentGroupScore.objects.get(student=self.student, group=self.group_a).raw_score, 0)
+        self.assertEqual(self.total_score(), 12)
+        self.assertEqual(scoring.check_ledger(), [])
+
+    def test_group_total_is_shared_by_every_point_of_the_group(self):
+        def group_totals():
+            return list(DisciplinePoint.objects.order_by('id').values_list('group_total_score', flat=True))
+
+        p1 = self.add_point(5)
+        p2 = self.add_point(10)
+        p3 = self.add_point(3)
+        self.assertEqual(group_totals(), [18, 18, 18])
+
+        p2.delete()
+        self.assertEqual(group_totals(), [8, 8])
+        p3.criteria = self.criteria_b
+        p3.save()
+        self.assertEqual(group_totals(), [5, 3])
+        DisciplinePoint.objects.filter(pk=p1.pk).delete()
+        self.assertEqual(group_totals(), [3])
+        self.assertEqual(scoring.refresh_group_totals(student_ids=[self.student.pk], dry_run=True), 0)
+
+    def test_check_and_rebuild_ledger(self):
+        self.add_point(15)
+        User.objects.filter(pk=self.student.pk).update(total_score=99)
+        StudentGroupScore.objects.filter(student=self.student).update(raw_score=1, capped_score=1)
+
+        self.assertEqual(len(scoring.check_ledger()), 2)
+        scoring.rebuild_ledger([self.student.pk])
+        self.assertEqual(scoring.check_ledger(), [])
+        self.assertEqual(self.total_score(), 15)
+
+    def test_recompute_scores_after_max_score_change(self):
+        point = self.add_point(15)
+        EvaluationGroup.objects.filter(pk=self.group_a.pk).update(max_score=10)
+
+        call_command('recompute_scores', '--dry-run', stdout=StringIO())
+        self.assertEqual(self.total_score(), 15)
+
+        call_command('recompute_scores', '--partition', 'class', stdout=StringIO())
+        point.refresh_from_db()
+        self.assertEqual(self.total_score(), 10)
+        self.assertEqual(point.group_total_score, 10)
+        self.assertEqual(scoring.check_ledger(), [])
+
+
+class DisciplinePointBulkTests(ScoreTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_bulk_upsert_reports_row_errors(self):
+        existing = self.add_point(5)
+        other = User.objects.create_user(username='sv2', password='123')
+
+        res = self.client.post('/disciplined/bulk/', {'points': [
+            {'student': self.student.pk, 'activity': self.activity.pk, 'criteria': self.criteria_a.pk, 'score': 18},
+            {'student': self.student.pk, 'activity': self.activity.pk, 'criteria': self.criteria_b.pk, 'score': 7},
+            {'student': other.pk, 'activity': self.activity.pk, 'criteria': self.criteria_b.pk, 'score': 30},
+            {'student': 9999, 'activity': self.activity.pk, 'criteria': self.criteria_a.pk, 'score': 1},
+            {'student': self.student.pk, 'activity': self.activity.pk, 'criteria': self.criteria_a.pk, 'score': 'x'},
+        ]}, format='json')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.data['created'], res.data['updated']), (2, 1))
+        self.assertEqual([e['index'] for e in res.data['errors']], [3, 4])
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.score, 18)
+        self.assertEqual(existing.group_total_score, 18)
+        self.assertEqual(self.total_score(), 25)
+        self.assertEqual(self.total_score(other), 25)
+        self.assertEqual(scoring.check_ledger(), [])
+
+        # Nhật ký ghi theo từng điểm như khi lưu từng điểm, không phải một sự kiện 'recompute' cho cả nhóm
+        created = DisciplinePoint.objects.get(student=self.student, criteria=self.criteria_b)
+        self.assertEqual(list(ScoreEvent.objects.filter(student=self.student).order_by('sequence')
+                              .values_list('action', 'point_id', 'delta', 'total_score')),
+                         [('create', existing.pk, 5, 5), ('create', created.pk, 7, 12),
+                          ('update', existing.pk, 13, 25)])
+
+    def test_bulk_requires_staff(self):
+        self.client.force_authenticate(self.student)
+        res = self.client.post('/disciplined/bulk/', [], format='json')
+        self.assertEqual(res.status_code, 403)
+
+
+class LeaderboardTests(ScoreTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.others = [User.objects.create_user(username=f'sv{i}', password='123', department=self.department,
+                                                student_class=self.student_class) for i in range(2, 5)]
+
+    def test_ranks_follow_score_changes(self):
+        self.add_point(10)
+        self.add_point(10, student=self.others[0])
+        self.add_point(5, student=self.others[1])
+
+        self.client.force_authenticate(self.others[1])
+        ranks = self.client.get('/users/my-rank/').data
+        self.assertEqual((ranks['class']['rank'], ranks['class']['dense_rank']), (3, 2))
+        self.assertEqual(ranks['class']['size'], 4)
+
+        self.add_point(20, student=self.others[1])
+        ranks = self.client.get('/users/my-rank/').data
+        self.assertEqual(ranks['class']['rank'], 1)
+        self.assertEqual(ranks['school']['percentile'], 100)
+
+        res = self.client.get('/leaderboards/', {'scope': 'class', 'scope_id': self.student_class.pk})
+        self.assertEqual(res.data['count'], 4)
+        self.assertEqual([r['rank'] for r in res.data['results']], [1, 2, 2, 4])
+        self.assertEqual(res.data['results'][0]['student']['username'], 'sv3')
+
+        # Trang sau: dòng đầu trang đồng hạng với dòng cuối trang trước
+        res = self.client.get('/leaderboards/', {'scope': 'class', 'scope_id': self.student_class.pk,
+                                                 'page': 2, 'page_size': 2})
+        self.assertEqual([(r['rank'], r['dense_rank']) for r in res.data['results']], [(2, 2), (4, 3)])
+        self.assertEqual(res.data['results'][1]['percentile'], 25)
+
+    def test_counts_follow_scores_moves_and_deletes(self):
+        def counts():
+            return (set(LeaderboardScore.objects.filter(student_count__gt=0)
+                        .values_list('scope', 'scope_id', 'total_score', 'student_count')),
+                    set(LeaderboardScope.objects.filter(size__gt=0).values_list('scope', 'scope_id', 'size')))
+
+        other_class = Class.objects.create(name='DH21IT02', code='IT02', department=self.department)
+        self.add_point(10)
+        point = self.add_point(7, student=self.others[0])
+        self.add_point(5, student=self.others[1])
+        scoring.bulk_upsert_points([(0, {'student': self.others[2].pk, 'activity': self.activity.pk,
+                                         'criteria': self.criteria_b.pk, 'score': 12})])
+        point.student = self.others[1]
+        point.save()
+
+        moved = User.objects.get(pk=self.others[1].pk)
+        moved.student_class = other_class
+        moved.save()
+        inactive = User.objects.get(pk=self.others[2].pk)
+        inactive.is_active = False
+        inactive.save()
+        self.others[0].delete()
+        other_class.delete()
+
+        incremental = counts()
+        leaderboard.rebuild()
+        self.assertEqual(incremental, counts())
+        self.assertIn(('school', 0, 2), incremental[1])
+
+        # Thứ hạng đọc trên bảng đếm, không đếm trên bảng User
+        self.client.force_authenticate(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            ranks = self.client.get('/users/my-rank/').data
+        self.assertEqual((ranks['school']['rank'], ranks['school']['size']), (2, 2))
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT' in q['sql'] and 'scores_user' in q['sql']])
+
+    def test_invalid_scope(self):
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get('/leaderboards/', {'scope': 'class'}).status_code, 400)
+
+
+class EvaluationSchemeCacheTests(ScoreTestCase):
+    def test_point_write_query_count(self):
+        self.add_point(1)
+        other = User.objects.create_user(username='sv2', password='123', department=self.department,
+                                         student_class=self.student_class)
+        self.add_point(4, student=other)
+        scheme.get_scheme()
+
+        # Không còn đọc EvaluationCriteria / EvaluationGroup: savepoint x2, khóa sinh viên, SUM nhóm,
+        # INSERT, sổ điểm (SELECT + UPDATE), nhật ký điểm (INSERT), tổng điểm kèm sequence nhật ký (UPDATE),
+        # group_total_score của các điểm cùng nhóm (UPDATE), bảng đếm xếp hạng (UPDATE), bảng tổng hợp
+        # (SELECT + UPDATE). Tổng điểm 3 là mức mới nên bảng đếm thêm SELECT + INSERT + UPDATE cho dòng của mức đó
+        with self.assertNumQueries(16):
+            DisciplinePoint.objects.create(student_id=self.student.pk, activity_id=self.activity.pk,
+                                           criteria_id=self.criteria_a.pk, score=2)
+
+        point = DisciplinePoint.objects.get(score=2)
+        point.score = 3
+        # Thêm SELECT điểm cũ; số điểm của sinh viên không đổi nên bảng tổng hợp không cần đếm lại;
+        # mức điểm 4 đã có (sv2) nên bảng đếm chỉ cần một UPDATE
+        with self.assertNumQueries(14):
+            point.save()
+
+    def test_admin_edit_invalidates_scheme(self):
+        self.add_point(15)
+        self.group_a.max_score = 10
+        self.group_a.save()
+
+        self.assertEqual(scheme.get_scheme().max_score(self.group_a.pk), 10)
+        self.add_point(1)
+        self.assertEqual(self.total_score(), 10)
+
+    def test_version_bump_from_another_worker(self):
+        snapshot = scheme.get_scheme()
+        EvaluationGroup.objects.filter(pk=self.group_b.pk).update(max_score=5)
+        DataVersion.bump(scheme.VERSION_NAME)
+
+        scheme._checked_at = 0
+        self.assertIsNot(scheme.get_scheme(), snapshot)
+        self.assertEqual(scheme.get_scheme().max_score(self.group_b.pk), 5)
+
+
+@override_settings(SCORES_RECOMPUTE_MODE='deferred')
+class DeferredRecomputeTests(ScoreTestCase):
+    def test_writes_are_coalesced_until_worker_runs(self):
+        points = [self.add_point(3) for i in range(5)]
+        points[0].delete()
+        self.add_point(4, criteria=self.criteria_b)
+
+        self.assertEqual(ScoreRecomputeJob.objects.count(), 1)
+        self.assertEqual(self.total_score(), 0)
+
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertTrue(client.get('/users/score-status/').data['pending'])
+
+        call_command('process_score_queue', stdout=StringIO())
+
+        self.assertFalse(client.get('/users/score-status/').data['pending'])
+        self.assertEqual(self.total_score(), 16)
+        points[4].refresh_from_db()
+        self.assertEqual(points[4].group_total_score, 12)
+        self.assertEqual(scoring.check_ledger(), [])
+
+
+class ScoreHistoryTests(ScoreTestCase):
+    def test_score_as_of_replays_bounded_tail(self):
+        with patch.object(history, 'SNAPSHOT_INTERVAL', 3):
+            times = []
+            for score in [5, 10, 8, 4]:
+                p = self.add_point(score)
+                times.append(timezone.now())
+            p.delete()
+            self.add_point(6, criteria=self.criteria_b)
+
+        self.assertEqual(list(ScoreSnapshot.objects.filter(student=self.student).values_list('sequence', flat=True)),
+                         [3, 6])
+        # Lưu hồ sơ từ bản đã cũ không ghi đè tổng điểm / sequence do sổ điểm ghi
+        self.student.first_name = 'An'
+        self.student.save()
+        self.assertEqual(User.objects.filter(pk=self.student.pk).values_list('total_score', 'score_sequence').get(),
+                         (26, 6))
+
+        state = history.score_as_of(self.student.pk, times[1])
+        self.assertEqual(state['total_score'], 15)
+        self.assertEqual(state['events_replayed'], 2)
+
+        state = history.score_as_of(self.student.pk, times[3])
+        self.assertEqual(state['total_score'], 20)
+        self.assertEqual(state['group_scores'], {str(self.group_a.pk): 20})
+        self.assertEqual(state['events_replayed'], 1)
+
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        res = client.get('/users/score-as-of/', {'student_id': self.student.pk, 'at': timezone.now().isoformat()})
+        self.assertEqual(res.data['total_score'], 26)
+        self.assertEqual(res.data['events_replayed'], 0)
+        self.assertEqual(client.get('/users/score-as-of/').status_code, 400)
+
+
+class ScoreRollupTests(ScoreTestCase):
+    def rollup_values(self):
+        fields = ['total_score', 'point_count', 'student_count']
+        return {(r['scope'], r['scope_id']): {f: r[f] for f in fields}
+                for r in ScoreRollup.objects.values('scope', 'scope_id', *fields) if r['point_count']}
+
+    def test_incremental_rollups_match_rebuild(self):
+        other = User.objects.create_user(username='sv2', password='123', department=self.department)
+        p1 = self.add_point(95)
+        p2 = self.add_point(60, student=other)
+        self.add_point(40, student=other, criteria=self.criteria_b)
+        p1.score = 80
+        p1.save()
+        p2.student = self.student
+        p2.save()
+        p1.delete()
+        scoring.bulk_upsert_points([(0, {'student': other.pk, 'activity': self.activity.pk,
+                                         'criteria': self.criteria_b.pk, 'score': 91})])
+
+        incremental = self.rollup_values()
+        self.assertEqual(incremental[('class', self.student_class.pk)]['student_count'], 1)
+        self.assertEqual(incremental[('department', self.department.pk)]['point_count'], 2)
+
+        rollups.rebuild()
+        self.assertEqual(incremental, self.rollup_values())
+
+    def test_queryset_and_cascade_deletes_count_each_student_once(self):
+        other_activity = Activity.objects.create(title='Hiến máu', description='<p>HM</p>',
+                                                 start_date=date(2025, 2, 1), end_date=date(2025, 2, 2),
+                                                 created_by=self.staff, capacity=10, category=self.category)
+        self.add_point(5)
+        self.add_point(6, criteria=self.criteria_b)
+        self.add_point(7, activity=other_activity)
+        self.add_point(8, activity=other_activity, criteria=self.criteria_b)
+
+        other_activity.delete()
+        self.assertEqual(self.rollup_values()[('class', self.student_class.pk)],
+                         {'total_score': 11, 'point_count': 2, 'student_count': 1})
+
+        DisciplinePoint.objects.filter(student=self.student).delete()
+        self.assertEqual(self.rollup_values(), {})
+        self.assertEqual(ScoreRollup.objects.get(scope='class', scope_id=self.student_class.pk).student_count, 0)
+        self.assertEqual(scoring.check_ledger(), [])
+
+    def test_class_and_department_moves_carry_rollups(self):
+        department = Department.objects.create(name='Kinh tế', code='EC')
+        student_class = Class.objects.create(name='DH21EC01', code='EC01', department=department)
+        self.add_point(5)
+        point = self.add_point(6, criteria=self.criteria_b)
+        old_version = ScoreRollup.objects.get(scope='class', scope_id=self.student_class.pk).version
+
+        student = User.objects.get(pk=self.student.pk)
+        student.student_class, student.department = student_class, department
+        student.save()
+        point.delete()
+        self.assertGreater(ScoreRollup.objects.get(scope='class', scope_id=self.student_class.pk).version,
+                           old_version)
+        self.assertEqual(self.rollup_values()[('class', student_class.pk)],
+                         {'total_score': 5, 'point_count': 1, 'student_count': 1})
+
+        # Xóa khoa (kéo theo lớp) chuyển sinh viên về "chưa xếp lớp / khoa"
+        department.delete()
+        incremental = self.rollup_values()
+        self.assertEqual(incremental[('department', rollups.NO_SCOPE)]['point_count'], 1)
+        rollups.rebuild()
+        self.assertEqual(incremental, self.rollup_values())
+
+    def test_stats_page_reads_rollups(self):
+        self.add_point(95)
+        # Trang thống kê chỉ dành cho người đã đăng nhập trang quản trị
+        self.assertEqual(self.client.get('/admin/score-stats/').status_code, 302)
+
+        admin = User.objects.create_superuser(username='admin', password='123')
+        self.client.force_login(admin)
+        self.assertEqual(self.client.get('/admin/score-stats/', {'class': 'abc'}).status_code, 400)
+
+        res = self.client.get('/admin/score-stats/', {'class': self.student_class.pk})
+        self.assertEqual(res.context['classification'][0]['poor'], 1)
+        self.assertEqual(res.context['stats_by_department'][0]['avg_score'], 95)
+
+        res = self.client.post('/admin/score-stats/rebuild/')
+        self.assertEqual(res.status_code, 302)
+
+
+class ExportCsvTests(ScoreTestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', password='123')
+        self.client.force_login(admin)
+
+    def read_rows(self, response):
+        content = b''.join(response.streaming_content)
+        if response['Content-Type'] == 'application/gzip':
+            content = gzip.decompress(content)
+        return list(csv.reader(StringIO(content.decode('utf-8-sig'))))
+
+    def test_streams_filtered_rows_with_group_and_criteria_names(self):
+        other = User.objects.create_user(username='sv2', password='123')
+        self.add_point(8)
+        self.add_point(4, criteria=self.criteria_b)
+        self.add_point(6, student=other)
+
+        with patch.object(exports, 'CHUNK_SIZE', 1):
+            res = self.client.get('/admin/export-csv/', {'class': self.student_class.pk})
+        rows = self.read_rows(res)
+        self.assertEqual(rows[0][0], 'Student')
+        self.assertEqual([r[0] for r in rows[1:]], ['sv1', 'sv1'])
+        self.assertEqual(rows[2][5:8], ['Hoạt động xã hội', 'Tình nguyện', '4.0'])
+
+        today = timezone.localdate().isoformat()
+        res = self.client.get('/admin/export-csv/', {'date_from': today, 'date_to': today, 'gzip': '1'})
+        self.assertEqual(len(self.read_rows(res)), 4)
+        res = self.client.get('/admin/export-csv/', {'date_to': '2000-01-01'})
+        self.assertEqual(len(self.read_rows(res)), 1)
+
+    def test_invalid_filter_is_rejected(self):
+        self.assertEqual(self.client.get('/admin/export-csv/', {'date_from': 'hôm qua'}).status_code, 400)
+
+
+class ScoreReportTests(ScoreTestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', password='123')
+        self.client.force_login(admin)
+        self.report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.report_dir.cleanup)
+        patcher = patch.object(reports, 'REPORT_DIR', self.report_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_report_is_keyed_by_scope_data_version(self):
+        self.add_point(8)
+        report = reports.request_report(ScoreReport.SCOPE_CLASS, self.student_class.pk)
+        school = reports.request_report(ScoreReport.SCOPE_SCHOOL)
+        self.assertEqual(reports.request_report(ScoreReport.SCOPE_CLASS, self.student_class.pk).pk, report.pk)
+
+        # Điểm của sinh viên ngoài lớp không làm báo cáo của lớp hết hạn
+        other = User.objects.create_user(username='sv2', password='123')
+        self.add_point(5, student=other)
+        self.assertEqual(reports.request_report(ScoreReport.SCOPE_CLASS, self.student_class.pk).pk, report.pk)
+        self.assertNotEqual(reports.request_report(ScoreReport.SCOPE_SCHOOL).pk, school.pk)
+
+        point = self.add_point(3)
+        point.activity = Activity.objects.create(title='Hiến máu', description='', start_date=date(2025, 2, 1),
+                                                 end_date=date(2025, 2, 1), created_by=self.staff, capacity=10,
+                                                 category=self.category)
+        version = reports.data_version(ScoreReport.SCOPE_CLASS, self.student_class.pk)
+        point.save()
+        self.assertGreater(reports.data_version(ScoreReport.SCOPE_CLASS, self.student_class.pk), version)
+
+    def test_department_sections_follow_student_department(self):
+        # Sinh viên của khoa khác học trong lớp của khoa này thì không thuộc báo cáo khoa (giống ScoreRollup)
+        other = Department.objects.create(name='Kinh tế', code='KT')
+        outsider = User.objects.create_user(username='sv2', password='123', department=other,
+                                            student_class=self.student_class)
+        self.add_point(8)
+        self.add_point(5, student=outsider)
+        rows = {title: points.count() for title, points in reports.sections(ScoreReport.SCOPE_DEPARTMENT,
+                                                                             self.department.pk)}
+        self.assertEqual(rows, {self.student_class.name: 1, 'Chưa xếp lớp': 0})
+
+    def test_export_pdf_queues_report_for_background_worker(self):
+        res = self.client.get('/admin/export-pdf/', {'class': self.student_class.pk})
+        self.assertRedirects(res, '/admin/scores/scorereport/', fetch_redirect_response=False)
+        report = ScoreReport.objects.get()
+        self.assertEqual((report.scope, report.status), (ScoreReport.SCOPE_CLASS, ScoreReport.STATUS_PENDING))
+
+        res = self.client.get(f'/admin/score-reports/{report.pk}/download/')
+        self.assertEqual(res.status_code, 404)
+
+    @skipUnless(importlib.util.find_spec('reportlab'), 'reportlab is not installed')
+    def test_generated_report_is_served_from_cache(self):
+        for i in range(5):
+            self.add_point(i)
+        self.client.get('/admin/export-pdf/', {'department': self.department.pk})
+        with patch.object(reports, 'ROWS_PER_PAGE', 2):
+            call_command('process_score_reports', stdout=StringIO())
+
+        report = ScoreReport.objects.get()
+        self.assertEqual((report.status, report.row_count), (ScoreReport.STATUS_DONE, 5))
+        res = self.client.get('/admin/export-pdf/', {'department': self.department.pk})
+        self.assertEqual(res['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(res.streaming_content).startswith(b'%PDF'))
+
+
+class ScoreStatsTests(ScoreTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_classification_uses_capped_student_totals(self):
+        other = User.objects.create_user(username='sv2', password='123', student_class=self.student_class)
+        User.objects.create_user(username='sv3', password='123')
+        # 30 điểm ở nhóm A bị chặn còn 20: tổng 45 -> Yếu dù từng điểm lẻ đều >= 10
+        self.add_point(30)
+        self.add_point(25, criteria=self.criteria_b)
+        self.add_point(10, student=other)
+
+        result = stats.get_stats()
+        self.assertEqual(result['overall']['student_count'], 3)
+        self.assertEqual(result['overall']['median'], 10)
+        self.assertEqual(result['overall']['poor'], 3)
+        class_stats = result['by_class'][0]
+        self.assertEqual((class_stats['name'], class_stats['student_count'], class_stats['mean']),
+                         ('DH21IT01', 2, 27.5))
+        self.assertEqual(result['by_class'][1]['name'], 'Chưa xếp lớp')
+
+        self.assertEqual(stats.summarize([50, 95, 80, 10])['percentiles']['p25'], 40)
+
+    @skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+    def test_numpy_and_pure_python_paths_agree(self):
+        other = User.objects.create_user(username='sv2', password='123', student_class=self.student_class)
+        for score, criteria, student in [(30, self.criteria_a, self.student), (25, self.criteria_b, self.student),
+                                         (12.5, self.criteria_a, other), (90, self.criteria_b, other)]:
+            self.add_point(score, criteria=criteria, student=student)
+
+        totals = [50, 95, 80, 10, 77.5, 90]
+        vectorized = stats.compute(), stats.summarize(totals)
+        with patch.object(stats, 'np', None):
+            self.assertEqual((stats.compute(), stats.summarize(totals)), vectorized)
+        self.assertEqual(vectorized[0]['overall']['excellent'], 0)
+
+    def test_results_are_cached_until_scores_change(self):
+        self.add_point(5)
+        first = stats.get_stats()
+        with self.assertNumQueries(1):
+            self.assertEqual(stats.get_stats(), first)
+        # Ghi không đổi đầu vào thống kê (tổng điểm, lớp, danh sách sinh viên) không làm mất cache
+        User.objects.filter(pk=self.student.pk).get().save()
+        self.assertEqual(stats.data_version(), first['data_version'])
+
+        self.add_point(7)
+        self.assertEqual(stats.get_stats()['overall']['mean'], 12)
+
+    def test_api_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        self.assertEqual(client.get('/score-stats/').status_code, 403)
+
+        self.add_point(8)
+        client.force_authenticate(self.staff)
+        res = client.get('/score-stats/', {'class': self.student_class.pk})
+        self.assertEqual([c['class_id'] for c in res.data['by_class']], [self.student_class.pk])
+
+
+class AdminChangelistTests(ScoreTestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(username='admin', password='123')
+        self.client.force_login(admin)
+
+    def add_rows(self, start, count):
+        for i in range(start, start + count):
+            student = User.objects.create_user(username=f'sv-{i}', password='123', student_class=self.student_class)
+            activity = Activity.objects.create(title=f'Hoạt động {i}', description='', start_date=date(2025, 1, 1),
+                                               end_date=date(2025, 1, 1), created_by=self.staff, capacity=10,
+                                               category=self.category)
+            self.add_point(1, student=student, activity=activity)
+            Participation.objects.create(student=student, activity=activity)
+            Report.objects.create(student=student, activity=activity, proof='reports/x.png', handled_by=self.staff)
+            Class.objects.create(name=f'Lớp {i}', code=f'L{i}', department=self.department)
+
+    def changelist_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200)
+        return len(queries)
+
+    # Tên tiêu chí đọc từ bộ nhớ đệm thang điểm, vốn kiểm tra lại phiên bản mỗi CHECK_INTERVAL giây
+    @patch('scores.scheme.CHECK_INTERVAL', 3600)
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = ['/admin/scores/disciplinepoint/', '/admin/scores/participation/', '/admin/scores/report/',
+                '/admin/scores/class/']
+        self.add_rows(0, 2)
+        before = [self.changelist_queries(url) for url in urls]
+        self.add_rows(2, 10)
+        self.assertEqual([self.changelist_queries(url) for url in urls], before)
+
+    def test_autocomplete_filter(self):
+        self.add_rows(0, 3)
+        student = User.objects.get(username='sv-1')
+        res = self.client.get('/admin/scores/disciplinepoint/', {'student__id__exact': student.pk})
+        self.assertEqual(res.context['cl'].result_count, 1)
+        self.assertContains(res, f'<option value="{student.pk}" selected>sv-1</option>', html=True)
+        self.assertNotContains(res, 'sv-2')
+
+        res = self.client.get('/admin/autocomplete/', {'app_label': 'scores', 'model_name': 'disciplinepoint',
+                                                       'field_name': 'student', 'term': 'sv-'})
+        self.assertEqual(len(res.json()['results']), 3)
+
+        res = self.client.get('/admin/scores/disciplinepoint/', {'student__id__exact': 'abc'})
+        self.assertRedirects(res, '/admin/scores/disciplinepoint/?e=1', fetch_redirect_response=False)
+
+
+class ActivitySearchTests(ScoreTestCase):
+    def create_activity(self, title, description='', category=None):
+        return Activity.objects.create(title=title, description=description, start_date=date(2025, 3, 1),
+                                       end_date=date(2025, 3, 1), created_by=self.staff, capacity=10,
+                                       category=category or self.category)
+
+    def titles(self, query):
+        return list(search.search(Activity.objects.all(), query).values_list('title', flat=True))
+
+    def test_ranked_prefix_search_over_title_description_tags_and_category(self):
+        in_title = self.create_activity('Hiến máu nhân đạo')
+        in_description = self.create_activity('Ngày hội', '<p>Có <b>hiến máu</b> tại hội trường</p>')
+        self.create_activity('Mùa xuân')
+
+        self.assertEqual(self.titles('hien mau'), [in_title.title, in_description.title])
+        self.assertEqual(self.titles('HIẾN M'), [in_title.title, in_description.title])
+        self.assertEqual(self.titles('máu xuân'), [])
+        # Thẻ HTML không được đưa vào chỉ mục
+        self.assertEqual(self.titles('hien b'), [])
+
+        tag = Tag.objects.create(name='Cộng đồng')
+        in_description.tags.add(tag)
+        self.assertEqual(self.titles('cong dong'), [in_description.title])
+        tag.name = 'Thiện nguyện'
+        tag.save()
+        self.assertEqual(self.titles('thien'), [in_description.title])
+        tag.delete()
+        self.assertEqual(self.titles('thien'), [])
+
+        self.category.name = 'Xã hội'
+        self.category.save()
+        self.assertIn(in_title.title, self.titles('xa hoi'))
+
+    def test_api_search(self):
+        for i in range(3):
+            self.create_activity(f'Tiếp sức mùa thi {i}')
+        self.create_activity('Dọn rác', 'tiếp sức')
+
+        res = APIClient().get('/activities/', {'q': 'tiep suc', 'page_size': 2})
+        self.assertEqual([a['title'] for a in res.data['results']], ['Tiếp sức mùa thi 2', 'Tiếp sức mùa thi 1'])
+        res = APIClient().get(res.data['next'])
+        self.assertEqual([a['title'] for a in res.data['results']], ['Tiếp sức mùa thi 0', 'Dọn rác'])
+        self.assertIsNone(res.data['next'])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(APIClient().get('/activities/', {'q': 'don rac'}).data['results']), 1)
+
+
+class ActivityFilterTests(ScoreTestCase):
+    def create_activity(self, title, tags=(), category=None, status='open', day=date(2025, 3, 1)):
+        activity = Activity.objects.create(title=title, description='', start_date=day, end_date=day,
+                                           created_by=self.staff, capacity=10, category=category or self.category,
+                                           status=status)
+        activity.tags.set([Tag.objects.get_or_create(name=name)[0] for name in tags])
+        return activity
+
+    def titles(self, **params):
+        res = APIClient().get('/activities/', {'page_size': 100, **params})
+        self.assertEqual(res.status_code, 200, res.data)
+        titles = []
+        while True:
+            titles += [a['title'] for a in res.data['results']]
+            if not res.data['next']:
+                return sorted(titles)
+            res = APIClient().get(res.data['next'])
+
+    def test_tags_any_and_all_without_duplicates(self):
+        self.create_activity('A', tags=['xanh', 'sạch', 'đẹp'])
+        self.create_activity('B', tags=['xanh'])
+        self.create_activity('C', tags=['đẹp'])
+        self.activity.tags.add(Tag.objects.get(name='sạch'))
+
+        self.assertEqual(self.titles(tags='xanh,đẹp'), ['A', 'B', 'C'])
+        self.assertEqual(self.titles(tags='xanh,đẹp', tags_match='all'), ['A'])
+        self.assertEqual(self.titles(tags='xanh,không có', tags_match='all'), [])
+        self.assertEqual(self.titles(tag='sạch'), ['A', 'Mùa hè xanh'])
+
+    def test_category_status_and_date_filters(self):
+        other = Category.objects.create(name='Thể thao')
+        self.create_activity('A', category=other, day=date(2025, 5, 1))
+        self.create_activity('B', status='closed', day=date(2025, 6, 1))
+
+        self.assertEqual(self.titles(categories=f'{self.category.pk},{other.pk}'), ['A', 'B', 'Mùa hè xanh'])
+        self.assertEqual(self.titles(category_id=other.pk), ['A'])
+        self.assertEqual(self.titles(status='closed'), ['B'])
+        self.assertEqual(self.titles(date_from='2025-01-05', date_to='2025-05-31'), ['A', 'Mùa hè xanh'])
+        self.assertEqual(APIClient().get('/activities/', {'categories': 'x'}).status_code, 400)
+        self.assertEqual(APIClient().get('/activities/', {'status': 'done'}).status_code, 400)
+
+
+class KeysetPaginationTests(ScoreTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def create_newsfeed(self, title):
+        activity = Activity.objects.create(title=title, description='', start_date=date(2025, 3, 1),
+                                           end_date=date(2025, 3, 1), created_by=self.staff, capacity=10,
+                                           category=self.category)
+        return NewsFeed.objects.create(activity=activity, created_by=self.staff)
+
+    def test_newsfeed_pages_do_not_shift_when_new_items_arrive(self):
+        feeds = [self.create_newsfeed(f'Tin {i}') for i in range(5)]
+        # Cùng thời điểm: thứ tự phải được quyết định bởi id
+        NewsFeed.objects.filter(pk__in=[f.pk for f in feeds[1:4]]).update(timestamp=feeds[0].timestamp)
+
+        res = self.client.get('/newsfeeds/', {'page_size': 2})
+        seen = [f['id'] for f in res.data['results']]
+        self.create_newsfeed('Tin mới')
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [f['id'] for f in res.data['results']]
+
+        expected = sorted(feeds, key=lambda f: (NewsFeed.objects.get(pk=f.pk).timestamp, f.pk), reverse=True)
+        self.assertEqual(seen, [f.pk for f in expected])
+
+    def test_comments_are_paginated_newest_first(self):
+        feed = self.create_newsfeed('Tin')
+        comments = [Comment.objects.create(user=self.student, newsfeed=feed, content=f'c{i}') for i in range(3)]
+
+        res = self.client.get(f'/newsfeeds/{feed.pk}/comments/', {'page_size': 2})
+        self.assertEqual([c['id'] for c in res.data['results']], [comments[2].pk, comments[1].pk])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([c['id'] for c in res.data['results']], [comments[0].pk])
+
+        self.assertEqual(self.client.get('/newsfeeds/', {'cursor': 'không hợp lệ'}).status_code, 404)
+        bad_cursor = paginators.KeysetPaginator().encode_cursor(['x', 'y'])
+        self.assertEqual(self.client.get('/newsfeeds/', {'cursor': bad_cursor}).status_code, 404)
+
+
+class NewsFeedCounterTests(ScoreTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def create_newsfeed(self, title):
+        activity = Activity.objects.create(title=title, description='', start_date=date(2025, 3, 1),
+                                           end_date=date(2025, 3, 1), created_by=self.staff, capacity=10,
+                                           category=self.category)
+        return NewsFeed.objects.create(activity=activity, created_by=self.staff)
+
+    def counts(self, newsfeed):
+        newsfeed.refresh_from_db()
+        return newsfeed.like_count, newsfeed.comment_count
+
+    def test_counters_follow_likes_and_comments(self):
+        newsfeed = self.create_newsfeed('Tin')
+        student_client = APIClient()
+        student_client.force_authenticate(self.student)
+
+        student_client.post(f'/newsfeeds/{newsfeed.pk}/likes/')
+        self.client.post(f'/newsfeeds/{newsfeed.pk}/likes/')
+        student_client.post(f'/newsfeeds/{newsfeed.pk}/comments/', {'content': 'Hay'})
+        comment = Comment.objects.create(user=self.staff, newsfeed=newsfeed, content='Ok')
+        self.assertEqual(self.counts(newsfeed), (2, 2))
+
+        student_client.post(f'/newsfeeds/{newsfeed.pk}/likes/')
+        comment.active = False
+        comment.save()
+        self.assertEqual(self.counts(newsfeed), (1, 1))
+        Comment.objects.filter(newsfeed=newsfeed).delete()
+        self.assertEqual(self.counts(newsfeed), (1, 0))
+
+        NewsFeed.objects.filter(pk=newsfeed.pk).update(like_count=9, comment_count=9)
+        feed.refresh_counters()
+        self.assertEqual(self.counts(newsfeed), (1, 0))
+
+    def test_feed_list_embeds_counts_with_constant_queries(self):
+        first = self.create_newsfeed('Tin 0')
+        Like.objects.create(user=self.staff, newsfeed=first)
+        Like.objects.create(user=self.student, newsfeed=first)
+
+        with CaptureQueriesContext(connection) as one_item:
+            res = self.client.get('/newsfeeds/')
+        self.assertEqual(res.data['results'][0]['like_count'], 2)
+        self.assertTrue(res.data['results'][0]['liked_by_me'])
+
+        for i in range(1, 5):
+            self.create_newsfeed(f'Tin {i}')
+        with CaptureQueriesContext(connection) as five_items:
+            res = self.client.get('/newsfeeds/')
+        self.assertEqual(len(five_items), len(one_item))
+        self.assertEqual([f['liked_by_me'] for f in res.data['results']], [False] * 4 + [True])
+
+    def test_students_read_the_feed_but_cannot_post(self):
+        newsfeed = self.create_newsfeed('Tin')
+        Like.objects.create(user=self.staff, newsfeed=newsfeed)
+        student_client = APIClient()
+        self.assertIn(student_client.get('/newsfeeds/').status_code, (401, 403))
+
+        student_client.force_authenticate(self.student)
+        res = student_client.get('/newsfeeds/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([(f['like_count'], f['liked_by_me']) for f in res.data['results']], [(1, False)])
+        self.assertEqual(student_client.post('/newsfeeds/', {'activity': newsfeed.activity_id}).status_code, 403)
+
+
+class LikeTests(ScoreTestCase):
+    create_newsfeed = NewsFeedCounterTests.create_newsfeed
+    counts = NewsFeedCounterTests.counts
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.newsfeed = self.create_newsfeed('Tin')
+        self.url = f'/newsfeeds/{self.newsfeed.pk}/likes/'
+
+    def test_put_and_delete_are_idempotent(self):
+        for i in range(2):
+            res = self.client.put(self.url)
+            self.assertEqual((res.status_code, res.data['liked'], res.data['like_count']), (200, True, 1))
+        for i in range(2):
+            res = self.client.delete(self.url)
+            self.assertEqual((res.status_code, res.data['liked'], res.data['like_count']), (200, False, 0))
+
+        self.assertEqual(self.client.post(self.url, {'liked': 'true'}).data['like_count'], 1)
+        self.assertEqual(self.client.post(self.url, {'liked': True}, format='json').data['like_count'], 1)
+        self.assertEqual(self.client.post(self.url, {'liked': 'x'}).status_code, 400)
+
+        # POST không kèm liked vẫn đảo trạng thái
+        self.assertEqual(self.client.post(self.url).status_code, 200)
+        self.assertEqual(self.client.post(self.url).status_code, 201)
+        self.assertEqual(self.counts(self.newsfeed), (1, 0))
+
+    def test_anonymous_writes_require_login(self):
+        anonymous = APIClient()
+        for method in (anonymous.post, anonymous.put, anonymous.delete):
+            self.assertEqual(method(self.url).status_code, 401)
+        self.assertEqual(anonymous.put(f'/newsfeeds/{self.newsfeed.pk}/comments/').status_code, 401)
+        self.assertEqual(anonymous.get(self.url).status_code, 200)
+        self.assertFalse(Like.objects.exists())
+
+    @override_settings(SCORES_LIKE_MODE='buffered')
+    def test_buffered_likes_are_flushed_in_batches(self):
+        student_client = APIClient()
+        student_client.force_authenticate(self.student)
+        student_client.put(self.url)
+        self.client.put(self.url)
+        self.client.delete(self.url)
+        self.client.put(self.url)
+
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(PendingLike.objects.count(), 2)
+        self.assertEqual(self.counts(self.newsfeed), (0, 0))
+        # Người thích thấy ngay trạng thái của mình dù chưa ghi
+        self.assertTrue(self.client.get('/newsfeeds/').data['results'][0]['liked_by_me'])
+
+        # Số truy vấn của một lô không phụ thuộc số thao tác trong lô
+        with self.assertNumQueries(6):
+            self.assertEqual(feed.flush_likes(), 2)
+        self.assertEqual(feed.flush_likes(), 0)
+        self.assertEqual(self.counts(self.newsfeed), (2, 0))
+
+        student_client.delete(self.url)
+        call_command('flush_likes', stdout=StringIO())
+        self.assertEqual(list(Like.objects.values_list('user', flat=True)), [self.staff.pk])
+        self.assertEqual(self.counts(self.newsfeed), (1, 0))
+
+
+class CommentStreamTests(ScoreTestCase):
+    create_newsfeed = NewsFeedCounterTests.create_newsfeed
+
+    def setUp(self):
+        self.client = APIClient()
+        self.newsfeed = self.create_newsfeed('Tin')
+        self.url = f'/newsfeeds/{self.newsfeed.pk}/comments/'
+        self.comments = [Comment.objects.create(user=[self.staff, self.student][i % 2], newsfeed=self.newsfeed,
+                                                content=f'c{i}') for i in range(5)]
+
+    def test_newest_first_with_authors_and_since(self):
+        with self.assertNumQueries(3):
+            res = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual([c['content'] for c in res.data['results']], ['c4', 'c3', 'c2'])
+        self.assertEqual(res.data['results'][0]['author'], {'id': self.staff.pk, 'username': self.staff.username,
+                                                            'avatar': ''})
+        res = self.client.get(res.data['next'])
+        self.assertEqual([c['content'] for c in res.data['results']], ['c1', 'c0'])
+
+        res = self.client.get(self.url, {'since': self.comments[2].created_date.isoformat()})
+        self.assertEqual([c['content'] for c in res.data['results']], ['c4', 'c3'])
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, 400)
+
+    def test_unchanged_thread_returns_304(self):
+        res = self.client.get(self.url)
+        etag = res['ETag']
+
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertNotEqual(self.client.get(self.url, {'page_size': 2})['ETag'], etag)
+
+        self.comments[0].delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(self.url)['ETag']
+        Comment.objects.create(user=self.student, newsfeed=self.newsfeed, content='mới')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ConditionalResponseTests(ScoreTestCase):
+    create_newsfeed = NewsFeedCounterTests.create_newsfeed
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_unchanged_list_returns_304_and_cached_response(self):
+        Category.objects.create(name='Văn nghệ')
+        Category.objects.create(name='Học thuật')
+        res = self.client.get('/categories/')
+        etag = res['ETag']
+        self.assertTrue(res.has_header('Last-Modified'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/categories/').data, res.data)
+        self.assertNotEqual(self.client.get('/categories/', {'page': 2})['ETag'], etag)
+
+        Category.objects.create(name='Thể thao')
+        res = self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((res.status_code, res.data['count']), (200, 4))
+
+    def test_writes_invalidate_dependent_views(self):
+        activity = Activity.objects.create(title='Hiến máu', description='', start_date=date(2025, 3, 1),
+                                           end_date=date(2025, 3, 1), created_by=self.staff, capacity=10,
+                                           category=self.category)
+        activities = self.client.get('/activities/')['ETag']
+        participations_url = f'/activities/{activity.pk}/participations/'
+        participations = self.client.get(participations_url)['ETag']
+
+        tag = Tag.objects.create(name='máu')
+        activity.tags.add(tag)
+        self.assertEqual(self.client.get('/activities/', HTTP_IF_NONE_MATCH=activities).status_code, 200)
+        res = self.client.get(participations_url, HTTP_IF_NONE_MATCH=participations)
+        self.assertEqual(res.status_code, 200)
+        participations = res['ETag']
+
+        Participation.objects.create(student=self.student, activity=activity)
+        res = self.client.get(participations_url, HTTP_IF_NONE_MATCH=participations)
+        self.assertEqual((res.status_code, len(res.data)), (200, 1))
+
+    def test_newsfeed_validator_is_per_user(self):
+        newsfeed = self.create_newsfeed('Tin')
+        other_staff = User.objects.create(username='staff2', is_staff=True)
+        self.client.force_authenticate(self.staff)
+        etag = self.client.get('/newsfeeds/')['ETag']
+
+        other = APIClient()
+        other.force_authenticate(other_staff)
+        other_etag = other.get('/newsfeeds/')['ETag']
+        self.assertNotEqual(etag, other_etag)
+        # Phiên bản + bộ đếm của trang: không đổi thì 304
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/newsfeeds/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Thích / bình luận không tăng phiên bản chung của newsfeed (trang đã cache vẫn dùng được)
+        version = DataVersion.current(caching.NEWSFEED)
+        self.client.put(f'/newsfeeds/{newsfeed.pk}/likes/')
+        Comment.objects.create(user=other_staff, newsfeed=newsfeed, content='Hay')
+        self.assertEqual(DataVersion.current(caching.NEWSFEED), version)
+        res = self.client.get('/newsfeeds/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data['results'][0]['liked_by_me'])
+        self.assertIn('private', res['Cache-Control'])
+        res = other.get('/newsfeeds/', HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual((res.status_code, res.data['results'][0]['like_count']), (200, 1))
+        self.assertEqual(res.data['results'][0]['comment_count'], 1)
+        self.assertFalse(res.data['results'][0]['liked_by_me'])
+
+
+class FastPathTests(ScoreTestCase):
+    create_newsfeed = NewsFeedCounterTests.create_newsfeed
+
+    def test_fast_rows_match_serializers_byte_for_byte(self):
+        newsfeed = self.create_newsfeed('Hiến máu "nhân đạo"\u2028')
+        activity = newsfeed.activity
+        activity.image = 'activities/2025/03/ảnh 1.jpg'
+        activity.save()
+        activity.tags.add(Tag.objects.create(name='máu'), Tag.objects.create(name='tình nguyện'))
+        self.create_newsfeed('Không ảnh')
+        User.objects.filter(pk=self.student.pk).update(avatar='image/upload/v1734000000/avatar_1.jpg')
+        User.objects.filter(pk=self.staff.pk).update(avatar='image/upload/v1734000000/ảnh đại diện.png')
+        for user in [self.student, self.staff]:
+            Like.objects.create(user=user, newsfeed=newsfeed)
+            Comment.objects.create(user=user, newsfeed=newsfeed, content='Hay <b>quá</b>')
+
+        request = Request(APIRequestFactory().get('/'))
+        activities = Activity.objects.prefetch_related('tags').order_by('-created_date', '-id')
+        newsfeeds = NewsFeed.objects.annotate(liked_by_me=feed.liked_subquery(self.student)).order_by('-id')
+        comments = feed.thread_comments(newsfeed).order_by('-created_date', '-id')
+        cases = [
+            (serializers.ActivityDetailsSerializer(activities, many=True, context={'request': request}).data,
+             fastpath.activity_rows(fastpath.activity_values(activities), request)),
+            (serializers.NewsFeedSerializer(newsfeeds, many=True).data,
+             fastpath.newsfeed_rows(fastpath.newsfeed_values(newsfeeds))),
+            (serializers.UserSerializer([like.user for like in newsfeed.like_set.order_by('id')], many=True).data,
+             fastpath.liker_rows(fastpath.liker_values(newsfeed).order_by('id'))),
+            (serializers.CommentSerializer(comments, many=True).data,
+             fastpath.comment_rows(fastpath.comment_values(comments))),
+        ]
+        for reference, fast in cases:
+            self.assertEqual(JSONRenderer().render(reference), fastpath.FastJSONRenderer().render(fast))
+
+    def test_list_endpoints_page_with_values_rows(self):
+        for i in range(3):
+            self.create_newsfeed(f'Tin {i}')
+        client = APIClient()
+        client.force_authenticate(self.staff)
+        for url, expected in [('/activities/', Activity.objects.order_by('-created_date', '-id')),
+                              ('/newsfeeds/', NewsFeed.objects.order_by('-timestamp', '-id'))]:
+            ids = []
+            res = client.get(url, {'page_size': 2})
+            while True:
+                ids += [r['id'] for r in res.data['results']]
+                if not res.data['next']:
+                    break
+                res = client.get(res.data['next'])
+            self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+
+class RosterTests(ScoreTestCase):
+    def setUp(self):
+        self.activity = Activity.objects.create(title='Hiến máu', description='', start_date=date(2025, 3, 1),
+                                                end_date=date(2025, 3, 1), created_by=self.staff, capacity=100,
+                                                category=self.category)
+        self.url = f'/activities/{self.activity.pk}/roster/'
+        for i in range(5):
+            student = User.objects.create(username=f'sv-{i}', first_name='An', last_name=f'Nguyễn {i}',
+                                          student_class=self.student_class if i % 2 else None,
+                                          department=self.department)
+            Participation.objects.create(student=student, activity=self.activity, is_completed=i < 2,
+                                         proof='proofs/x.png' if i == 0 else None)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_roster_pages_with_students_in_one_query(self):
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(res.data['results'][0], {
+            'id': res.data['results'][0]['id'],
+            'student': {'id': User.objects.get(username='sv-0').pk, 'username': 'sv-0', 'first_name': 'An',
+                        'last_name': 'Nguyễn 0', 'class': None, 'department': self.department.name},
+            'is_completed': True, 'has_proof': True, 'created_date': res.data['results'][0]['created_date'],
+        })
+        res = self.client.get(res.data['next'])
+        self.assertEqual([r['student']['username'] for r in res.data['results']], ['sv-3', 'sv-4'])
+
+        res = self.client.get(self.url, {'completed': 'false', 'class': self.student_class.pk})
+        self.assertEqual([r['student']['username'] for r in res.data['results']], ['sv-3'])
+        self.assertEqual(self.client.get(self.url, {'completed': 'x'}).status_code, 400)
+
+    def test_roster_permissions_and_csv(self):
+        student_client = APIClient()
+        student_client.force_authenticate(self.student)
+        self.assertEqual(student_client.get(self.url).status_code, 403)
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+        res = self.client.get(f'/activities/{self.activity.pk}/roster-csv/', {'completed': 'true'})
+        rows = list(csv.reader(b''.join(res.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(rows[0][:2], ['Student', 'Full Name'])
+        self.assertEqual([r[0] for r in rows[1:]], ['sv-0', 'sv-1'])
+        self.assertEqual(rows[1][1:], ['Nguyễn 0 An', '', self.department.name, 'yes', 'yes', rows[1][-1]])
+
+
+class DashboardTests(ScoreTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def test_dashboard_breakdown_history_and_ranks(self):
+        self.add_point(15)
+        self.add_point(10)
+        self.add_point(8, criteria=self.criteria_b)
+        Participation.objects.create(student=self.student, activity=self.activity, is_completed=True)
+
+        res = self.client.get('/users/dashboard/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['student']['class'], self.student_class.name)
+        self.assertEqual(res.data['total_score'], 28)
+        self.assertEqual(res.data['breakdown']['total_score'], 28)
+        group_a, group_b = res.data['breakdown']['groups']
+        self.assertEqual((group_a['raw_score'], group_a['score'], group_a['max_score']), (25, 20, 20))
+        self.assertEqual(group_a['criteria'], [{'id': self.criteria_a.pk, 'name': 'Tham gia', 'score': 25,
+                                                'point_count': 2}])
+        self.assertEqual(group_b['score'], 8)
+        self.assertEqual(res.data['participations'][0]['activity']['title'], 'Mùa hè xanh')
+        self.assertEqual(res.data['ranks']['class']['rank'], 1)
+
+        # Hồ sơ, phiên bản, hàng đợi và thứ hạng (kích thước + số sinh viên cao hơn trên bảng đếm, chung cho
+        # ba phạm vi); lịch sử và điểm lấy từ cache
+        with self.assertNumQueries(5):
+            self.client.get('/users/dashboard/')
+        cache.clear()
+        with self.assertNumQueries(7):
+            self.client.get('/users/dashboard/')
+
+    @override_settings(SCORES_RECOMPUTE_MODE='deferred')
+    def test_pending_student_bypasses_cache(self):
+        self.assertEqual(self.client.get('/users/dashboard/').data['breakdown']['total_score'], 0)
+        # Sổ điểm (và score_sequence) chỉ đổi khi hàng đợi được xử lý
+        self.add_point(5)
+        res = self.client.get('/users/dashboard/')
+        self.assertTrue(res.data['pending'])
+        self.assertEqual(res.data['breakdown']['total_score'], 5)
+
+    def test_dashboard_invalidated_by_own_changes_only(self):
+        other = User.objects.create_user(username='sv2', password='123')
+        self.assertEqual(self.client.get('/users/dashboard/').data['breakdown']['total_score'], 0)
+        sequence = User.objects.get(pk=self.student.pk).score_sequence
+
+        # Điểm của sinh viên khác không đổi khóa cache của sinh viên này
+        self.add_point(5, student=other)
+        self.assertEqual(User.objects.get(pk=self.student.pk).score_sequence, sequence)
+
+        point = self.add_point(5)
+        self.assertEqual(self.client.get('/users/dashboard/').data['breakdown']['total_score'], 5)
+        scoring.bulk_upsert_points([(0, {'student': self.student.pk, 'activity': self.activity.pk,
+                                         'criteria': self.criteria_a.pk, 'score': 7})])
+        self.assertEqual(self.client.get('/users/dashboard/').data['breakdown']['total_score'], 7)
+        point.delete()
+        self.assertEqual(self.client.get('/users/dashboard/').data['breakdown']['total_score'], 0)
+
+        participation = Participation.objects.create(student=self.student, activity=self.activity)
+        self.assertEqual(len(self.client.get('/users/dashboard/').data['participations']), 1)
+        Activity.objects.filter(pk=self.activity.pk).update(title='MHX 2025')
+        caching.bump(caching.ACTIVITIES)
+        self.assertEqual(self.client.get('/users/dashboard/').data['participations'][0]['activity']['title'],
+                         'MHX 2025')
+        participation.delete()
+        self.assertEqual(self.client.get('/users/dashboard/').data['participations'], [])
+
+    def test_staff_can_view_other_students(self):
+        self.assertEqual(self.client.get('/users/dashboard/', {'student_id': self.staff.pk}).data['student']['id'],
+                         self.student.pk)
+        staff_client = APIClient()
+        staff_client.force_authenticate(self.staff)
+        res = staff_client.get('/users/dashboard/', {'student_id': self.student.pk})
+        self.assertEqual(res.data['student']['id'], self.student.pk)
+        self.assertEqual(staff_client.get('/users/dashboard/', {'student_id': 'x'}).status_code, 404)
+        self.assertEqual(APIClient().get('/users/dashboard/').status_code, 401)
+
+
+class DisciplinePointListTests(ScoreTestCase):
+    def setUp(self):
+        self.other = User.objects.create_user(username='sv2', password='123', department=self.department)
+        self.add_point(15)
+        self.add_point(10)
+        self.add_point(8, criteria=self.criteria_b)
+        self.add_point(30, criteria=self.criteria_b, student=self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_list_is_paginated_and_filtered(self):
+        res = self.client.get('/disciplined/', {'page_size': 3})
+        self.assertEqual([p['score'] for p in res.data['results']], [30, 8, 10])
+        self.assertEqual([p['score'] for p in self.client.get(res.data['next']).data['results']], [15])
+
+        res = self.client.get('/disciplined/', {'class': self.student_class.pk, 'group': self.group_b.pk})
+        self.assertEqual([p['score'] for p in res.data['results']], [8])
+        res = self.client.get('/disciplined/', {'department': self.department.pk, 'criteria': self.criteria_b.pk})
+        self.assertEqual(len(res.data['results']), 2)
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.client.get('/disciplined/', {'date_from': today, 'date_to': today}).data['results']), 4)
+        self.assertEqual(self.client.get('/disciplined/', {'date_to': '2000-01-01'}).data['results'], [])
+        self.assertEqual(self.client.get('/disciplined/', {'activity': 'x'}).status_code, 400)
+
+        student_client = APIClient()
+        student_client.force_authenticate(self.other)
+        res = student_client.get('/disciplined/', {'student_id': self.student.pk})
+        self.assertEqual(res.data['results'], [])
+
+    def test_summary_caps_each_student_group(self):
+        with self.assertNumQueries(2):
+            res = self.client.get('/disciplined/', {'summary': 1, 'page_size': 1})
+        summary = res.data['summary']
+        self.assertEqual((summary['sum'], summary['count'], summary['student_count']), (63, 4, 2))
+        # Nhóm A: 25 chặn còn 20; nhóm B: 8 của sv1 và 30 của sv2 (chặn còn 25) chặn riêng từng sinh viên
+        self.assertEqual(summary['capped_sum'], 53)
+        self.assertEqual([(g['id'], g['raw_score'], g['score'], g['point_count']) for g in summary['groups']],
+                         [(self.group_a.pk, 25, 20, 2), (self.group_b.pk, 38, 33, 2)])
+        self.assertNotIn('summary', self.client.get('/disciplined/').data)
+
+
+class SeedSchoolTests(TestCase):
+    options = {'students': 30, 'activities': 10, 'participations_per_student': 3, 'points_per_student': 8,
+               'organizers': 2, 'likes_per_post': 5, 'comments_per_post': 2, 'messages': 10}
+
+    def seed(self, prefix):
+        call_command('seed_school', prefix=prefix, stdout=StringIO(), **self.options)
+        return list(DisciplinePoint.objects.filter(student__username__startswith=f'{prefix}-')
+                    .order_by('id').values_list('score', flat=True))
+
+    def test_seed_is_deterministic_and_consistent(self):
+        scores = self.seed('a')
+        self.assertEqual(len(scores), 240)
+        self.assertEqual(self.seed('b'), scores)
+
+        self.assertEqual(scoring.check_ledger(), [])
+        self.assertEqual(scoring.refresh_group_totals(student_ids=User.objects.values('id'), dry_run=True), 0)
+        self.assertEqual(set(NewsFeed.objects.values_list('like_count', 'comment_count')), {(5, 2)})
+        self.assertEqual(sum(ScoreRollup.objects.filter(scope='class').values_list('point_count', flat=True)), 480)
+        self.assertFalse(Activity.objects.filter(search_document__isnull=True).exists())
+
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+
+class BenchmarkTests(TransactionTestCase):
+    def test_scoring_benchmark_runs_both_scenarios(self):
+        out = StringIO()
+        call_command('benchmark', 'scoring', threads=2, writes=4, students=3, stdout=out)
+        self.assertEqual([line.split(':')[0] for line in out.getvalue().splitlines()],
+                         ['one student', 'many students'])
+        self.assertIn('totals OK', out.getvalue())
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
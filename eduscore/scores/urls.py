@@ -11,6 +11,8 @@ r.register('comments', views.CommentViewSet, basename='comment')
 r.register('participation', views.ParticipationViewSet, basename='participation')
 r.register('disciplined', views.DisciplinePointViewSet, basename='discipline')
 r.register('report', views.ReportViewSet, basename='report')
+r.register('leaderboards', views.LeaderboardViewSet, basename='leaderboard')
+r.register('score-stats', views.ScoreStatsViewSet, basename='score-stats')
 
 urlpatterns = [
     path('',include(r.urls))
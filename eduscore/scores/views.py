@@ -1,43 +1,91 @@
-from rest_framework import viewsets, generics, permissions, status
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from rest_framework import viewsets, generics, permissions, status, fields, renderers
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from . import serializers, paginators
-from .models import Category, Activity, Participation, DisciplinePoint, Report, User, Comment, NewsFeed,Like
-from scores import perms
+from .models import Category, Activity, Participation, DisciplinePoint, Report, User, Comment, NewsFeed
+from scores import perms, scoring, leaderboard, history, filters, search, stats, feed, caching, fastpath, exports, \
+    dashboard
 
-class CategoryViewSet(viewsets.ViewSet, generics.ListAPIView):
+class CategoryViewSet(caching.ConditionalResponseMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = serializers.CategorySerializer
     pagination_class = paginators.ItemPaginator
+    version_names = [caching.CATEGORIES]
+    renderer_classes = [fastpath.FastJSONRenderer, renderers.BrowsableAPIRenderer]
 
+    def list(self, request, *args, **kwargs):
+        # Đường nhanh chỉ-đọc, kết quả giống CategorySerializer
+        def build():
+            page = self.paginate_queryset(fastpath.category_values(self.filter_queryset(self.get_queryset())))
+            return self.get_paginated_response(fastpath.category_rows(page))
 
-class ActivityViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
+        return self.conditional_response(request, build)
+
+
+class ActivityViewSet(caching.ConditionalResponseMixin, viewsets.ViewSet, generics.ListCreateAPIView):
     queryset = Activity.objects.prefetch_related('tags').filter(active=True)
     serializer_class = serializers.ActivityDetailsSerializer
-    pagination_class = paginators.ItemPaginator
+    pagination_class = paginators.ActivityPaginator
+    version_names = [caching.ACTIVITIES]
+    renderer_classes = [fastpath.FastJSONRenderer, renderers.BrowsableAPIRenderer]
 
     def get_queryset(self):
-        query = self.queryset
+        if self.action != 'list':
+            # Các action chi tiết chỉ cần chính hoạt động; tham số lọc (vd. class của roster) không áp dụng
+            return self.queryset.prefetch_related(None)
 
-        category_id = self.request.query_params.get('category_id')
-        if category_id:
-            query = query.filter(category_id=category_id)
+        query = filters.filter_activities(self.queryset, self.request.query_params)
 
+        # Tìm theo tiêu đề, mô tả, thẻ và danh mục; kết quả xếp theo độ liên quan
         search_keyword = self.request.query_params.get('q')
         if search_keyword:
-            query = query.filter(title__icontains=search_keyword)
-
-        tag_name = self.request.query_params.get('tag')
-        if tag_name:
-            query = query.filter(tags__name=tag_name)
+            query = search.search(query, search_keyword)
 
         return query
 
+    def list(self, request, *args, **kwargs):
+        # Đường nhanh chỉ-đọc, kết quả giống ActivityDetailsSerializer
+        def build():
+            query = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(fastpath.activity_values(query, self.paginator.get_ordering(query)))
+            return self.get_paginated_response(fastpath.activity_rows(page, request))
+
+        return self.conditional_response(request, build)
+
     @action(methods=['get'], url_path='participations', detail=True)
     def get_participations(self, request, pk):
-        activity = self.get_object().participation_set.filter(active=True)
-
-        return Response(serializers.ParticipationSerializer(activity, many=True, context={'request': request}).data)
+        def build():
+            activity = self.get_object().participation_set.filter(active=True)
+            return Response(serializers.ParticipationSerializer(activity, many=True, context={'request': request}).data)
+
+        return self.conditional_response(request, build, [caching.PARTICIPATIONS, caching.ACTIVITIES])
+
+    @action(methods=['get'], url_path='roster', detail=True, permission_classes=[perms.ActivityOrganizerPerms])
+    def get_roster(self, request, pk):
+        """Danh sách tham gia kèm tên, lớp, khoa sinh viên; lọc ?completed=true|false&class=&department=."""
+        participations = filters.filter_roster(self.get_object().participation_set.filter(active=True),
+                                               request.query_params)
+        paginator = paginators.RosterPaginator()
+        page = paginator.paginate_queryset(fastpath.roster_values(participations), request, view=self)
+        return paginator.get_paginated_response(fastpath.roster_rows(page))
+
+    @action(methods=['get'], url_path='roster-csv', detail=True, permission_classes=[perms.ActivityOrganizerPerms])
+    def get_roster_csv(self, request, pk):
+        """Tải toàn bộ danh sách tham gia (CSV, ?gzip=1 để nén), cùng bộ lọc với roster."""
+        activity = self.get_object()
+        participations = filters.filter_roster(activity.participation_set.filter(active=True), request.query_params)
+        compress = request.query_params.get('gzip') == '1'
+        response = StreamingHttpResponse(exports.stream_roster_csv(participations, compress=compress),
+                                         content_type='application/gzip' if compress else 'text/csv; charset=utf-8')
+        filename = f'roster_{activity.pk}.csv' + ('.gz' if compress else '')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class ParticipationViewSet(viewsets.ViewSet, generics.CreateAPIView):
@@ -67,6 +115,7 @@ class ParticipationViewSet(viewsets.ViewSet, generics.CreateAPIView):
 class DisciplinePointViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
     queryset = DisciplinePoint.objects.all()
     serializer_class = serializers.DisciplinePointSerializer
+    pagination_class = paginators.DisciplinePointPaginator
     permission_classes = [permissions.IsAdminUser]
 
     def get_permissions(self):
@@ -76,18 +125,44 @@ class DisciplinePointViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
 
     def get_queryset(self):
         query = self.queryset
-        if self.request.user.is_superuser:
+        if self.action != 'list':
             return query
 
-        if self.request.user.is_staff:
-            student_id = self.request.query_params.get('student_id')
-            if student_id:
-                query = query.filter(student_id=student_id)
-
+        # Sinh viên chỉ xem điểm của mình; bộ lọc áp dụng trong phạm vi đó
         if not self.request.user.is_staff and not self.request.user.is_superuser:
             query = query.filter(student=self.request.user)
 
-        return query
+        return filters.filter_points(query, self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # ?summary=1: tổng hợp cả tập đã lọc (không chỉ trang hiện tại) bằng một truy vấn GROUP BY
+        if request.query_params.get('summary') in ('1', 'true'):
+            response.data['summary'] = scoring.summarize_points(self.filter_queryset(self.get_queryset()))
+        return response
+
+    @action(methods=['post'], url_path='bulk', detail=False)
+    def bulk_upsert(self, request):
+        rows = request.data.get('points') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Expected a list of points.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        upsert = str(request.query_params.get('upsert', 'true')).lower() not in ('0', 'false')
+
+        valid = []
+        errors = []
+        for index, row in enumerate(rows):
+            item = serializers.DisciplinePointBulkItemSerializer(data=row)
+            if item.is_valid():
+                valid.append((index, item.validated_data))
+            else:
+                errors.append({'index': index, 'errors': item.errors})
+
+        created, updated, batch_errors = scoring.bulk_upsert_points(valid, upsert=upsert)
+        errors = sorted(errors + batch_errors, key=lambda e: e['index'])
+
+        return Response({'created': created, 'updated': updated, 'errors': errors},
+                        status=status.HTTP_200_OK if created or updated or not errors else status.HTTP_400_BAD_REQUEST)
 
 
 class ReportViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
@@ -132,6 +207,47 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView):
         return Response(serializers.UserSerializer(request.user).data)
 
 
+    @action(methods=['get'], url_path='my-rank', detail=False, permission_classes=[permissions.IsAuthenticated])
+    def get_my_rank(self, request):
+        return Response(leaderboard.student_ranks(request.user))
+
+    @action(methods=['get'], url_path='score-status', detail=False, permission_classes=[permissions.IsAuthenticated])
+    def get_score_status(self, request):
+        student = request.user
+        student_id = request.query_params.get('student_id')
+        if student_id and request.user.is_staff:
+            student = generics.get_object_or_404(User, pk=student_id)
+
+        return Response({
+            'student_id': student.id,
+            'total_score': User.objects.filter(pk=student.pk).values_list('total_score', flat=True).first(),
+            'pending': scoring.is_pending(student.pk),
+        })
+
+    @action(methods=['get'], url_path='dashboard', detail=False, permission_classes=[permissions.IsAuthenticated])
+    def get_dashboard(self, request):
+        student_id = request.user.pk
+        if request.query_params.get('student_id') and request.user.is_staff:
+            student_id = request.query_params['student_id']
+        student = generics.get_object_or_404(dashboard.students(), pk=student_id)
+
+        return Response(dashboard.get_dashboard(student))
+
+    @action(methods=['get'], url_path='score-as-of', detail=False, permission_classes=[permissions.IsAuthenticated])
+    def get_score_as_of(self, request):
+        student = request.user
+        student_id = request.query_params.get('student_id')
+        if student_id and request.user.is_staff:
+            student = generics.get_object_or_404(User, pk=student_id)
+
+        at = parse_datetime(request.query_params.get('at', ''))
+        if at is None:
+            raise ValidationError({'at': 'An ISO 8601 datetime is required.'})
+        if timezone.is_naive(at):
+            at = timezone.make_aware(at)
+
+        return Response(history.score_as_of(student.pk, at))
+
     @action(methods=['post'], url_path='change-password', detail=False,
             permission_classes=[permissions.IsAuthenticated])
     def change_password(self, request):
@@ -141,20 +257,90 @@ class UserViewSet(viewsets.ViewSet, generics.CreateAPIView):
             return Response({'message': 'Password changed successfully'}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class NewsFeedViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
+class LeaderboardViewSet(viewsets.ViewSet, generics.ListAPIView):
+    serializer_class = serializers.LeaderboardEntrySerializer
+    pagination_class = paginators.LeaderboardPaginator
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_scope(self):
+        scope = self.request.query_params.get('scope', leaderboard.SCOPE_SCHOOL)
+        if scope not in leaderboard.SCOPES:
+            raise ValidationError({'scope': 'Must be one of school, department, class.'})
+
+        scope_id = leaderboard.SCHOOL_ID
+        if scope != leaderboard.SCOPE_SCHOOL:
+            try:
+                scope_id = int(self.request.query_params['scope_id'])
+            except (KeyError, ValueError):
+                raise ValidationError({'scope_id': 'A valid integer is required.'})
+        return scope, scope_id
+
+    def get_queryset(self):
+        scope, scope_id = self.get_scope()
+        return leaderboard.scope_students(scope, scope_id).order_by('-total_score', 'id') \
+            .values('id', 'username', 'first_name', 'last_name', 'total_score')
+
+    def list(self, request, *args, **kwargs):
+        # Thứ hạng tính cho riêng trang đang xem: dòng đầu trang đọc bảng đếm, các dòng sau theo vị trí
+        scope, scope_id = self.get_scope()
+        size = leaderboard.scope_sizes([(scope, scope_id)])[(scope, scope_id)]
+        self.paginator.count = size
+        page = self.paginate_queryset(self.get_queryset())
+        offset = (self.paginator.page.number - 1) * self.paginator.page.paginator.per_page
+        rows = leaderboard.rank_rows(scope, scope_id, list(page), offset, size)
+        return self.get_paginated_response(self.get_serializer(rows, many=True).data)
+
+
+class ScoreStatsViewSet(viewsets.ViewSet):
+    permission_classes = [permissions.IsAdminUser]
+
+    def list(self, request):
+        # Phân loại sinh viên theo tổng điểm đã chặn; ?class=<id> để chỉ lấy một lớp
+        result = stats.get_stats()
+        class_id = request.query_params.get('class')
+        if class_id:
+            result = {**result, 'by_class': [c for c in result['by_class'] if str(c['class_id']) == class_id]}
+        return Response(result)
+
+
+class NewsFeedViewSet(caching.ConditionalResponseMixin, viewsets.ViewSet, generics.ListCreateAPIView):
     queryset = NewsFeed.objects.filter(active=True)
     serializer_class = serializers.NewsFeedSerializer
-    pagination_class = paginators.ItemPaginator
+    pagination_class = paginators.NewsFeedPaginator
     permission_classes = [permissions.IsAdminUser]
+    # Trang newsfeed (cache dùng chung) chỉ đổi khi có newsfeed mới / bị xóa; like_count, comment_count và
+    # liked_by_me (khác nhau theo người dùng) được đọc lại cho từng trang
+    version_names = [caching.NEWSFEED]
+    per_user = True
+    renderer_classes = [fastpath.FastJSONRenderer, renderers.BrowsableAPIRenderer]
+
+    def list(self, request, *args, **kwargs):
+        # Đường nhanh chỉ-đọc, kết quả giống NewsFeedSerializer
+        def build():
+            query = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(fastpath.newsfeed_values(query, self.paginator.get_ordering(query)))
+            return self.get_paginated_response(fastpath.newsfeed_rows(page))
+
+        def live(data):
+            current = feed.live_counters(request.user, [row['id'] for row in data['results']])
+            results = [{**row, **dict(zip(('like_count', 'comment_count', 'liked_by_me'), current[row['id']]))}
+                       for row in data['results'] if row['id'] in current]
+            return {**data, 'results': results}, [current[row['id']] for row in results]
+
+        return self.conditional_response(request, build, live=live)
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
     def get_permissions(self):
         if self.action in ['get_comments','get_likes']:
-            if self.request.method.__eq__('POST'):
+            # Mọi thao tác ghi (POST / PUT / DELETE) cần đăng nhập, chỉ đọc thì không
+            if self.request.method not in permissions.SAFE_METHODS:
                 return [permissions.IsAuthenticated()]
             return [permissions.AllowAny()]
+        if self.action == 'list':
+            # Sinh viên đăng nhập được xem newsfeed (liked_by_me theo từng người); tạo newsfeed vẫn chỉ cho quản trị
+            return [permissions.IsAuthenticated()]
 
         return super().get_permissions()
 
@@ -166,25 +352,60 @@ class NewsFeedViewSet(viewsets.ViewSet, generics.ListCreateAPIView):
 
             return Response(serializers.CommentSerializer(c).data)
         else:
-            comments = self.get_object().comment_set.select_related('user').filter(active=True)
-            return Response(serializers.CommentSerializer(comments, many=True).data)
-
-    @action(methods=['get', 'post'], url_path='likes', detail=True)
+            # Mới nhất trước, phân trang theo con trỏ; ?since=<ISO 8601> chỉ lấy bình luận mới hơn thời điểm đó.
+            # Luồng không đổi (If-None-Match khớp ETag) trả về 304 mà không đọc / serialize bình luận nào.
+            newsfeed = self.get_object()
+            etag = quote_etag(feed.comments_etag(newsfeed, request.query_params.items()))
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            comments = feed.thread_comments(newsfeed)
+            if request.query_params.get('since'):
+                since = parse_datetime(request.query_params['since'])
+                if since is None:
+                    raise ValidationError({'since': 'An ISO 8601 datetime is required.'})
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+                comments = comments.filter(created_date__gt=since)
+
+            paginator = paginators.CommentPaginator()
+            page = paginator.paginate_queryset(fastpath.comment_values(comments, paginator.get_ordering(comments)),
+                                               request, view=self)
+            response = paginator.get_paginated_response(fastpath.comment_rows(page))
+            response['ETag'] = etag
+            return response
+
+    @action(methods=['get', 'post', 'put', 'delete'], url_path='likes', detail=True)
     def get_likes(self, request, pk):
+        """
+        PUT: thích, DELETE: bỏ thích (idempotent). POST {"liked": true|false} cũng đặt trạng thái;
+        POST không kèm liked thì đảo trạng thái hiện tại như trước.
+        """
         newsfeed = self.get_object()
 
         if request.method.__eq__('GET'):
-            likes = newsfeed.like_set.select_related('user')
-            serializer = serializers.UserSerializer([like.user for like in likes], many=True)
-            return Response(serializer.data)
-
-        if request.method.__eq__('POST'):
-            like, created = Like.objects.get_or_create(user=request.user, newsfeed=newsfeed)
-            if not created:
-                like.delete()
-                return Response({'message': 'Unliked successfully.'}, status=status.HTTP_200_OK)
-
-            return Response({'message': 'Liked successfully.'}, status=status.HTTP_201_CREATED)
+            return Response(fastpath.liker_rows(fastpath.liker_values(newsfeed)))
+
+        if request.method.__eq__('PUT'):
+            liked = True
+        elif request.method.__eq__('DELETE'):
+            liked = False
+        elif 'liked' in request.data:
+            try:
+                liked = fields.BooleanField().run_validation(request.data['liked'])
+            except ValidationError as e:
+                raise ValidationError({'liked': e.detail})
+        else:
+            liked = not feed.is_liked(request.user, newsfeed)
+
+        feed.set_like(request.user, newsfeed, liked)
+        like_count = NewsFeed.objects.filter(pk=newsfeed.pk).values_list('like_count', flat=True).first()
+        data = {'liked': liked, 'like_count': like_count, 'pending': feed.is_buffered(),
+                'message': 'Liked successfully.' if liked else 'Unliked successfully.'}
+        if request.method.__eq__('POST') and liked:
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_200_OK)
 
 class CommentViewSet(viewsets.ViewSet, generics.DestroyAPIView):
     queryset = Comment.objects.filter(active=True)